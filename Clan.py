@@ -1,8 +1,7 @@
 import re
-from datetime import datetime
 
 from vkbottle.bot import BotLabeler, Message
-from vkbottle import Keyboard, Text, KeyboardButtonColor
+from vkbottle import Keyboard, KeyboardButtonColor
 
 from bot.core.config import settings
 from bot.db import (
@@ -11,12 +10,13 @@ from bot.db import (
     deposit_to_clan_treasury,
     get_clan_member_count,
     get_clan_members,
-    get_clan_treasury_log,
     get_member_clan_role,
     get_player,
     get_player_clan,
     get_top_clans,
-    log_collection_with_user,
+    queue_treasury_log,
+    get_recent_treasury_log,
+    invalidate_treasury_log,
     subtract_treasury,
     update_player_balance,
     upgrade_clan,
@@ -29,10 +29,28 @@ from bot.db import (
     log_clan_action,
     get_clan_requirements,
     get_player_contributions,
-    update_clan_settings,
     get_all_clans,
+    get_top_contributors,
+    update_top_contributors,
+    invalidate_top_contributors,
+    invalidate_clan_cards,
+    invalidate_player_card,
+    is_banned_from_clan,
+    ban_from_clan,
+    unban_from_clan,
+    delete_clan_bans,
+    update_clan_setting,
+    get_clan_greeting,
+    render_greeting,
 )
-from bot.services.clans import get_clan_bonuses
+from bot.models import format_ts, now_ts
+from bot.services.callback_menu import callback_button, callback_menus
+from bot.services.clan_bonuses import get_clan_bonuses
+from bot.services.clan_search import clan_search_index
+from bot.services.lift_pipeline import with_pending_clan_lifts
+from bot.services.menu_assets import menu_assets
+from bot.services.outbox import reply
+from bot.services.player_table import player_table
 from bot.utils import format_number
 from bot.utils.clan_helpers import (
     check_clan_permissions,
@@ -44,8 +62,17 @@ from bot.utils.clan_helpers import (
 clan_labeler = BotLabeler()
 clan_labeler.vbml_ignore_case = True
 
-# Глобальная переменная для хранения ID последнего сообщения помощи
-last_help_message_id = None
+def format_clan_not_found(tag: str) -> str:
+    """Сообщение "клан не найден" с подсказками из поискового индекса"""
+    text = f"❌ Клан с тегом [{tag.upper()}] не найден!"
+    
+    suggestions = clan_search_index.fuzzy_search(tag, 3)
+    if suggestions:
+        text += "\n\n💡 Возможно, вы имели в виду:\n" + "\n".join(
+            f"🔸 [{found_tag}] {name}" for found_tag, name in suggestions
+        )
+    
+    return text
 
 
 # ======================
@@ -69,6 +96,7 @@ async def create_clan_handler(message: Message, cmd_args: str):
     player = await get_player(user_id)
     if not player:
         player = await create_player(user_id, str(message.from_id))
+        player_table.upsert(player)
 
     # Проверяем баланс - 300 монет
     CLAN_CREATE_COST = 300
@@ -91,6 +119,8 @@ async def create_clan_handler(message: Message, cmd_args: str):
     result = await create_clan(tag, clan_name, user_id)
 
     if result["success"]:
+        clan_search_index.add(tag.upper(), clan_name)
+        
         # Снимаем деньги за создание клана
         await update_player_balance(
             user_id,
@@ -99,6 +129,8 @@ async def create_clan_handler(message: Message, cmd_args: str):
             f"Создание клана {tag.upper()}",
             None,
         )
+        player_table.add(user_id, balance=-CLAN_CREATE_COST)
+        invalidate_player_card(user_id)
 
         clan_bonuses = get_clan_bonuses(1)
 
@@ -115,7 +147,7 @@ async def create_clan_handler(message: Message, cmd_args: str):
             f"└─ 👥 Без ограничений по участникам!\n\n"
             f"💡 Используйте К помощь для списка команд клана"
         )
-        await message.answer(response_text, disable_mentions=True)
+        await reply(message, response_text, disable_mentions=True)
     else:
         return f"❌ {result['error']}"
 
@@ -146,6 +178,7 @@ async def upgrade_clan_handler(message: Message, option: str = "1"):
         result = await upgrade_clan(clan["id"], upgrade_one_level=True)
         
         if result["success"]:
+            invalidate_clan_cards(clan["id"])
             # Получаем новые бонусы
             new_bonuses = get_clan_bonuses(result["new_level"])
             
@@ -168,6 +201,7 @@ async def upgrade_clan_handler(message: Message, option: str = "1"):
         result = await upgrade_clan(clan["id"], upgrade_one_level=False)
         
         if result["success"]:
+            invalidate_clan_cards(clan["id"])
             # Получаем новые бонусы
             new_bonuses = get_clan_bonuses(result["new_level"])
             levels_upgraded = result["new_level"] - clan["level"]
@@ -191,23 +225,24 @@ async def upgrade_clan_handler(message: Message, option: str = "1"):
 async def clan_treasury_handler(message: Message):
     """Просмотр казны клана"""
     user_id = message.from_id
-    clan = await get_player_clan(user_id)
+    clan = with_pending_clan_lifts(await get_player_clan(user_id))
 
     if not clan:
         return "❌ Вы не состоите в клане!"
 
-    # Получаем участников клана
-    members = await get_clan_members(clan["id"], 10)
+    # Получаем топ вкладчиков и количество участников
+    top_contributors = await get_top_contributors(clan["id"], 5)
+    member_count = await get_clan_member_count(clan["id"])
 
     # Получаем лог операций
-    log = await get_clan_treasury_log(clan["id"], 5)
+    log = await get_recent_treasury_log(clan["id"], 5)
 
     # Получаем бонусы клана
     clan_bonuses = get_clan_bonuses(clan["level"])
 
     # Форматируем информацию о участниках
     members_text = ""
-    for i, member in enumerate(members[:5], 1):
+    for i, member in enumerate(top_contributors, 1):
         role_emoji = (
             "👑"
             if member["role"] == "owner"
@@ -232,7 +267,7 @@ async def clan_treasury_handler(message: Message):
             )
         )
         username = entry["username"] or "Система"
-        time_str = datetime.fromisoformat(entry["created_at"]).strftime("%d.%m %H:%M")
+        time_str = format_ts(entry["created_at"], "%d.%m %H:%M")
         log_text += f"{action_emoji} {username}: {entry['description']} ({time_str})\n"
 
     response_text = (
@@ -240,7 +275,7 @@ async def clan_treasury_handler(message: Message):
         f"🏷️ Название: {clan['name']}\n"
         f"⭐ Уровень: {clan['level']}\n"
         f"💰 Казна: {format_number(clan['treasury'])} монет\n"
-        f"👥 Участников: {len(members)}\n\n"
+        f"👥 Участников: {member_count}\n\n"
         f"🎯 Бонусы клана:\n"
         f"├─ 💼 +{clan_bonuses['business_bonus_percent']}% от бизнесов в казну\n"
         f"├─ 🏋️ +{clan_bonuses['lift_bonus_coins']} монет в казну с каждого поднятия\n\n"
@@ -250,14 +285,14 @@ async def clan_treasury_handler(message: Message):
         f"💡 Снять деньги: К снять [сумма]"
     )
 
-    await message.answer(response_text, disable_mentions=True)
+    await reply(message, response_text, disable_mentions=True)
 
 
 @clan_labeler.message(text=["к", "К", "к профиль", "/к профиль"])
 async def clan_profile_handler(message: Message):
     """Профиль клана"""
     user_id = message.from_id
-    clan = await get_player_clan(user_id)
+    clan = with_pending_clan_lifts(await get_player_clan(user_id))
 
     if not clan:
         return "❌ Вы не состоите в клане!"
@@ -274,7 +309,7 @@ async def clan_profile_handler(message: Message):
     clan_bonuses = get_clan_bonuses(clan["level"])
 
     # Форматируем дату создания
-    created_date = datetime.fromisoformat(clan["created_at"]).strftime("%d.%m.%Y")
+    created_date = format_ts(clan["created_at"], "%d.%m.%Y")
     
     # Получаем требования
     requirements = await get_clan_requirements(clan["id"])
@@ -300,7 +335,7 @@ async def clan_profile_handler(message: Message):
         "💡 Команды клана: К помощь",
     ]
 
-    await message.answer("\n".join(response_parts), disable_mentions=True)
+    await reply(message, "\n".join(response_parts), disable_mentions=True)
 
 
 @clan_labeler.message(text=["к топ", "/к топ"])
@@ -316,15 +351,13 @@ async def clan_top_handler(message: Message):
     for i, clan in enumerate(clans, 1):
         medal = "🥇" if i == 1 else ("🥈" if i == 2 else ("🥉" if i == 3 else "🔸"))
 
-        # Рассчитываем бонусы клана
-        business_bonus = 5 + (clan["level"] - 1)
-        lift_bonus = 1 + (clan["level"] - 1)
+        clan_bonuses = get_clan_bonuses(clan["level"])
 
         top_text += (
             f"{medal} {i}. [{clan['tag']}] {clan['name']}\n"
             f"   ⭐ Уровень: {clan['level']} | 👥 {clan['member_count']} участников\n"
             f"   🏦 Казна: {format_number(clan['treasury'])} монет\n"
-            f"   🎯 Бонусы: +{business_bonus}% от бизнесов, +{lift_bonus} монет с поднятий\n\n"
+            f"   🎯 Бонусы: +{clan_bonuses['business_bonus_percent']}% от бизнесов, +{clan_bonuses['lift_bonus_coins']} монет с поднятий\n\n"
         )
 
     top_text += "💡 Создать клан: К создать [ТЭГ] [название]"
@@ -352,7 +385,17 @@ async def clan_deposit_handler(message: Message, amount: str):
     result = await deposit_to_clan_treasury(user_id, amount)
 
     if result["success"]:
+        invalidate_player_card(user_id)
         clan = await get_player_clan(user_id)
+        # deposit_to_clan_treasury пишет в лог казны сам, мимо буфера последних операций
+        invalidate_treasury_log(clan["id"])
+        update_top_contributors(
+            clan["id"],
+            user_id,
+            player["username"],
+            player.get("clan_role", "member"),
+            result["total_contributions"],
+        )
 
         return (
             f"💰 Деньги внесены в казну клана!\n\n"
@@ -406,23 +449,27 @@ async def withdraw_from_clan_treasury_handler(message: Message, amount: str):
         f"Снятие из казны клана [{clan['tag']}]",
         None,
     )
+    player_table.add(user_id, balance=amount)
+    invalidate_player_card(user_id)
+    
+    player = await get_player(user_id)
     
     # Логируем операцию
-    await log_collection_with_user(
+    queue_treasury_log(
         clan["id"],
         user_id,
         "withdrawal",
         amount,
         f"Снятие {format_number(amount)} монет из казны",
+        player["username"],
     )
     
     await log_clan_action(
         clan["id"], user_id, "withdraw",
-        f"Снял {format_number(amount)} монет из казны"
+        f"Снял {format_number(amount)} монет из казны",
+        player["username"],
     )
     
-    player = await get_player(user_id)
-    
     return (
         f"💰 Деньги сняты из казны!\n\n"
         f"🏰 Клан: [{clan['tag']}] {clan['name']}\n"
@@ -474,6 +521,10 @@ async def disband_clan_confirm_handler(message: Message):
     
     # Удаляем клан
     await delete_clan(clan["id"])
+    invalidate_top_contributors(clan["id"])
+    invalidate_clan_cards(clan["id"])
+    clan_search_index.remove(clan["tag"])
+    await delete_clan_bans(clan["id"])
     
     return (
         f"💥 Клан распущен!\n\n"
@@ -504,6 +555,8 @@ async def rename_clan_handler(message: Message, new_name: str):
     
     old_name = clan["name"]
     await update_clan_name(clan["id"], new_name)
+    clan_search_index.rename(clan["tag"], new_name)
+    invalidate_clan_cards(clan["id"])
     await log_clan_action(
         clan["id"], user_id, "rename",
         f"Изменено название с '{old_name}' на '{new_name}'"
@@ -571,6 +624,8 @@ async def transfer_clan_handler(message: Message, user: str):
         f"Передача клана [{clan['tag']}] игроку {target_player['username']}",
         None,
     )
+    player_table.add(user_id, balance=-TRANSFER_COST)
+    invalidate_player_card(user_id)
     
     # Передаем клан
     await db.clans.update_one(
@@ -588,11 +643,14 @@ async def transfer_clan_handler(message: Message, user: str):
         {"user_id": target_id},
         {"$set": {"clan_role": "owner"}}  # Новый владелец
     )
+    invalidate_top_contributors(clan["id"])
+    invalidate_player_card(target_id)
     
     # Логируем передачу
     await log_clan_action(
         clan["id"], user_id, "transfer",
-        f"Передал клан игроку [id{target_id}|{target_player['username']}] за {format_number(TRANSFER_COST)} монет"
+        f"Передал клан игроку [id{target_id}|{target_player['username']}] за {format_number(TRANSFER_COST)} монет",
+        player["username"],
     )
     
     return (
@@ -617,10 +675,13 @@ async def join_clan_handler(message: Message, tag: str):
     if player.get("clan_id"):
         return "❌ Вы уже состоите в клане! Сначала покиньте текущий клан."
     
-    # Ищем клан по тегу
+    # Ищем клан по тегу (неизвестный индексу тег не требует запроса к базе)
+    if clan_search_index.loaded and not clan_search_index.has_tag(tag):
+        return format_clan_not_found(tag)
+    
     clan = await get_clan_by_tag(tag.upper())
     if not clan:
-        return f"❌ Клан с тегом [{tag.upper()}] не найден!"
+        return format_clan_not_found(tag)
     
     # Проверяем требования клана
     requirements = await get_clan_requirements(clan["id"])
@@ -632,8 +693,7 @@ async def join_clan_handler(message: Message, tag: str):
         return f"❌ Для вступления требуется {min_level} уровень гантели!\n📊 Ваш уровень: {player_level}"
     
     # Проверяем список исключенных
-    banned_players = clan.get("banned_players", [])
-    if user_id in banned_players:
+    if await is_banned_from_clan(clan["id"], user_id):
         return "❌ Вы были исключены из этого клана!\n💡 Обратитесь к владельцу для восстановления."
     
     # Получаем бонусы клана для проверки лимита участников
@@ -650,7 +710,7 @@ async def join_clan_handler(message: Message, tag: str):
         {"$set": {
             "clan_id": clan["id"],
             "clan_role": "member",
-            "clan_joined_at": datetime.now().isoformat()
+            "clan_joined_at": now_ts()
         }}
     )
     
@@ -659,18 +719,25 @@ async def join_clan_handler(message: Message, tag: str):
         {"_id": clan["id"]},
         {"$inc": {"member_count": 1}}
     )
+    invalidate_top_contributors(clan["id"])
+    invalidate_player_card(user_id)
     
     await log_clan_action(
         clan["id"], user_id, "join",
-        "Вступил в клан"
+        "Вступил в клан",
+        player["username"],
     )
     
     # Отправляем приветственное сообщение если есть
-    greeting = clan.get("settings", {}).get("greeting")
-    if greeting:
-        greeting = greeting.replace("{player}", player["username"])
-        greeting = greeting.replace("{clan}", clan["name"])
-        greeting = greeting.replace("{tag}", clan["tag"])
+    greeting = None
+    greeting_template = await get_clan_greeting(clan["id"])
+    if greeting_template:
+        greeting = render_greeting(
+            greeting_template,
+            player=player["username"],
+            clan=clan["name"],
+            tag=clan["tag"],
+        )
     
     welcome_text = (
         f"🎉 Добро пожаловать в клан!\n\n"
@@ -735,13 +802,7 @@ async def kick_member_handler(message: Message, user: str):
         return "❌ Офицер не может исключить другого офицера!"
     
     # Добавляем в список исключенных
-    banned_players = clan.get("banned_players", [])
-    if target_id not in banned_players:
-        banned_players.append(target_id)
-        await db.clans.update_one(
-            {"_id": clan["id"]},
-            {"$set": {"banned_players": banned_players}}
-        )
+    await ban_from_clan(clan["id"], target_id, user_id)
     
     # Исключаем участника
     await db.players.update_one(
@@ -754,6 +815,8 @@ async def kick_member_handler(message: Message, user: str):
         {"_id": clan["id"]},
         {"$inc": {"member_count": -1}}
     )
+    invalidate_top_contributors(clan["id"])
+    invalidate_player_card(target_id)
     
     target_player = await get_player(target_id)
     await log_clan_action(
@@ -799,14 +862,7 @@ async def restore_member_handler(message: Message, user: str):
         return "❌ Укажите ID пользователя или упоминание!"
     
     # Убираем из списка исключенных
-    banned_players = clan.get("banned_players", [])
-    if target_id in banned_players:
-        banned_players.remove(target_id)
-        await db.clans.update_one(
-            {"_id": clan["id"]},
-            {"$set": {"banned_players": banned_players}}
-        )
-        
+    if await unban_from_clan(clan["id"], target_id):
         target_player = await get_player(target_id)
         await log_clan_action(
             clan["id"], user_id, "restore",
@@ -854,10 +910,13 @@ async def leave_clan_handler(message: Message):
         {"_id": clan["id"]},
         {"$inc": {"member_count": -1}}
     )
+    invalidate_top_contributors(clan["id"])
+    invalidate_player_card(user_id)
     
     await log_clan_action(
         clan["id"], user_id, "leave",
-        "Покинул клан"
+        "Покинул клан",
+        player["username"],
     )
     
     return (
@@ -946,7 +1005,7 @@ async def clan_detailed_roster_handler(message: Message):
     
     text += f"\n📈 Всего участников: {len(members)}"
     
-    await message.answer(text, disable_mentions=True)
+    await reply(message, text, disable_mentions=True)
 
 
 @clan_labeler.message(text=["к назначить <user>", "/к назначить <user>"])
@@ -1000,6 +1059,8 @@ async def assign_officer_handler(message: Message, user: str):
         {"user_id": target_id},
         {"$set": {"clan_role": "officer"}}
     )
+    invalidate_top_contributors(clan["id"])
+    invalidate_player_card(target_id)
     
     target_player = await get_player(target_id)
     await log_clan_action(
@@ -1072,6 +1133,8 @@ async def demote_member_handler(message: Message, user: str):
         {"user_id": target_id},
         {"$set": {"clan_role": "member"}}
     )
+    invalidate_top_contributors(clan["id"])
+    invalidate_player_card(target_id)
     
     target_player = await get_player(target_id)
     await log_clan_action(
@@ -1125,6 +1188,8 @@ async def clan_distribute_all_handler(message: Message, amount: str):
             f"Распределение из казны клана [{clan['tag']}]",
             None,
         )
+        player_table.add(member["user_id"], balance=amount_per_member)
+        invalidate_player_card(member["user_id"])
         distributed.append(
             f"[id{member['user_id']}|{member['username']}]: {format_number(amount_per_member)} монет"
         )
@@ -1133,17 +1198,20 @@ async def clan_distribute_all_handler(message: Message, amount: str):
     await subtract_treasury(clan["id"], total_amount)
     
     # Логируем операцию
-    await log_collection_with_user(
+    player = await get_player(user_id)
+    queue_treasury_log(
         clan["id"],
         user_id,
         "distribution",
         total_amount,
         f"Распределение {format_number(amount_per_member)} монет каждому участнику",
+        player["username"],
     )
     
     await log_clan_action(
         clan["id"], user_id, "distribute_all",
-        f"Распределил {format_number(total_amount)} монет всем участникам"
+        f"Распределил {format_number(total_amount)} монет всем участникам",
+        player["username"],
     )
     
     return (
@@ -1179,17 +1247,12 @@ async def clan_distribute_top_handler(message: Message, amount: str):
     if not has_permission:
         return error_msg
     
-    # Получаем топ участников по вкладам
-    members = await get_clan_members(clan["id"])
-    if not members:
+    # Получаем топ-3 участников по вкладам (или меньше если участников меньше)
+    top_members = await get_top_contributors(clan["id"], 3)
+    if not top_members:
         return "❌ В клане нет участников!"
     
-    # Сортируем по вкладам (по убыванию)
-    members.sort(key=lambda x: x.get("contributions", 0), reverse=True)
-    
-    # Берем топ-3 (или меньше если участников меньше)
-    top_n = min(3, len(members))
-    top_members = members[:top_n]
+    top_n = len(top_members)
     
     total_amount = amount_per_member * len(top_members)
     
@@ -1210,6 +1273,8 @@ async def clan_distribute_top_handler(message: Message, amount: str):
             f"Топ-распределение из казны [{clan['tag']}]",
             None,
         )
+        player_table.add(member["user_id"], balance=amount_per_member)
+        invalidate_player_card(member["user_id"])
         distributed.append(
             f"[id{member['user_id']}|{member['username']}]: {format_number(amount_per_member)} монет"
         )
@@ -1218,17 +1283,20 @@ async def clan_distribute_top_handler(message: Message, amount: str):
     await subtract_treasury(clan["id"], total_amount)
     
     # Логируем операцию
-    await log_collection_with_user(
+    player = await get_player(user_id)
+    queue_treasury_log(
         clan["id"],
         user_id,
         "distribution_top",
         total_amount,
         f"Топ-распределение {format_number(amount_per_member)} монет топ-{top_n} участникам",
+        player["username"],
     )
     
     await log_clan_action(
         clan["id"], user_id, "distribute_top",
-        f"Распределил {format_number(total_amount)} монет топ-{top_n} участникам"
+        f"Распределил {format_number(total_amount)} монет топ-{top_n} участникам",
+        player["username"],
     )
     
     return (
@@ -1314,9 +1382,12 @@ async def player_contributions_handler(message: Message, user: str = ""):
 @clan_labeler.message(text=["к инфо <tag>", "/к инфо <tag>"])
 async def clan_info_handler(message: Message, tag: str):
     """Информация о любом клане"""
-    clan = await get_clan_by_tag(tag.upper())
+    if clan_search_index.loaded and not clan_search_index.has_tag(tag):
+        return format_clan_not_found(tag)
+    
+    clan = with_pending_clan_lifts(await get_clan_by_tag(tag.upper()))
     if not clan:
-        return f"❌ Клан с тегом [{tag.upper()}] не найден!"
+        return format_clan_not_found(tag)
     
     # Получаем владельца
     owner = await get_player(clan["owner_id"])
@@ -1329,7 +1400,7 @@ async def clan_info_handler(message: Message, tag: str):
     clan_bonuses = get_clan_bonuses(clan["level"])
     
     # Форматируем дату создания
-    created_date = datetime.fromisoformat(clan["created_at"]).strftime("%d.%m.%Y")
+    created_date = format_ts(clan["created_at"], "%d.%m.%Y")
     
     # Получаем требования
     requirements = await get_clan_requirements(clan["id"])
@@ -1358,21 +1429,37 @@ async def clan_info_handler(message: Message, tag: str):
     
     response += f"💡 Для вступления: К вступить {clan['tag']}"
     
-    await message.answer(response, disable_mentions=True)
+    await reply(message, response, disable_mentions=True)
 
 
 @clan_labeler.message(text=["к поиск <tag>", "/к поиск <tag>"])
 async def clan_search_handler(message: Message, tag: str):
-    """Поиск клана по тегу"""
-    if len(tag) < 3:
-        return "❌ Тег должен содержать 3 буквы!"
-    
-    clan = await get_clan_by_tag(tag.upper())
-    if not clan:
-        return f"❌ Клан с тегом [{tag.upper()}] не найден!"
+    """Поиск клана по тегу или названию"""
+    query = tag.strip()
+    if len(query) < 2:
+        return "❌ Запрос должен содержать минимум 2 символа!"
+    
+    # Индекс еще не построен (или не построился) - ищем точный тег в базе, как раньше
+    if not clan_search_index.loaded:
+        if await get_clan_by_tag(query.upper()):
+            return await clan_info_handler(message, query.upper())
+        return format_clan_not_found(query)
+    
+    # Точное совпадение тега - сразу показываем клан
+    if clan_search_index.has_tag(query):
+        # Используем уже существующий обработчик для показа информации
+        return await clan_info_handler(message, query.upper())
+    
+    # Совпадение по началу тега, названия или слова в названии
+    matches = clan_search_index.prefix_search(query, 10)
+    if matches:
+        return (
+            f"🔎 Найденные кланы по запросу \"{query}\":\n\n"
+            + "\n".join(f"🔸 [{found_tag}] {name}" for found_tag, name in matches)
+            + "\n\n💡 Подробнее: К инфо [ТЭГ]"
+        )
     
-    # Используем уже существующий обработчик для показа информации
-    return await clan_info_handler(message, clan["tag"])
+    return format_clan_not_found(query)
 
 
 @clan_labeler.message(text=["к описание <description>", "/к описание <description>"])
@@ -1431,9 +1518,7 @@ async def clan_requirements_handler(message: Message, level: str):
         return "❌ Уровень должен быть числом!"
     
     # Устанавливаем требования
-    clan_settings = clan.get("settings", {})
-    clan_settings["requirements"] = {"min_level": min_level}
-    await update_clan_settings(clan["id"], clan_settings)
+    await update_clan_setting(clan["id"], "requirements", {"min_level": min_level})
     
     await log_clan_action(
         clan["id"], user_id, "set_requirements",
@@ -1464,9 +1549,7 @@ async def clan_greeting_handler(message: Message, greeting: str):
     
     if greeting.lower() == "нет" or greeting.lower() == "off":
         # Убираем приветствие
-        clan_settings = clan.get("settings", {})
-        clan_settings["greeting"] = None
-        await update_clan_settings(clan["id"], clan_settings)
+        await update_clan_setting(clan["id"], "greeting", None)
         
         await log_clan_action(
             clan["id"], user_id, "remove_greeting",
@@ -1480,9 +1563,7 @@ async def clan_greeting_handler(message: Message, greeting: str):
         return "❌ Приветствие не должно превышать 200 символов!"
     
     # Устанавливаем приветствие
-    clan_settings = clan.get("settings", {})
-    clan_settings["greeting"] = greeting
-    await update_clan_settings(clan["id"], clan_settings)
+    await update_clan_setting(clan["id"], "greeting", greeting)
     
     await log_clan_action(
         clan["id"], user_id, "set_greeting",
@@ -1519,10 +1600,9 @@ async def clan_log_handler(message: Message):
     log_text = f"📜 ЛОГ ДЕЙСТВИЙ КЛАНА [{clan['tag']}]\n\n"
     
     for entry in log_entries:
-        user = await get_player(entry["user_id"])
-        username = user["username"] if user else "Неизвестно"
+        username = entry["username"] or "Неизвестно"
         
-        time = datetime.fromisoformat(entry["created_at"]).strftime("%d.%m %H:%M")
+        time = format_ts(entry["created_at"], "%d.%m %H:%M")
         
         action_icons = {
             "kick": "👢",
@@ -1546,269 +1626,175 @@ async def clan_log_handler(message: Message):
         
         log_text += f"{icon} {time} [id{entry['user_id']}|{username}]: {entry['details']}\n"
     
-    await message.answer(log_text, disable_mentions=True)
+    await reply(message, log_text, disable_mentions=True)
 
 
 # ======================
 # КОМАНДА ПОМОЩИ С КНОПКАМИ
 # ======================
+# Разделы справки переключаются callback-кнопками: сообщение со справкой
+# редактируется на месте, в чат ничего не отправляется.
+
+# Ключ раздела -> (текст кнопки, цвет кнопки, справка)
+CLAN_HELP_SECTIONS = {
+    "c.creation": (
+        "🏰 Создание и роспуск",
+        KeyboardButtonColor.PRIMARY,
+        (
+            "🏰 СОЗДАНИЕ И РАСПУСК\n\n"
+            "🎯 К создать [ТЭГ] [название]\n"
+            "🎯 К распустить\n"
+            "🎯 К распустить подтвердить\n\n"
+            "🏷️ 3 английские буквы\n"
+            "📝 3-20 символов\n"
+            "💸 300 монет\n\n"
+            "📌 К создать LEG Легенда\n"
+            "⚠️ Необратимо!"
+        ),
+    ),
+    "c.basic": (
+        "🗂️ Основные команды",
+        KeyboardButtonColor.POSITIVE,
+        (
+            "🗂️ ОСНОВНЫЕ КОМАНДЫ\n\n"
+            "👑 К или К профиль\n"
+            "👑 К топ\n"
+            "👑 К казна\n"
+            "👑 К вклады [@игрок]\n\n"
+            "📊 Доступно всем участникам\n"
+            "👀 Основная информация о клане"
+        ),
+    ),
+    "c.roster": (
+        "👑 Управление составом",
+        KeyboardButtonColor.PRIMARY,
+        (
+            "👥 УПРАВЛЕНИЕ СОСТАВОМ\n\n"
+            "🎯 К список\n"
+            "🎯 К состав\n"
+            "🎯 К вступить [ТЭГ]\n"
+            "🎯 К покинуть\n"
+            "🎯 К кик [@игрок]\n"
+            "🎯 К восстановить [@игрок]\n\n"
+            "👢 К кик [id123|Игрок]\n"
+            "✅ К восстановить [id123|Игрок]\n"
+            "🎯 К вступить LEG"
+        ),
+    ),
+    "c.treasury": (
+        "💲 Управление казной",
+        KeyboardButtonColor.PRIMARY,
+        (
+            "💰 УПРАВЛЕНИЕ КАЗНОЙ\n\n"
+            "🎯 К положить [сумма]\n"
+            "🎯 К снять [сумма]\n"
+            "🎯 К распределить всем [сумма]\n"
+            "🎯 К распределить топ [сумма]\n\n"
+            "👑 Владелец и офицеры\n"
+            "📈 К распределить всем 1000\n"
+            "🏆 К распределить топ 5000\n"
+            "💵 К положить 10000"
+        ),
+    ),
+    "c.owner": (
+        "🤴 Команды владельца",
+        KeyboardButtonColor.NEGATIVE,
+        (
+            "🤴 КОМАНДЫ ВЛАДЕЛЬЦА\n\n"
+            "🎯 К улучшить 1\n"
+            "🎯 К улучшить максимум\n"
+            "🎯 К переименовать [название]\n"
+            "🎯 К описание [текст]\n"
+            "🎯 К требование [уровень]\n"
+            "🎯 К приветствие [текст]\n"
+            "🎯 К приветствие нет\n"
+            "🎯 К лог\n"
+            "🎯 К передать [@игрок]\n\n"
+            "⭐ Больше % от бизнесов\n"
+            "⭐ Больше монет с поднятий\n"
+            "📝 К описание Лучший клан!\n"
+            "🎯 К требование 5"
+        ),
+    ),
+    "c.roles": (
+        "👷‍♂️ Управление ролями",
+        KeyboardButtonColor.SECONDARY,
+        (
+            "⭐ УПРАВЛЕНИЕ РОЛЯМИ\n\n"
+            "🎯 К назначить [@игрок]\n"
+            "🎯 К снять [@игрок]\n\n"
+            "👑 Только владелец\n"
+            "⭐ Офицеры могут:\n"
+            "👢 Исключать участников\n"
+            "💸 Снимать деньги\n"
+            "💰 Распределять казну\n"
+            "📜 Просматривать лог\n"
+            "⚙️ Менять настройки\n\n"
+            "📌 К назначить [id123|Игрок]\n"
+            "📉 К снять [id123|Игрок]"
+        ),
+    ),
+    "c.search": (
+        "🔎 Поиск и инфо",
+        KeyboardButtonColor.SECONDARY,
+        (
+            "🔍 ПОИСК И ИНФО\n\n"
+            "🎯 К инфо [ТЭГ]\n"
+            "🎯 К поиск [ТЭГ]\n\n"
+            "👀 Доступно всем игрокам\n"
+            "🏷️ 3 английские буквы\n\n"
+            "📊 К инфо LEG\n"
+            "🔎 К поиск GYM\n\n"
+            "📋 Показывает:\n"
+            "🏷️ Название и владелец\n"
+            "⭐ Уровень и участники\n"
+            "💰 Казна и требования\n"
+            "📝 Описание и бонусы"
+        ),
+    ),
+}
+
+# Кнопки главного меню справки по рядам
+CLAN_HELP_LAYOUT = (
+    ("c.creation",),
+    ("c.basic", "c.roster"),
+    ("c.treasury", "c.owner"),
+    ("c.roles", "c.search"),
+)
 
 
-@clan_labeler.message(text=["к помощь", "К помощь", "клан помощь", "Клан помощь"])
-async def clan_help_handler(message: Message):
-    """Справка по командам клана с интерактивными кнопками"""
-    global last_help_message_id
-    
-    # Получаем имя игрока
-    user_id = message.from_id
-    player = await get_player(user_id)
-    player_name = player["username"] if player else "Игрок"
-    
-    # Проверяем, состоит ли игрок в клане
-    clan_info = ""
-    clan = await get_player_clan(user_id)
-    if clan:
-        # Получаем бонусы клана
-        clan_bonuses = get_clan_bonuses(clan["level"])
-        member_count = await get_clan_member_count(clan["id"])
-        
-        clan_info = (
-            f"\n📊 Вы состоите в клане [{clan['tag']}] {clan['name']}\n"
-            f"⭐ Уровень: {clan['level']}\n"
-            f"👥 Участников: {member_count}\n"
-            f"💰 Казна: {format_number(clan['treasury'])} монет\n"
-        )
-    else:
-        clan_info = "\n📊 Вы не состоите в клане\n💡 Создайте свой клан: К создать [ТЭГ] [название]"
-    
-    # Создаем клавиатуру с кнопками
+def create_clan_help_keyboard(user_id: int):
+    """Главное меню справки по кланам"""
     keyboard = Keyboard(one_time=False, inline=True)
-    
-    # 1. Главная кнопка - Создание и роспуск (синяя, большая, сверху по центру)
-    keyboard.row()
-    keyboard.add(Text("🏰 Создание и роспуск"), color=KeyboardButtonColor.PRIMARY)
-    
-    # 2-3. Второй ряд: Основные команды (справа) и Управление составом (слева)
-    keyboard.row()
-    keyboard.add(Text("🗂️ Основные команды"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("👑 Управление составом"), color=KeyboardButtonColor.PRIMARY)
-    
-    # 4-5. Третий ряд: Управление казной (справа) и Команды владельца (слева)
-    keyboard.row()
-    keyboard.add(Text("💲 Управление казной"), color=KeyboardButtonColor.PRIMARY)
-    keyboard.add(Text("🤴 Команды владельца"), color=KeyboardButtonColor.NEGATIVE)
-    
-    # 6-7. Четвертый ряд: Управление ролями (справа) и Поиск и инфо (слева)
-    keyboard.row()
-    keyboard.add(Text("👷‍♂️ Управление ролями"), color=KeyboardButtonColor.SECONDARY)
-    keyboard.add(Text("🔎 Поиск и инфо"), color=KeyboardButtonColor.SECONDARY)
-    
-    # Основное сообщение с инструкцией
-    help_text = (
-        "📋 Список команд кланов 📋\n"
-        "𝐆𝐘𝐌 𝐋𝐄𝐆𝐄𝐍𝐃\n\n"
-        f"👤 [id{user_id}|{player_name}], выберите нужную категорию команд:\n\n"
-        f"{clan_info}\n\n"
-        "👇 Нажмите на кнопку ниже"
-    )
-    
-    # Если есть предыдущее сообщение - редактируем его
-    if last_help_message_id:
-        try:
-            await message.ctx_api.messages.edit(
-                peer_id=message.peer_id,
-                conversation_message_id=last_help_message_id,
-                message=help_text,
-                keyboard=keyboard.get_json(),
-                keep_forward_messages=True,
-                keep_snippets=True,
-                dont_parse_links=True
-            )
-            return
-        except:
-            pass  # Если не удалось отредактировать - отправляем новое
-    
-    # Отправляем новое сообщение
-    msg = await message.answer(help_text, keyboard=keyboard.get_json())
-    # Сохраняем ID сообщения для будущего редактирования
-    last_help_message_id = msg.conversation_message_id
+    for i, row in enumerate(CLAN_HELP_LAYOUT):
+        if i:
+            keyboard.row()
+        for section in row:
+            label, color, _ = CLAN_HELP_SECTIONS[section]
+            callback_button(keyboard, label, section, user_id, color)
+    return keyboard
 
 
-@clan_labeler.message(text="🏰 Создание и роспуск")
-async def creation_disband_help_handler(message: Message):
-    """Справка по созданию и роспуску клана"""
-    help_text = (
-        "🏰 СОЗДАНИЕ И РАСПУСК\n\n"
-        "🎯 К создать [ТЭГ] [название]\n"
-        "🎯 К распустить\n"
-        "🎯 К распустить подтвердить\n\n"
-        "🏷️ 3 английские буквы\n"
-        "📝 3-20 символов\n"
-        "💸 300 монет\n\n"
-        "📌 К создать LEG Легенда\n"
-        "⚠️ Необратимо!"
-    )
-    await show_help_with_back_button(message, help_text, "creation_disband")
-
-
-@clan_labeler.message(text="🗂️ Основные команды")
-async def basic_commands_help_handler(message: Message):
-    """Справка по основным командам"""
-    help_text = (
-        "🗂️ ОСНОВНЫЕ КОМАНДЫ\n\n"
-        "👑 К или К профиль\n"
-        "👑 К топ\n"
-        "👑 К казна\n"
-        "👑 К вклады [@игрок]\n\n"
-        "📊 Доступно всем участникам\n"
-        "👀 Основная информация о клане"
-    )
-    await show_help_with_back_button(message, help_text, "basic_commands")
+def create_clan_help_back_keyboard(user_id: int):
+    """Кнопка возврата к главному меню справки"""
+    keyboard = Keyboard(one_time=False, inline=True)
+    callback_button(keyboard, "⬅️ Назад", "c.main", user_id, KeyboardButtonColor.SECONDARY)
+    return keyboard
 
 
-@clan_labeler.message(text="👑 Управление составом")
-async def roster_management_help_handler(message: Message):
-    """Справка по управлению составом"""
-    help_text = (
-        "👥 УПРАВЛЕНИЕ СОСТАВОМ\n\n"
-        "🎯 К список\n"
-        "🎯 К состав\n"
-        "🎯 К вступить [ТЭГ]\n"
-        "🎯 К покинуть\n"
-        "🎯 К кик [@игрок]\n"
-        "🎯 К восстановить [@игрок]\n\n"
-        "👢 К кик [id123|Игрок]\n"
-        "✅ К восстановить [id123|Игрок]\n"
-        "🎯 К вступить LEG"
-    )
-    await show_help_with_back_button(message, help_text, "roster_management")
-
-
-@clan_labeler.message(text="💲 Управление казной")
-async def treasury_management_help_handler(message: Message):
-    """Справка по управлению казной"""
-    help_text = (
-        "💰 УПРАВЛЕНИЕ КАЗНОЙ\n\n"
-        "🎯 К положить [сумма]\n"
-        "🎯 К снять [сумма]\n"
-        "🎯 К распределить всем [сумма]\n"
-        "🎯 К распределить топ [сумма]\n\n"
-        "👑 Владелец и офицеры\n"
-        "📈 К распределить всем 1000\n"
-        "🏆 К распределить топ 5000\n"
-        "💵 К положить 10000"
-    )
-    await show_help_with_back_button(message, help_text, "treasury_management")
-
-
-@clan_labeler.message(text="🤴 Команды владельца")
-async def clan_settings_help_handler(message: Message):
-    """Справка по командам владельца"""
-    help_text = (
-        "🤴 КОМАНДЫ ВЛАДЕЛЬЦА\n\n"
-        "🎯 К улучшить 1\n"
-        "🎯 К улучшить максимум\n"
-        "🎯 К переименовать [название]\n"
-        "🎯 К описание [текст]\n"
-        "🎯 К требование [уровень]\n"
-        "🎯 К приветствие [текст]\n"
-        "🎯 К приветствие нет\n"
-        "🎯 К лог\n"
-        "🎯 К передать [@игрок]\n\n"
-        "⭐ Больше % от бизнесов\n"
-        "⭐ Больше монет с поднятий\n"
-        "📝 К описание Лучший клан!\n"
-        "🎯 К требование 5"
-    )
-    await show_help_with_back_button(message, help_text, "clan_settings")
-
-
-@clan_labeler.message(text="👷‍♂️ Управление ролями")
-async def role_management_help_handler(message: Message):
-    """Справка по управлению ролями"""
-    help_text = (
-        "⭐ УПРАВЛЕНИЕ РОЛЯМИ\n\n"
-        "🎯 К назначить [@игрок]\n"
-        "🎯 К снять [@игрок]\n\n"
-        "👑 Только владелец\n"
-        "⭐ Офицеры могут:\n"
-        "👢 Исключать участников\n"
-        "💸 Снимать деньги\n"
-        "💰 Распределять казну\n"
-        "📜 Просматривать лог\n"
-        "⚙️ Менять настройки\n\n"
-        "📌 К назначить [id123|Игрок]\n"
-        "📉 К снять [id123|Игрок]"
-    )
-    await show_help_with_back_button(message, help_text, "role_management")
-
-
-@clan_labeler.message(text="🔎 Поиск и инфо")
-async def search_info_help_handler(message: Message):
-    """Справка по поиску и информации"""
-    help_text = (
-        "🔍 ПОИСК И ИНФО\n\n"
-        "🎯 К инфо [ТЭГ]\n"
-        "🎯 К поиск [ТЭГ]\n\n"
-        "👀 Доступно всем игрокам\n"
-        "🏷️ 3 английские буквы\n\n"
-        "📊 К инфо LEG\n"
-        "🔎 К поиск GYM\n\n"
-        "📋 Показывает:\n"
-        "🏷️ Название и владелец\n"
-        "⭐ Уровень и участники\n"
-        "💰 Казна и требования\n"
-        "📝 Описание и бонусы"
-    )
-    await show_help_with_back_button(message, help_text, "search_info")
-
-
-# Функция для показа справки с кнопкой "Назад"
-async def show_help_with_back_button(message: Message, help_text: str, section: str):
-    """Показать справку с кнопкой возврата к главному меню"""
-    global last_help_message_id
-    
-    # Добавляем красивый заголовок к каждой секции
-    formatted_text = f"📚 КОМАНДЫ КЛАНА\n\n{help_text}\n\n👇 Нажмите 'Назад' чтобы вернуться"
-    
-    keyboard = Keyboard(one_time=False, inline=True)
-    keyboard.add(Text("⬅️ Назад"), color=KeyboardButtonColor.SECONDARY)
-    
-    # Редактируем существующее сообщение
-    if last_help_message_id:
-        try:
-            await message.ctx_api.messages.edit(
-                peer_id=message.peer_id,
-                conversation_message_id=last_help_message_id,
-                message=formatted_text,
-                keyboard=keyboard.get_json(),
-                keep_forward_messages=True,
-                keep_snippets=True,
-                dont_parse_links=True
-            )
-        except Exception as e:
-            # Если не удалось отредактировать, отправляем новое
-            msg = await message.answer(formatted_text, keyboard=keyboard.get_json())
-            last_help_message_id = msg.conversation_message_id
+menu_assets.register("c.main", lambda admin_level, has_info_access, owner: create_clan_help_keyboard(owner))
+menu_assets.register("c.back", lambda admin_level, has_info_access, owner: create_clan_help_back_keyboard(owner))
 
 
-# Обработчик возврата к главному меню
-@clan_labeler.message(text="⬅️ Назад")
-async def back_to_main_help_handler(message: Message):
-    """Вернуться к главному меню команд"""
-    global last_help_message_id
-    
-    # Получаем имя игрока
-    user_id = message.from_id
+@callback_menus.section("c.main")
+async def clan_help_menu(user_id: int):
+    """Главное меню справки: имя игрока и его клан"""
     player = await get_player(user_id)
     player_name = player["username"] if player else "Игрок"
     
     # Проверяем, состоит ли игрок в клане
-    clan_info = ""
     clan = await get_player_clan(user_id)
     if clan:
-        # Получаем бонусы клана
-        clan_bonuses = get_clan_bonuses(clan["level"])
         member_count = await get_clan_member_count(clan["id"])
         
         clan_info = (
@@ -1820,28 +1806,6 @@ async def back_to_main_help_handler(message: Message):
     else:
         clan_info = "\n📊 Вы не состоите в клане\n💡 Создайте свой клан: К создать [ТЭГ] [название]"
     
-    # Создаем клавиатуру с кнопками
-    keyboard = Keyboard(one_time=False, inline=True)
-    
-    # 1. Главная кнопка - Создание и роспуск (синяя, большая, сверху по центру)
-    keyboard.row()
-    keyboard.add(Text("🏰 Создание и роспуск"), color=KeyboardButtonColor.PRIMARY)
-    
-    # 2-3. Второй ряд: Основные команды (справа) и Управление составом (слева)
-    keyboard.row()
-    keyboard.add(Text("🗂️ Основные команды"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("👑 Управление составом"), color=KeyboardButtonColor.PRIMARY)
-    
-    # 4-5. Третий ряд: Управление казной (справа) и Команды владельца (слева)
-    keyboard.row()
-    keyboard.add(Text("💲 Управление казной"), color=KeyboardButtonColor.PRIMARY)
-    keyboard.add(Text("🤴 Команды владельца"), color=KeyboardButtonColor.NEGATIVE)
-    
-    # 6-7. Четвертый ряд: Управление ролями (справа) и Поиск и инфо (слева)
-    keyboard.row()
-    keyboard.add(Text("👷‍♂️ Управление ролями"), color=KeyboardButtonColor.SECONDARY)
-    keyboard.add(Text("🔎 Поиск и инфо"), color=KeyboardButtonColor.SECONDARY)
-    
     help_text = (
         "📋 Список команд кланов 📋\n"
         "𝐆𝐘𝐌 𝐋𝐄𝐆𝐄𝐍𝐃\n\n"
@@ -1850,23 +1814,26 @@ async def back_to_main_help_handler(message: Message):
         "👇 Нажмите на кнопку ниже"
     )
     
-    # Редактируем существующее сообщение
-    if last_help_message_id:
-        try:
-            await message.ctx_api.messages.edit(
-                peer_id=message.peer_id,
-                conversation_message_id=last_help_message_id,
-                message=help_text,
-                keyboard=keyboard.get_json(),
-                keep_forward_messages=True,
-                keep_snippets=True,
-                dont_parse_links=True
-            )
-        except:
-            # Если не удалось отредактировать, отправляем новое
-            msg = await message.answer(help_text, keyboard=keyboard.get_json())
-            last_help_message_id = msg.conversation_message_id
-    else:
-        # Если нет сохраненного ID, отправляем новое
-        msg = await message.answer(help_text, keyboard=keyboard.get_json())
-        last_help_message_id = msg.conversation_message_id
+    return help_text, menu_assets.get("c.main", owner=user_id)
+
+
+def clan_help_section(section: str):
+    """Раздел справки с кнопкой возврата к главному меню (без запросов к базе)"""
+    _, _, help_text = CLAN_HELP_SECTIONS[section]
+    formatted_text = f"📚 КОМАНДЫ КЛАНА\n\n{help_text}\n\n👇 Нажмите 'Назад' чтобы вернуться"
+
+    async def show_section(user_id: int):
+        return formatted_text, menu_assets.get("c.back", owner=user_id)
+
+    return show_section
+
+
+for section in CLAN_HELP_SECTIONS:
+    callback_menus.section(section)(clan_help_section(section))
+
+
+@clan_labeler.message(text=["к помощь", "К помощь", "клан помощь", "Клан помощь"])
+async def clan_help_handler(message: Message):
+    """Справка по командам клана с интерактивными кнопками"""
+    help_text, keyboard = await clan_help_menu(message.from_id)
+    await reply(message, help_text, keyboard=keyboard)
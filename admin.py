@@ -2,7 +2,6 @@ from datetime import datetime, timedelta
 import asyncio
 from vkbottle.bot import BotLabeler, Message, Keyboard, KeyboardButtonColor, Text
 from vkbottle.dispatch.rules import ABCRule
-from vkbottle import API
 
 from bot.core.config import settings
 from bot.db import (
@@ -17,20 +16,24 @@ from bot.db import (
     create_promo_code,
     delete_clan,
     delete_player,
+    forget_admin_id,
+    archive_player,
+    get_archived_player,
+    restore_player_row,
     delete_promo_code,
     get_clan_by_tag,
     get_clan_member_count,
     get_clan_members,
-    get_clan_treasury_log,
+    get_recent_treasury_log,
     get_player,
     get_promo_info,
     get_recent_players,
     increment_admin_stat,
     make_admin,
     remove_admin,
-    reset_all,
     set_admin_nickname,
     set_custom_income,
+    set_lift_cooldown,
     set_dumbbell_level,
     set_total_lifts,
     sum_column,
@@ -71,20 +74,39 @@ from bot.db import (
     reset_broadcast_usage,
     check_broadcast_limit,
     get_admin_level,
+    is_known_admin,
     get_moderator_promo_stats,
     update_moderator_promo_stats,
     get_promo_usage_stats,
     update_promo_usage_stats,
     cleanup_old_requests,
+    invalidate_top_contributors,
+    invalidate_clan_cards,
+    invalidate_player_card,
+    delete_clan_bans,
 )
 
-from bot.services.clans import get_clan_bonuses
+from bot.models import SECONDS_PER_DAY, days_since, days_until, format_ts, now_ts, to_ts
+from bot.services.clan_bonuses import get_clan_bonuses
+from bot.services.callback_menu import callback_button, callback_menus
+from bot.services.menu_assets import menu_assets
+from bot.services.clan_search import clan_search_index
+from bot.services.lifecycle import lifecycle
+from bot.services.lift_cooldown import lift_cooldowns
+from bot.services.outbox import broadcast, notifier, reply
+from bot.services.player_table import player_table
+from bot.services.season_archive import get_season_player
+from bot.services.season_reset import is_season_reset_running, start_season_reset
 from bot.services.users import is_admin
 from bot.utils import format_number, pointer_to_screen_name
 
 
 class AdminRule(ABCRule[Message]):
     async def check(self, event: Message) -> bool:
+        # Сначала список администраторов в памяти, в базу - только пока он не загружен
+        known = is_known_admin(event.from_id)
+        if known is not None:
+            return known
         return await is_admin(event.from_id)
 
 
@@ -168,6 +190,7 @@ async def log_admin_action(
         "add_balance": "economy",
         "set_power": "economy",
         "set_custom_income": "economy",
+        "set_lift_cooldown": "economy",
         "set_lifts": "economy",
         "create_promo": "economy",
         "delete_promo": "economy",
@@ -188,6 +211,7 @@ async def log_admin_action(
         "permaban": "bans",
         "unban": "bans",
         "delete_player": "main",
+        "restore_player": "main",
         "change_username": "main",
         "set_admin_nickname": "main"
     }
@@ -263,184 +287,238 @@ async def create_moderator_request(
 # ======================
 # ФУНКЦИИ ДЛЯ КЛАВИАТУР
 # ======================
-
-def create_main_admin_keyboard(admin_level: int):
+# Переходы между разделами - callback-кнопки (меню редактируется на месте,
+# без сообщения в чат и текстовых команд), команды без аргументов - текстовые
+# кнопки с самой командой, команды с аргументами - подсказки с их форматом.
+
+ADMIN_COMMAND_HINTS = {
+    "a.h.dumbbell": "Лгантеля [айди] [уровень]",
+    "a.h.balance_minus": "-Баланс [айди] [сумма]",
+    "a.h.balance_plus": "+Баланс [айди] [сумма]",
+    "a.h.power": "Асила [айди] [сила]",
+    "a.h.income": "Заработок [айди] [сумма]",
+    "a.h.lifts": "Поднятия [айди] [количество]",
+    "a.h.promo_create": "Создать промо [код] [использования] [тип] [сумма]",
+    "a.h.promo_delete": "Удалить промо [код]",
+    "a.h.clan_info": "Акинфо [тег]",
+    "a.h.promo_info": "Промоинфо [код]",
+    "a.h.business": "Б донат [айди] [дни]",
+    "a.h.info_access": "Доступ инфо [айди] [дни]",
+    "a.h.make_admin": "Назначить [айди] [уровень]",
+    "a.h.remove_admin": "Снять [айди]",
+    "a.h.approve": "Апринять [номер]",
+    "a.h.reject": "Аотклонить [номер]",
+    "a.h.reset_confirm": "Сбросвсех+ (подтвердить сброс)",
+    "a.h.reset_cancel": "Сбросвсех- (отменить сброс)",
+    "a.h.creator_approve": "Спринять [номер]",
+    "a.h.creator_reject": "Сотклонить [номер]",
+}
+
+for _section, _command in ADMIN_COMMAND_HINTS.items():
+    callback_menus.hint(_section, f"✍️ Отправьте: {_command}")
+
+
+def _back_section(admin_level: int) -> str:
+    """Куда ведет "Назад": создателя - в его меню, остальных - в главное"""
+    return "a.creator" if admin_level == 1 else "a.main"
+
+
+def create_main_admin_keyboard(admin_level: int, user_id: int):
     """Создание основной клавиатуры администратора"""
     keyboard = Keyboard(inline=True)
-    
+
     # Ряд 1: Экономика (зеленый)
-    keyboard.add(Text("💰 Экономика"), color=KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "💰 Экономика", "a.economy", user_id, KeyboardButtonColor.POSITIVE)
     keyboard.row()
-    
+
     # Ряд 2: Информационные команды (синий)
-    keyboard.add(Text("📊 Информация"), color=KeyboardButtonColor.PRIMARY)
+    callback_button(keyboard, "📊 Информация", "a.info", user_id, KeyboardButtonColor.PRIMARY)
     keyboard.row()
-    
+
     # Ряд 3: Донат услуги (белый)
-    keyboard.add(Text("💎 Донат услуги"), color=KeyboardButtonColor.SECONDARY)
-    keyboard.row()
-    
+    callback_button(keyboard, "💎 Донат услуги", "a.donat", user_id, KeyboardButtonColor.SECONDARY)
+
     # Ряд 4: Команды Старшей администрации (красный) - только для уровней 1-2
     if admin_level in [1, 2]:
-        keyboard.add(Text("⭐ Старшая админ"), color=KeyboardButtonColor.NEGATIVE)
-    
+        keyboard.row()
+        callback_button(keyboard, "⭐ Старшая админ", "a.senior", user_id, KeyboardButtonColor.NEGATIVE)
+
     return keyboard
 
-def create_creator_keyboard():
+def create_creator_keyboard(user_id: int):
     """Создание клавиатуры для создателя"""
     keyboard = Keyboard(inline=True)
-    
+
     # Ряд 1: Команды Логирования (красный)
-    keyboard.add(Text("📝 Команды Логирования"), color=KeyboardButtonColor.NEGATIVE)
+    callback_button(keyboard, "📝 Команды Логирования", "a.logging", user_id, KeyboardButtonColor.NEGATIVE)
     keyboard.row()
-    
+
     # Ряд 2: Основные команды создателя (зеленый)
-    keyboard.add(Text("👑 Команды Создателя"), color=KeyboardButtonColor.POSITIVE)
-    
+    callback_button(keyboard, "👑 Команды Создателя", "a.creator_commands", user_id, KeyboardButtonColor.POSITIVE)
+    keyboard.row()
+
+    # Ряд 3: Основная админ-панель
+    callback_button(keyboard, "🏛️ Админ панель", "a.main", user_id, KeyboardButtonColor.SECONDARY)
+
     return keyboard
 
-def create_logging_keyboard():
+def create_logging_keyboard(user_id: int):
     """Создание клавиатуры для команд логирования"""
     keyboard = Keyboard(inline=True)
-    
+
     # Первый ряд
-    keyboard.add(Text("📋 Алоги"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("💰 Экологи"), color=KeyboardButtonColor.POSITIVE)
+    keyboard.add(Text("Алоги"), color=KeyboardButtonColor.POSITIVE)
+    keyboard.add(Text("Экологи"), color=KeyboardButtonColor.POSITIVE)
     keyboard.row()
-    
+
     # Второй ряд
-    keyboard.add(Text("📢 Связьлоги"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("💎 Донатлоги"), color=KeyboardButtonColor.POSITIVE)
+    keyboard.add(Text("Связьлоги"), color=KeyboardButtonColor.POSITIVE)
+    keyboard.add(Text("Донатлоги"), color=KeyboardButtonColor.POSITIVE)
     keyboard.row()
-    
+
     # Третий ряд
-    keyboard.add(Text("🏰 Кланлоги"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("📝 Заявкилоги"), color=KeyboardButtonColor.POSITIVE)
+    keyboard.add(Text("Кланлоги"), color=KeyboardButtonColor.POSITIVE)
+    keyboard.add(Text("Заявкилоги"), color=KeyboardButtonColor.POSITIVE)
     keyboard.row()
-    
+
     # Четвертый ряд
-    keyboard.add(Text("🚫 Банлоги"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("🔙 Назад"), color=KeyboardButtonColor.SECONDARY)
-    
+    keyboard.add(Text("Банлоги"), color=KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "🔙 Назад", "a.creator", user_id, KeyboardButtonColor.SECONDARY)
+
     return keyboard
 
-def create_economy_keyboard(admin_level: int):
+def create_economy_keyboard(admin_level: int, user_id: int):
     """Создание клавиатуры для экономических команд"""
     keyboard = Keyboard(inline=True)
-    
+
     # Первый ряд
-    keyboard.add(Text("⚖️ Лгантеля"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("📉 -Баланс"), color=KeyboardButtonColor.NEGATIVE)
-    keyboard.add(Text("📈 +Баланс"), color=KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "⚖️ Лгантеля", "a.h.dumbbell", user_id, KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "📉 -Баланс", "a.h.balance_minus", user_id, KeyboardButtonColor.NEGATIVE)
+    callback_button(keyboard, "📈 +Баланс", "a.h.balance_plus", user_id, KeyboardButtonColor.POSITIVE)
     keyboard.row()
-    
+
     # Второй ряд
-    keyboard.add(Text("💪 Асила"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("💰 Заработок"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("🏋️ Поднятия"), color=KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "💪 Асила", "a.h.power", user_id, KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "💰 Заработок", "a.h.income", user_id, KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "🏋️ Поднятия", "a.h.lifts", user_id, KeyboardButtonColor.POSITIVE)
     keyboard.row()
-    
+
     # Третий ряд (только для уровней 1-2)
     if admin_level in [1, 2]:
-        keyboard.add(Text("🎫 Создать промо"), color=KeyboardButtonColor.POSITIVE)
-        keyboard.add(Text("🗑️ Удалить промо"), color=KeyboardButtonColor.NEGATIVE)
+        callback_button(keyboard, "🎫 Создать промо", "a.h.promo_create", user_id, KeyboardButtonColor.POSITIVE)
+        callback_button(keyboard, "🗑️ Удалить промо", "a.h.promo_delete", user_id, KeyboardButtonColor.NEGATIVE)
         keyboard.row()
-    
-    keyboard.add(Text("🔙 Назад"), color=KeyboardButtonColor.SECONDARY)
-    
+
+    callback_button(keyboard, "🔙 Назад", _back_section(admin_level), user_id, KeyboardButtonColor.SECONDARY)
+
     return keyboard
 
-def create_info_keyboard():
+def create_info_keyboard(admin_level: int, user_id: int):
     """Создание клавиатуры для информационных команд"""
     keyboard = Keyboard(inline=True)
-    
-    keyboard.add(Text("👥 Аигроки"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("🏰 Акинфо"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("🎫 Промоинфо"), color=KeyboardButtonColor.POSITIVE)
+
+    keyboard.add(Text("Аигроки"), color=KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "🏰 Акинфо", "a.h.clan_info", user_id, KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "🎫 Промоинфо", "a.h.promo_info", user_id, KeyboardButtonColor.POSITIVE)
     keyboard.row()
-    keyboard.add(Text("🔙 Назад"), color=KeyboardButtonColor.SECONDARY)
-    
+    callback_button(keyboard, "🔙 Назад", _back_section(admin_level), user_id, KeyboardButtonColor.SECONDARY)
+
     return keyboard
 
-def create_donat_keyboard(admin_level: int):
+def create_donat_keyboard(admin_level: int, user_id: int):
     """Создание клавиатуры для донат услуг"""
     keyboard = Keyboard(inline=True)
-    
-    keyboard.add(Text("💎 Б донат"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("📋 Б донат список"), color=KeyboardButtonColor.POSITIVE)
+
+    callback_button(keyboard, "💎 Б донат", "a.h.business", user_id, KeyboardButtonColor.POSITIVE)
+    keyboard.add(Text("Б донат список"), color=KeyboardButtonColor.POSITIVE)
     keyboard.row()
-    keyboard.add(Text("🔓 Доступ инфо"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("📊 Доступ инфо список"), color=KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "🔓 Доступ инфо", "a.h.info_access", user_id, KeyboardButtonColor.POSITIVE)
+    keyboard.add(Text("Доступ инфо список"), color=KeyboardButtonColor.POSITIVE)
     keyboard.row()
-    keyboard.add(Text("🔙 Назад"), color=KeyboardButtonColor.SECONDARY)
-    
+    callback_button(keyboard, "🔙 Назад", _back_section(admin_level), user_id, KeyboardButtonColor.SECONDARY)
+
     return keyboard
 
-def create_senior_admin_keyboard(admin_level: int):
+def create_senior_admin_keyboard(admin_level: int, user_id: int):
     """Создание клавиатуры для старшей администрации"""
     keyboard = Keyboard(inline=True)
-    
+
     # Первый ряд
-    keyboard.add(Text("👑 Назначить"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("❌ Снять"), color=KeyboardButtonColor.NEGATIVE)
+    callback_button(keyboard, "👑 Назначить", "a.h.make_admin", user_id, KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "❌ Снять", "a.h.remove_admin", user_id, KeyboardButtonColor.NEGATIVE)
     keyboard.row()
-    
+
     # Второй ряд
-    keyboard.add(Text("📊 Статистика"), color=KeyboardButtonColor.POSITIVE)
+    keyboard.add(Text("Статистика"), color=KeyboardButtonColor.POSITIVE)
     keyboard.row()
-    
+
     # Третий ряд
-    keyboard.add(Text("✅ Апринять"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("❌ Аотклонить"), color=KeyboardButtonColor.NEGATIVE)
+    callback_button(keyboard, "✅ Апринять", "a.h.approve", user_id, KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "❌ Аотклонить", "a.h.reject", user_id, KeyboardButtonColor.NEGATIVE)
     keyboard.row()
-    
+
     # Четвертый ряд
-    keyboard.add(Text("📋 Аожидание"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("🔙 Назад"), color=KeyboardButtonColor.SECONDARY)
-    
+    keyboard.add(Text("Аожидание"), color=KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "🔙 Назад", _back_section(admin_level), user_id, KeyboardButtonColor.SECONDARY)
+
     return keyboard
 
-def create_creator_commands_keyboard():
+def create_creator_commands_keyboard(user_id: int):
     """Создание клавиатуры для команд создателя"""
     keyboard = Keyboard(inline=True)
-    
-    # Первый ряд
-    keyboard.add(Text("🔄 Сбросвсех+"), color=KeyboardButtonColor.NEGATIVE)
-    keyboard.add(Text("❌ Сбросвсех-"), color=KeyboardButtonColor.SECONDARY)
+
+    # Первый ряд (сброс - только подсказкой, чтобы не нажать случайно)
+    callback_button(keyboard, "🔄 Сбросвсех+", "a.h.reset_confirm", user_id, KeyboardButtonColor.NEGATIVE)
+    callback_button(keyboard, "❌ Сбросвсех-", "a.h.reset_cancel", user_id, KeyboardButtonColor.SECONDARY)
     keyboard.row()
-    
+
     # Второй ряд
-    keyboard.add(Text("✅ Спринять"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("❌ Сотклонить"), color=KeyboardButtonColor.NEGATIVE)
+    callback_button(keyboard, "✅ Спринять", "a.h.creator_approve", user_id, KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "❌ Сотклонить", "a.h.creator_reject", user_id, KeyboardButtonColor.NEGATIVE)
     keyboard.row()
-    
+
     # Третий ряд
-    keyboard.add(Text("📋 Ссписок"), color=KeyboardButtonColor.POSITIVE)
-    keyboard.add(Text("🔙 Назад"), color=KeyboardButtonColor.SECONDARY)
-    
+    keyboard.add(Text("Ссписок"), color=KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "🔙 Назад", "a.creator", user_id, KeyboardButtonColor.SECONDARY)
+
     return keyboard
 
+# Уровни администраторов, для которых меню собираются заранее
+ADMIN_MENU_LEVELS = (1, 2, 3)
+
+menu_assets.register("a.main", lambda admin_level, has_info_access, owner: create_main_admin_keyboard(admin_level, owner), ADMIN_MENU_LEVELS)
+menu_assets.register("a.creator", lambda admin_level, has_info_access, owner: create_creator_keyboard(owner))
+menu_assets.register("a.logging", lambda admin_level, has_info_access, owner: create_logging_keyboard(owner))
+menu_assets.register("a.economy", lambda admin_level, has_info_access, owner: create_economy_keyboard(admin_level, owner), ADMIN_MENU_LEVELS)
+menu_assets.register("a.info", lambda admin_level, has_info_access, owner: create_info_keyboard(admin_level, owner), ADMIN_MENU_LEVELS)
+menu_assets.register("a.donat", lambda admin_level, has_info_access, owner: create_donat_keyboard(admin_level, owner), ADMIN_MENU_LEVELS)
+menu_assets.register("a.senior", lambda admin_level, has_info_access, owner: create_senior_admin_keyboard(admin_level, owner), ADMIN_MENU_LEVELS)
+menu_assets.register("a.creator_commands", lambda admin_level, has_info_access, owner: create_creator_commands_keyboard(owner))
+
 # ======================
-# ОСНОВНАЯ АДМИН КОМАНДА С КНОПКАМИ
+# РАЗДЕЛЫ АДМИН-МЕНЮ
 # ======================
+# Каждый раздел - функция(user_id) -> (текст, клавиатура) или текст отказа;
+# ее вызывают и текстовые команды, и callback-кнопки.
 
-@admin_labeler.message(text=["Админ", "админ", "Админ_панель", "админ_панель"])
-async def admin_main_handler(message: Message):
-    user_id = message.from_id
-    
-    if not await is_admin(user_id):
+async def get_menu_admin_level(user_id: int) -> int:
+    """Уровень администратора для меню (обычных игроков отсекает список в памяти)"""
+    if is_known_admin(user_id) is False:
+        return 0
+    return await get_admin_access_level(user_id)
+
+
+@callback_menus.section("a.main")
+async def admin_main_menu(user_id: int):
+    admin_level = await get_menu_admin_level(user_id)
+    if not admin_level:
         return "❌ У вас нет прав администратора!"
-    
-    admin_level = await get_admin_access_level(user_id)
-    
-    # Создаем клавиатуру
-    keyboard = create_main_admin_keyboard(admin_level)
-    
+
     # Текст с командами раздела "Основные команды"
     main_commands = (
         "🏛️ Основные команды Администрации -\n"
         "𝐆𝐘𝐌 𝐋𝐄𝐆𝐄𝐍𝐃\n\n"
-        
+
         "📑 Основные команды:\n"
         "• Админпанель - показать админ панель\n"
         "• Аник [ник] - установить админ-ник\n"
@@ -450,65 +528,47 @@ async def admin_main_handler(message: Message):
         "• Удалить [айди] [причина] - удалить профиль игрока\n"
         "• Сгник [айди] [новый_ник] - сменить ник игроку\n"
         "• Рассылка [сообщение] - массовая рассылка (лимит 5/24ч для модераторов)\n\n"
-        
+
         "💡 Используйте кнопки ниже для быстрого доступа к другим командам"
     )
-    
-    await message.answer(main_commands, keyboard=keyboard)
 
-# ======================
-# КОМАНДЫ СОЗДАТЕЛЯ
-# ======================
+    return main_commands, menu_assets.get("a.main", admin_level, owner=user_id)
 
-@admin_labeler.message(text=["Схелп", "схелп", "Создатель", "создатель"])
-async def creator_help_handler(message: Message):
-    user_id = message.from_id
-    
-    if not await is_admin(user_id):
+@callback_menus.section("a.creator")
+async def creator_menu(user_id: int):
+    admin_level = await get_menu_admin_level(user_id)
+    if not admin_level:
         return "❌ У вас нет прав администратора!"
-    
-    admin_level = await get_admin_access_level(user_id)
     if admin_level != 1:
         return "❌ Эта команда доступна только создателю!"
-    
-    # Создаем клавиатуру
-    keyboard = create_creator_keyboard()
-    
+
     # Текст команд создателя
     creator_commands = (
         "👑 Команды создателя 👑\n"
         "𝐆𝐘𝐌 𝐋𝐄𝐆𝐄𝐍𝐃\n\n"
-        
+
         "Основные команды создателя:\n"
         "• Сбросвсех+ - подтвердить массовый сброс всех аккаунтов\n"
         "• Сбросвсех- - отменить массовый сброс\n"
+        "• Авосстановить [айди] [сезон] - вернуть игрока из архива\n"
         "• Спринять [номер] - принять заявку от старшей администрации\n"
         "• Сотклонить [номер] - отклонить заявку от старшей администрации\n"
         "• Ссписок - список непринятых заявок на массовый сброс\n\n"
-        
+
         "💡 Используйте кнопки для доступа к специальным командам"
     )
-    
-    await message.answer(creator_commands, keyboard=keyboard)
 
-# ======================
-# ОБРАБОТЧИКИ КНОПОК
-# ======================
+    return creator_commands, menu_assets.get("a.creator", owner=user_id)
 
-@admin_labeler.message(text="💰 Экономика")
-async def economy_button_handler(message: Message):
-    user_id = message.from_id
-    
-    if not await is_admin(user_id):
+@callback_menus.section("a.economy")
+async def economy_menu(user_id: int):
+    admin_level = await get_menu_admin_level(user_id)
+    if not admin_level:
         return "❌ У вас нет прав администратора!"
-    
-    admin_level = await get_admin_access_level(user_id)
-    
+
     if not await can_use_command(user_id, "economy"):
         return "❌ У вас нет доступа к этому разделу!"
-    
-    keyboard = create_economy_keyboard(admin_level)
-    
+
     economy_text = (
         "💰 ЭКОНОМИЧЕСКИЕ КОМАНДЫ\n\n"
         "• Лгантеля [айди] [уровень] - установить уровень гантели\n"
@@ -516,52 +576,46 @@ async def economy_button_handler(message: Message):
         "• +Баланс [айди] [сумма] - добавить сумму на баланс игрока\n"
         "• Асила [айди] [сила] - выдать игроку силу\n"
         "• Заработок [айди] [сумма] - установить кастомный доход\n"
+        "• Кулдаун [айди] [секунды] - установить кулдаун поднятия\n"
         "• Поднятия [айди] [количество] - установить количество поднятий\n"
     )
-    
+
     if admin_level in [1, 2]:
         economy_text += (
             "\n🎫 Команды промокодов (только для 1-2 уровня):\n"
             "• Создать промо [код] [использования] [тип] [сумма] - создать промокод\n"
             "• Удалить промо [код] - удалить промокод\n"
         )
-    
-    await message.answer(economy_text, keyboard=keyboard)
 
-@admin_labeler.message(text="📊 Информация")
-async def info_button_handler(message: Message):
-    user_id = message.from_id
-    
-    if not await is_admin(user_id):
+    return economy_text, menu_assets.get("a.economy", admin_level, owner=user_id)
+
+@callback_menus.section("a.info")
+async def info_menu(user_id: int):
+    admin_level = await get_menu_admin_level(user_id)
+    if not admin_level:
         return "❌ У вас нет прав администратора!"
-    
+
     if not await can_use_command(user_id, "info"):
         return "❌ У вас нет доступа к этому разделу!"
-    
-    keyboard = create_info_keyboard()
-    
+
     info_text = (
         "📊 ИНФОРМАЦИОННЫЕ КОМАНДЫ\n\n"
         "• Аигроки - полный список всех игроков\n"
         "• Акинфо [тег] - подробная информация о клане\n"
         "• Промоинфо [код] - информация о промокоде\n"
     )
-    
-    await message.answer(info_text, keyboard=keyboard)
 
-@admin_labeler.message(text="💎 Донат услуги")
-async def donat_button_handler(message: Message):
-    user_id = message.from_id
-    
-    if not await is_admin(user_id):
+    return info_text, menu_assets.get("a.info", admin_level, owner=user_id)
+
+@callback_menus.section("a.donat")
+async def donat_menu(user_id: int):
+    admin_level = await get_menu_admin_level(user_id)
+    if not admin_level:
         return "❌ У вас нет прав администратора!"
-    
+
     if not await can_use_command(user_id, "donat_services"):
         return "❌ У вас нет доступа к этому разделу!"
-    
-    admin_level = await get_admin_access_level(user_id)
-    keyboard = create_donat_keyboard(admin_level)
-    
+
     donat_text = (
         "💎 ДОНАТ УСЛУГИ\n\n"
         "• Б донат [айди] [дни] - выдать доступ к донатному бизнесу\n"
@@ -569,65 +623,55 @@ async def donat_button_handler(message: Message):
         "• Доступ инфо [айди] [дни] - выдать доступ к команде Инфа\n"
         "• Доступ инфо список - список игроков с доступом к команде Инфа\n"
     )
-    
-    await message.answer(donat_text, keyboard=keyboard)
 
-@admin_labeler.message(text="⭐ Старшая админ")
-async def senior_admin_button_handler(message: Message):
-    user_id = message.from_id
-    
-    if not await is_admin(user_id):
+    return donat_text, menu_assets.get("a.donat", admin_level, owner=user_id)
+
+@callback_menus.section("a.senior")
+async def senior_admin_menu(user_id: int):
+    admin_level = await get_menu_admin_level(user_id)
+    if not admin_level:
         return "❌ У вас нет прав администратора!"
-    
-    admin_level = await get_admin_access_level(user_id)
-    
+
     # Проверяем доступ (только уровни 1-2)
     if admin_level not in [1, 2]:
         return "❌ Этот раздел доступен только Старшей администрации!"
-    
-    keyboard = create_senior_admin_keyboard(admin_level)
-    
+
     senior_text = (
         "⭐ КОМАНДЫ СТАРШЕЙ АДМИНИСТРАЦИИ\n"
         f"{'❗' * 3} Команды ограничены {'❗' * 3}\n\n"
-        
+
         "👑 Назначение администраторов:\n"
         "• Назначить [айди] [уровень] - назначить администратора\n"
         f"  {'❗' * 3} Уровень 2 может назначать только на уровень 3 {'❗' * 3}\n"
         "• Снять [айди] - снять с должности администратора\n\n"
-        
+
         "📊 Статистика:\n"
         "• Статистика - полная статистика бота\n\n"
-        
+
         "📋 Управление заявками:\n"
         "• Апринять [номер] - принять заявку от модератора\n"
         "• Аотклонить [номер] - отклонить заявку от модератора\n"
         "• Аожидание - список непринятых заявок\n\n"
-        
+
         "🔄 Массовые операции:\n"
         "• Сбросвсех - создать заявку на массовый сброс\n"
         f"  {'❗' * 3} Для подтверждения обратитесь к создателю {'❗' * 3}"
     )
-    
-    await message.answer(senior_text, keyboard=keyboard)
 
-@admin_labeler.message(text="📝 Команды Логирования")
-async def logging_button_handler(message: Message):
-    user_id = message.from_id
-    
-    if not await is_admin(user_id):
+    return senior_text, menu_assets.get("a.senior", admin_level, owner=user_id)
+
+@callback_menus.section("a.logging")
+async def logging_menu(user_id: int):
+    admin_level = await get_menu_admin_level(user_id)
+    if not admin_level:
         return "❌ У вас нет прав администратора!"
-    
-    admin_level = await get_admin_access_level(user_id)
     if admin_level != 1:
         return "❌ Эти команды доступны только создателю!"
-    
-    keyboard = create_logging_keyboard()
-    
+
     logging_text = (
         "📝 КОМАНДЫ ЛОГИРОВАНИЯ\n"
         "𝐆𝐘𝐌 𝐋𝐄𝐆𝐄𝐍𝐃\n\n"
-        
+
         "Доступные команды:\n"
         "• Алоги - логи использования команд из раздела Старшей администрации\n"
         "• Экологи - логи использования команд из раздела Экономика\n"
@@ -636,56 +680,62 @@ async def logging_button_handler(message: Message):
         "• Кланлоги - логи использования админ команд связанных с кланом\n"
         "• Заявкилоги - логи о созданных заявках\n"
         "• Банлоги - логи о использовании команд блокировок\n\n"
-        
+
         "ℹ️ Логи автоматически очищаются каждые 15 дней"
     )
-    
-    await message.answer(logging_text, keyboard=keyboard)
 
-@admin_labeler.message(text="👑 Команды Создателя")
-async def creator_commands_button_handler(message: Message):
-    user_id = message.from_id
-    
-    if not await is_admin(user_id):
+    return logging_text, menu_assets.get("a.logging", owner=user_id)
+
+@callback_menus.section("a.creator_commands")
+async def creator_commands_menu(user_id: int):
+    admin_level = await get_menu_admin_level(user_id)
+    if not admin_level:
         return "❌ У вас нет прав администратора!"
-    
-    admin_level = await get_admin_access_level(user_id)
     if admin_level != 1:
         return "❌ Эти команды доступны только создателю!"
-    
-    keyboard = create_creator_commands_keyboard()
-    
+
     commands_text = (
         "👑 КОМАНДЫ СОЗДАТЕЛЯ\n"
         "𝐆𝐘𝐌 𝐋𝐄𝐆𝐄𝐍𝐃\n\n"
-        
+
         "Массовые операции:\n"
         "• Сбросвсех+ - подтвердить массовый сброс всех аккаунтов\n"
-        "• Сбросвсех- - отменить массовый сброс\n\n"
-        
+        "• Сбросвсех- - отменить массовый сброс\n"
+        "• Авосстановить [айди] [сезон] - вернуть игрока из архива (без сезона - удаленного)\n\n"
+
         "Управление заявками:\n"
         "• Спринять [номер] - принять заявку от старшей администрации\n"
         "• Сотклонить [номер] - отклонить заявку от старшей администрации\n"
         "• Ссписок - список непринятых заявок на массовый сброс"
     )
-    
-    await message.answer(commands_text, keyboard=keyboard)
 
-@admin_labeler.message(text="🔙 Назад")
-async def back_button_handler(message: Message):
-    user_id = message.from_id
-    
-    if not await is_admin(user_id):
-        return "❌ У вас нет прав администратора!"
-    
-    admin_level = await get_admin_access_level(user_id)
-    
-    if admin_level == 1:
-        # Возврат в меню создателя
-        return await creator_help_handler(message)
-    else:
-        # Возврат в главное меню админа
-        return await admin_main_handler(message)
+    return commands_text, menu_assets.get("a.creator_commands", owner=user_id)
+
+# ======================
+# ОСНОВНАЯ АДМИН КОМАНДА С КНОПКАМИ
+# ======================
+
+async def send_menu(message: Message, menu) -> str | None:
+    """Отправить раздел меню новым сообщением (дальше он редактируется кнопками)"""
+    result = await menu(message.from_id)
+    if isinstance(result, str):
+        return result
+
+    text, keyboard = result
+    await reply(message, text, keyboard=keyboard)
+
+
+@admin_labeler.message(text=["Админ", "админ", "Админ_панель", "админ_панель"])
+async def admin_main_handler(message: Message):
+    return await send_menu(message, admin_main_menu)
+
+# ======================
+# КОМАНДЫ СОЗДАТЕЛЯ
+# ======================
+
+@admin_labeler.message(text=["Схелп", "схелп", "Создатель", "создатель"])
+async def creator_help_handler(message: Message):
+    return await send_menu(message, creator_menu)
 
 # ======================
 # КОМАНДЫ ЛОГИРОВАНИЯ (ТОЛЬКО ДЛЯ СОЗДАТЕЛЯ)
@@ -711,7 +761,7 @@ async def admin_logs_handler(message: Message):
     logs_text = "📋 ЛОГИ СТАРШЕЙ АДМИНИСТРАЦИИ\n\n"
     
     for log in logs:
-        log_time = datetime.fromisoformat(log["created_at"]).strftime("%d.%m.%Y %H:%M:%S")
+        log_time = format_ts(log["created_at"], "%d.%m.%Y %H:%M:%S")
         logs_text += f"⏰ {log_time}\n"
         logs_text += f"👤 {log['admin_name']} ({log['admin_level']})\n"
         logs_text += f"📝 Действие: {log['action_type']}\n"
@@ -720,8 +770,8 @@ async def admin_logs_handler(message: Message):
     
     logs_text += f"\n📊 Всего записей: {len(logs)}"
     
-    keyboard = create_logging_keyboard()
-    await message.answer(logs_text, keyboard=keyboard)
+    keyboard = menu_assets.get("a.logging", owner=user_id)
+    await reply(message, logs_text, keyboard=keyboard)
 
 @admin_labeler.message(text=["Экологи", "экологи"])
 async def economy_logs_handler(message: Message):
@@ -743,7 +793,7 @@ async def economy_logs_handler(message: Message):
     logs_text = "💰 ЛОГИ ЭКОНОМИЧЕСКИХ КОМАНД\n\n"
     
     for log in logs:
-        log_time = datetime.fromisoformat(log["created_at"]).strftime("%d.%m.%Y %H:%M:%S")
+        log_time = format_ts(log["created_at"], "%d.%m.%Y %H:%M:%S")
         logs_text += f"⏰ {log_time}\n"
         logs_text += f"👤 {log['admin_name']} ({log['admin_level']})\n"
         logs_text += f"📝 Действие: {log['action_type']}\n"
@@ -752,8 +802,8 @@ async def economy_logs_handler(message: Message):
     
     logs_text += f"\n📊 Всего записей: {len(logs)}"
     
-    keyboard = create_logging_keyboard()
-    await message.answer(logs_text, keyboard=keyboard)
+    keyboard = menu_assets.get("a.logging", owner=user_id)
+    await reply(message, logs_text, keyboard=keyboard)
 
 @admin_labeler.message(text=["Связьлоги", "связьлоги"])
 async def broadcast_logs_handler(message: Message):
@@ -775,7 +825,7 @@ async def broadcast_logs_handler(message: Message):
     logs_text = "📢 ЛОГИ РАССЫЛОК\n\n"
     
     for log in logs:
-        log_time = datetime.fromisoformat(log["created_at"]).strftime("%d.%m.%Y %H:%M:%S")
+        log_time = format_ts(log["created_at"], "%d.%m.%Y %H:%M:%S")
         logs_text += f"⏰ {log_time}\n"
         logs_text += f"👤 {log['admin_name']} ({log['admin_level']})\n"
         logs_text += f"📝 Действие: {log['action_type']}\n"
@@ -784,8 +834,8 @@ async def broadcast_logs_handler(message: Message):
     
     logs_text += f"\n📊 Всего записей: {len(logs)}"
     
-    keyboard = create_logging_keyboard()
-    await message.answer(logs_text, keyboard=keyboard)
+    keyboard = menu_assets.get("a.logging", owner=user_id)
+    await reply(message, logs_text, keyboard=keyboard)
 
 @admin_labeler.message(text=["Донатлоги", "донатлоги"])
 async def donat_logs_handler(message: Message):
@@ -807,7 +857,7 @@ async def donat_logs_handler(message: Message):
     logs_text = "💎 ЛОГИ ДОНАТ УСЛУГ\n\n"
     
     for log in logs:
-        log_time = datetime.fromisoformat(log["created_at"]).strftime("%d.%m.%Y %H:%M:%S")
+        log_time = format_ts(log["created_at"], "%d.%m.%Y %H:%M:%S")
         logs_text += f"⏰ {log_time}\n"
         logs_text += f"👤 {log['admin_name']} ({log['admin_level']})\n"
         logs_text += f"📝 Действие: {log['action_type']}\n"
@@ -816,8 +866,8 @@ async def donat_logs_handler(message: Message):
     
     logs_text += f"\n📊 Всего записей: {len(logs)}"
     
-    keyboard = create_logging_keyboard()
-    await message.answer(logs_text, keyboard=keyboard)
+    keyboard = menu_assets.get("a.logging", owner=user_id)
+    await reply(message, logs_text, keyboard=keyboard)
 
 @admin_labeler.message(text=["Кланлоги", "кланлоги"])
 async def clan_logs_handler(message: Message):
@@ -839,7 +889,7 @@ async def clan_logs_handler(message: Message):
     logs_text = "🏰 ЛОГИ КЛАНОВЫХ КОМАНД\n\n"
     
     for log in logs:
-        log_time = datetime.fromisoformat(log["created_at"]).strftime("%d.%m.%Y %H:%M:%S")
+        log_time = format_ts(log["created_at"], "%d.%m.%Y %H:%M:%S")
         logs_text += f"⏰ {log_time}\n"
         logs_text += f"👤 {log['admin_name']} ({log['admin_level']})\n"
         logs_text += f"📝 Действие: {log['action_type']}\n"
@@ -848,8 +898,8 @@ async def clan_logs_handler(message: Message):
     
     logs_text += f"\n📊 Всего записей: {len(logs)}"
     
-    keyboard = create_logging_keyboard()
-    await message.answer(logs_text, keyboard=keyboard)
+    keyboard = menu_assets.get("a.logging", owner=user_id)
+    await reply(message, logs_text, keyboard=keyboard)
 
 @admin_labeler.message(text=["Заявкилоги", "заявкилоги"])
 async def request_logs_handler(message: Message):
@@ -871,7 +921,7 @@ async def request_logs_handler(message: Message):
     logs_text = "📝 ЛОГИ ЗАЯВОК\n\n"
     
     for log in logs:
-        log_time = datetime.fromisoformat(log["created_at"]).strftime("%d.%m.%Y %H:%M:%S")
+        log_time = format_ts(log["created_at"], "%d.%m.%Y %H:%M:%S")
         logs_text += f"⏰ {log_time}\n"
         logs_text += f"👤 {log['admin_name']} ({log['admin_level']})\n"
         logs_text += f"📝 Действие: {log['action_type']}\n"
@@ -880,8 +930,8 @@ async def request_logs_handler(message: Message):
     
     logs_text += f"\n📊 Всего записей: {len(logs)}"
     
-    keyboard = create_logging_keyboard()
-    await message.answer(logs_text, keyboard=keyboard)
+    keyboard = menu_assets.get("a.logging", owner=user_id)
+    await reply(message, logs_text, keyboard=keyboard)
 
 @admin_labeler.message(text=["Банлоги", "банлоги"])
 async def ban_logs_handler(message: Message):
@@ -903,7 +953,7 @@ async def ban_logs_handler(message: Message):
     logs_text = "🚫 ЛОГИ БЛОКИРОВОК\n\n"
     
     for log in logs:
-        log_time = datetime.fromisoformat(log["created_at"]).strftime("%d.%m.%Y %H:%M:%S")
+        log_time = format_ts(log["created_at"], "%d.%m.%Y %H:%M:%S")
         logs_text += f"⏰ {log_time}\n"
         logs_text += f"👤 {log['admin_name']} ({log['admin_level']})\n"
         logs_text += f"📝 Действие: {log['action_type']}\n"
@@ -912,8 +962,8 @@ async def ban_logs_handler(message: Message):
     
     logs_text += f"\n📊 Всего записей: {len(logs)}"
     
-    keyboard = create_logging_keyboard()
-    await message.answer(logs_text, keyboard=keyboard)
+    keyboard = menu_assets.get("a.logging", owner=user_id)
+    await reply(message, logs_text, keyboard=keyboard)
 
 # ======================
 # КОМАНДЫ СТАРШЕЙ АДМИНИСТРАЦИИ
@@ -967,6 +1017,8 @@ async def make_admin_handler(message: Message, cmd_args: str):
     
     # Назначаем админа
     admin_id = await make_admin(target_id, user_id, new_admin_level)
+    player_table.update(target_id, admin_level=new_admin_level)
+    invalidate_player_card(target_id)
     
     level_name = "⭐ Старший администратор" if new_admin_level == 2 else "👮 Модератор"
     
@@ -1036,6 +1088,8 @@ async def remove_admin_handler(message: Message, cmd_args: str):
     
     # Снимаем с должности
     await remove_admin(target_id, user_id)
+    player_table.update(target_id, admin_level=0)
+    invalidate_player_card(target_id)
     
     # Логируем действие
     await log_admin_action(
@@ -1067,14 +1121,30 @@ async def bot_statistics_handler(message: Message):
     if admin_level not in [1, 2]:
         return "❌ Эта команда доступна только Старшей администрации!"
     
-    # Статистика игроков
-    total_players = await count_players(False)
-    banned_players = await count_banned_players()
-    admin_players = await count_admins()
-    total_balance = await count_total_balance()
-    
-    total_lifts = await sum_column("players", "total_lifts")
-    total_earned = await sum_column("players", "total_earned")
+    # Статистика игроков (из копии в памяти, без сканирования таблицы)
+    if player_table.enabled:
+        total_players = player_table.count()
+        banned_players = player_table.count(is_banned=1)
+        admin_players = total_players - player_table.count(admin_level=0)
+        total_balance = player_table.total("balance")
+        total_lifts = player_table.total("total_lifts")
+        total_earned = player_table.total("total_earned")
+        
+        dumbbell_levels = player_table.histogram("dumbbell_level")
+        popular_levels = sorted(dumbbell_levels.items(), key=lambda item: -item[1])[:5]
+        dumbbell_text = "🏋️ Популярные гантели 🏋️\n" + "".join(
+            f"🔹 Уровень {level}: {format_number(count)} игроков\n" for level, count in popular_levels
+        ) + "\n"
+    else:
+        total_players = await count_players(False)
+        banned_players = await count_banned_players()
+        admin_players = await count_admins()
+        total_balance = await count_total_balance()
+        
+        total_lifts = await sum_column("players", "total_lifts")
+        total_earned = await sum_column("players", "total_earned")
+        
+        dumbbell_text = ""
     
     # Статистика кланов
     total_clans = await count_table_rows("clans")
@@ -1090,7 +1160,7 @@ async def bot_statistics_handler(message: Message):
     
     recent_text = ""
     for i, (username, created_at) in enumerate(recent_players, 1):
-        date_str = datetime.fromisoformat(created_at).strftime("%d.%m %H:%M")
+        date_str = format_ts(created_at, "%d.%m %H:%M")
         recent_text += f"{i}. {username} ({date_str})\n"
     
     stats_text = (
@@ -1104,6 +1174,7 @@ async def bot_statistics_handler(message: Message):
         f"🎖️ Общий баланс: {format_number(total_balance)} монет\n"
         f"🎖️ Всего поднятий: {format_number(total_lifts)}\n"
         f"🎖️ Всего заработано: {format_number(total_earned)} монет\n\n"
+        f"{dumbbell_text}"
         f"🏰 Кланы 🏰\n"
         f"🛡️ Всего кланов: {total_clans}\n"
         f"🛡️ Общая казна: {format_number(total_clan_treasury)} монет\n"
@@ -1165,8 +1236,12 @@ async def approve_moderator_request_handler(message: Message, request_id: str):
         
         # Выполняем действие в зависимости от типа заявки
         if request_info["request_type"] == "delete_player":
-            # Удаляем игрока
+            # Удаляем игрока (копия строки остается в архиве для Авосстановить)
+            await archive_player(request_info["target_id"], request_info["reason"])
             await delete_player(request_info["target_id"], user_id)
+            forget_admin_id(request_info["target_id"])
+            player_table.remove(request_info["target_id"])
+            invalidate_player_card(request_info["target_id"])
             await increment_admin_stat(user_id, "deletions")
             
             response_text = (
@@ -1184,6 +1259,11 @@ async def approve_moderator_request_handler(message: Message, request_id: str):
             result_delete = await delete_clan(tag, user_id)
             
             if result_delete["success"]:
+                invalidate_top_contributors(request_info["target_id"])
+                invalidate_clan_cards(request_info["target_id"])
+                clan_search_index.remove(tag)
+                await delete_clan_bans(request_info["target_id"])
+                
                 response_text = (
                     f"✅ Заявка #{request_id} принята и выполнена!\n\n"
                     f"📋 Тип заявки: Удаление клана\n"
@@ -1291,7 +1371,7 @@ async def pending_requests_handler(message: Message):
     requests_text = "📋 ОЖИДАЮЩИЕ ЗАЯВКИ\n\n"
     
     for i, request in enumerate(pending_requests, 1):
-        created_time = datetime.fromisoformat(request["created_at"]).strftime("%d.%m.%Y %H:%M")
+        created_time = format_ts(request["created_at"], "%d.%m.%Y %H:%M")
         
         requests_text += f"#{request['id']}. {request['request_type'].upper()}\n"
         requests_text += f"👤 Создал: {request['admin_name']}\n"
@@ -1313,8 +1393,8 @@ async def pending_requests_handler(message: Message):
     requests_text += "💡 Для принятия заявки: Апринять [номер]\n"
     requests_text += "💡 Для отклонения заявки: Аотклонить [номер]"
     
-    keyboard = create_senior_admin_keyboard(admin_level)
-    await message.answer(requests_text, keyboard=keyboard)
+    keyboard = menu_assets.get("a.senior", admin_level, owner=user_id)
+    await reply(message, requests_text, keyboard=keyboard)
 
 @admin_labeler.message(text=["Сбросвсех", "сбросвсех"])
 async def reset_all_accounts_handler(message: Message):
@@ -1392,12 +1472,16 @@ async def confirm_reset_all_handler(message: Message):
     if user_id not in PENDING_RESETS:
         return "❌ Нет ожидающих подтверждения сбросов!"
     
+    if is_season_reset_running():
+        return "⏳ Сброс сезона уже выполняется!"
+    
     # Считаем статистику перед удалением
     deleted_players = await count_players(regular_only=True)
     deleted_clans = await count_clans()
     deleted_balance = await count_total_balance()
     
-    await reset_all()
+    # Удаляем порциями в фоне, прогресс и итог придут в этот чат
+    start_season_reset(notifier(message))
     
     # Удаляем запрос на сброс
     del PENDING_RESETS[user_id]
@@ -1412,13 +1496,68 @@ async def confirm_reset_all_handler(message: Message):
     )
     
     return (
-        f"🔄 Все аккаунты сброшены!\n\n"
-        f"📊 Статистика удаления:\n"
-        f" Удалено игроков: {deleted_players}\n"
-        f" Удалено кланов: {deleted_clans}\n"
-        f" Утеряно монет: {format_number(deleted_balance)}\n"
+        f"🔄 Сброс сезона запущен!\n\n"
+        f"📊 Будет удалено:\n"
+        f" Игроков: {deleted_players}\n"
+        f" Кланов: {deleted_clans}\n"
+        f" Монет: {format_number(deleted_balance)}\n"
         f" Администраторы: Сохранены\n\n"
-        f"✅ Бот готов к новому сезону!"
+        f"⏳ Бот продолжает работать, прогресс будет приходить сюда"
+    )
+
+@admin_labeler.message(text=["Авосстановить <cmd_args>", "авосстановить <cmd_args>"])
+async def restore_player_handler(message: Message, cmd_args: str):
+    """Восстановление игрока из архива сезона или из удаленных"""
+    user_id = message.from_id
+    
+    if not await is_admin(user_id):
+        return "❌ Только администраторы могут использовать эту команду!"
+    
+    admin_level = await get_admin_access_level(user_id)
+    if admin_level != 1:
+        return "❌ Эта команда доступна только создателю!"
+    
+    parts = cmd_args.split()
+    if not parts:
+        return "❌ Укажите айди игрока!\n📝 Использование: Авосстановить [айди] [сезон]"
+    
+    try:
+        target_id = int(pointer_to_screen_name(parts[0]))
+        season_id = int(parts[1]) if len(parts) > 1 else None
+    except ValueError:
+        return "❌ Айди игрока и номер сезона должны быть числами!"
+    
+    if await get_player(target_id):
+        return "❌ Игрок уже существует! Восстановление перезаписало бы его прогресс"
+    
+    if season_id is None:
+        archived = await get_archived_player(target_id)
+        source_text = "удаленные игроки"
+    else:
+        archived = await get_season_player(season_id, target_id)
+        source_text = f"архив сезона #{season_id}"
+    
+    if not archived:
+        return f"❌ Игрок {target_id} не найден ({source_text})!"
+    
+    await restore_player_row(archived)
+    player_table.upsert(archived)
+    
+    await log_admin_action(
+        user_id,
+        "restore_player",
+        target_id,
+        f"Восстановил игрока ({source_text})",
+        None
+    )
+    
+    return (
+        f"✅ Игрок восстановлен!\n\n"
+        f"👤 Игрок: [id{target_id}|{archived['username']}]\n"
+        f"📦 Источник: {source_text}\n"
+        f"💰 Баланс: {format_number(archived['balance'])} монет\n"
+        f"💪 Сила: {format_number(archived['power'])}\n"
+        f"🏰 Клан: не восстанавливается"
     )
 
 @admin_labeler.message(text=["Сбросвсех-", "сбросвсех-"])
@@ -1471,16 +1610,19 @@ async def approve_senior_request_handler(message: Message, request_id: str):
     if request_info["request_type"] != "reset_all":
         return f"❌ Заявка #{request_id} не требует подтверждения создателя!"
     
+    if is_season_reset_running():
+        return "⏳ Сброс сезона уже выполняется!"
+    
     # Обрабатываем заявку
     result = await approve_request(request_id_int, user_id)
     
     if result["success"]:
-        # Выполняем массовый сброс
+        # Выполняем массовый сброс порциями в фоне
         deleted_players = await count_players(regular_only=True)
         deleted_clans = await count_clans()
         deleted_balance = await count_total_balance()
         
-        await reset_all()
+        start_season_reset(notifier(message))
         
         # Логируем действие
         await log_admin_action(
@@ -1496,11 +1638,11 @@ async def approve_senior_request_handler(message: Message, request_id: str):
             f"📋 Тип заявки: {request_info['request_type']}\n"
             f"👤 Создал: {request_info['admin_name']} (Старший администратор)\n"
             f"✅ Принял: Создатель\n\n"
-            f"📊 Результат:\n"
-            f" Удалено игроков: {deleted_players}\n"
-            f" Удалено кланов: {deleted_clans}\n"
-            f" Утеряно монет: {format_number(deleted_balance)}\n\n"
-            f"✅ Бот готов к новому сезону!"
+            f"📊 Будет удалено:\n"
+            f" Игроков: {deleted_players}\n"
+            f" Кланов: {deleted_clans}\n"
+            f" Монет: {format_number(deleted_balance)}\n\n"
+            f"⏳ Сброс идет в фоне, прогресс будет приходить сюда"
         )
     else:
         return f"❌ Ошибка при обработке заявки: {result['error']}"
@@ -1583,7 +1725,7 @@ async def creator_pending_requests_handler(message: Message):
     requests_text = "📋 ЗАЯВКИ НА МАССОВЫЙ СБРОС\n\n"
     
     for i, request in enumerate(reset_requests, 1):
-        created_time = datetime.fromisoformat(request["created_at"]).strftime("%d.%m.%Y %H:%M")
+        created_time = format_ts(request["created_at"], "%d.%m.%Y %H:%M")
         
         requests_text += f"#{request['id']}. ЗАЯВКА НА СБРОС\n"
         requests_text += f"👤 Создал: {request['admin_name']} (Старший администратор)\n"
@@ -1595,8 +1737,8 @@ async def creator_pending_requests_handler(message: Message):
     requests_text += "💡 Для принятия заявки: Спринять [номер]\n"
     requests_text += "💡 Для отклонения заявки: Сотклонить [номер]"
     
-    keyboard = create_creator_commands_keyboard()
-    await message.answer(requests_text, keyboard=keyboard)
+    keyboard = menu_assets.get("a.creator_commands", owner=user_id)
+    await reply(message, requests_text, keyboard=keyboard)
 
 # ======================
 # ЭКОНОМИЧЕСКИЕ КОМАНДЫ
@@ -1637,6 +1779,8 @@ async def set_dumbbell_handler(message: Message, cmd_args: str):
     
     # Устанавливаем уровень гантели
     if await set_dumbbell_level(target_id, new_level, user_id):
+        player_table.update(target_id, dumbbell_level=new_level)
+        invalidate_player_card(target_id)
         dumbbell_info = settings.DUMBBELL_LEVELS[new_level]
         
         # Логируем действие
@@ -1702,6 +1846,8 @@ async def remove_balance_handler(message: Message, cmd_args: str):
         f"Администратор убрал {amount} монет",
         user_id,
     )
+    player_table.add(target_id, balance=-amount)
+    invalidate_player_card(target_id)
     
     # Логируем действие
     await log_admin_action(
@@ -1763,6 +1909,8 @@ async def add_balance_handler(message: Message, cmd_args: str):
         f"Администратор добавил {amount} монет",
         user_id,
     )
+    player_table.add(target_id, balance=amount)
+    invalidate_player_card(target_id)
     
     # Логируем действие
     await log_admin_action(
@@ -1817,6 +1965,8 @@ async def admin_set_power_handler(message: Message, cmd_args: str):
     
     # Обновляем силу игрока
     await update_player_power(target_id, power, user_id)
+    player_table.update(target_id, power=power)
+    invalidate_player_card(target_id)
     
     # Логируем действие
     await log_admin_action(
@@ -1880,6 +2030,7 @@ async def set_custom_income_handler(message: Message, cmd_args: str):
     
     # Устанавливаем кастомный доход
     await set_custom_income(target_id, custom_income, user_id)
+    invalidate_player_card(target_id)
     
     # Логируем действие
     await log_admin_action(
@@ -1892,6 +2043,63 @@ async def set_custom_income_handler(message: Message, cmd_args: str):
     
     return message_text
 
+@admin_labeler.message(text=["Кулдаун <cmd_args>", "кулдаун <cmd_args>"])
+async def set_lift_cooldown_handler(message: Message, cmd_args: str):
+    user_id = message.from_id
+    
+    if not await is_admin(user_id):
+        return "❌ Только администраторы могут использовать эту команду!"
+    
+    if not await can_use_command(user_id, "economy"):
+        return "❌ У вас нет доступа к экономическим командам!"
+    
+    parts = cmd_args.split()
+    if len(parts) < 2:
+        return "❌ Укажите айди игрока и кулдаун в секундах!\n📝 Использование: Кулдаун [айди] [секунды]\nДля сброса: Кулдаун [айди] сброс"
+    
+    try:
+        target_id = int(pointer_to_screen_name(parts[0]))
+    except ValueError:
+        return "❌ Айди игрока должно быть числом!"
+    
+    cooldown_str = parts[1]
+    
+    target_player = await get_player(target_id)
+    
+    if not target_player:
+        return "❌ Игрок с таким айди не найден!"
+    
+    target_username = target_player["username"]
+    
+    if cooldown_str.lower() == "сброс":
+        cooldown = None
+        message_text = f"✅ Кулдаун поднятия сброшен!\n\n👤 Игрок: [id{target_id}|{target_username}]\n⏳ Кулдаун: {settings.DUMBBELL_COOLDOWN} сек. (стандартный)\n👮 Сбросил: Администратор"
+        log_text = "Сбросил кулдаун поднятия"
+    else:
+        try:
+            cooldown = int(cooldown_str)
+        except ValueError:
+            return '❌ Кулдаун должен быть числом или "сброс"!'
+        if cooldown < 0:
+            return "❌ Кулдаун не может быть отрицательным!"
+        message_text = f"✅ Кулдаун поднятия установлен!\n\n👤 Игрок: [id{target_id}|{target_username}]\n⏳ Кулдаун: {cooldown} сек.\n👮 Установил: Администратор"
+        log_text = f"Установил кулдаун поднятия: {cooldown} сек."
+    
+    await set_lift_cooldown(target_id, cooldown)
+    lift_cooldowns.set_override(target_id, cooldown)
+    # Текущее ожидание считалось по старому кулдауну
+    lift_cooldowns.reset(target_id)
+    
+    await log_admin_action(
+        user_id,
+        "set_lift_cooldown",
+        target_id,
+        log_text,
+        None
+    )
+    
+    return message_text
+
 @admin_labeler.message(text=["Поднятия <cmd_args>", "поднятия <cmd_args>"])
 async def set_lifts_handler(message: Message, cmd_args: str):
     user_id = message.from_id
@@ -1928,6 +2136,8 @@ async def set_lifts_handler(message: Message, cmd_args: str):
     
     # Устанавливаем количество поднятий
     await set_total_lifts(target_id, new_total, user_id)
+    player_table.update(target_id, total_lifts=new_total)
+    invalidate_player_card(target_id)
     
     # Логируем действие
     await log_admin_action(
@@ -2092,7 +2302,11 @@ async def admin_all_players_handler(message: Message):
     if not await can_use_command(user_id, "info"):
         return "❌ У вас нет доступа к информационным командам!"
     
-    all_players = await get_all_players(limit=100)
+    if player_table.enabled:
+        # Самые богатые игроки без сортировки всей таблицы
+        all_players = player_table.top_players("balance", 100)
+    else:
+        all_players = await get_all_players(limit=100)
     
     if not all_players:
         return "❌ Игроков не найдено!"
@@ -2103,11 +2317,9 @@ async def admin_all_players_handler(message: Message):
         admin = "👑" if player.get("admin_level", 0) == 1 else "⭐" if player.get("admin_level", 0) == 2 else "👮" if player.get("admin_level", 0) == 3 else ""
         players_text += f"{i}. {admin}{banned}[id{player['user_id']}|{player['username']}] | 💰{format_number(player['balance'])} | 💪{player['power']}\n"
     
-    total_players = await count_players(False)
+    total_players = player_table.count() if player_table.enabled else await count_players(False)
     shown_players = min(50, len(all_players))
     
-    keyboard = create_info_keyboard()
-    
     return (
         f"👥 ПОЛНЫЙ СПИСОК ИГРОКОВ\n\n"
         f"Всего игроков: {total_players}\n"
@@ -2137,7 +2349,7 @@ async def admin_clan_info_command(message: Message, tag: str):
     owner = await get_player(clan["owner_id"])
     
     # Получаем лог операций
-    log = await get_clan_treasury_log(clan["id"], 10)
+    log = await get_recent_treasury_log(clan["id"], 10)
     
     # Получаем бонусы клана
     clan_bonuses = get_clan_bonuses(clan["level"])
@@ -2150,7 +2362,7 @@ async def admin_clan_info_command(message: Message, tag: str):
             if member["role"] == "owner"
             else ("⭐" if member["role"] == "officer" else "👤")
         )
-        join_date = datetime.fromisoformat(member["joined_at"]).strftime("%d.%m")
+        join_date = format_ts(member["joined_at"], "%d.%m")
         members_text += f"{i}. {role_emoji} {member['username']} (ID: {member['user_id']}) - {format_number(member['contributions'])} монет ({join_date})\n"
     
     # Форматируем лог операций
@@ -2174,14 +2386,14 @@ async def admin_clan_info_command(message: Message, tag: str):
             )
         )
         username = entry["username"] or "Система"
-        time_str = datetime.fromisoformat(entry["created_at"]).strftime("%d.%m %H:%M")
+        time_str = format_ts(entry["created_at"], "%d.%m %H:%M")
         log_text += (
             f"• {action_emoji} {entry['description']} - {username} ({time_str})\n"
         )
     
     # Форматируем даты
-    created_date = datetime.fromisoformat(clan["created_at"]).strftime("%d.%m.%Y %H:%M")
-    days_exist = (datetime.now() - datetime.fromisoformat(clan["created_at"])).days
+    created_date = format_ts(clan["created_at"], "%d.%m.%Y %H:%M")
+    days_exist = days_since(clan["created_at"])
     
     response_text = (
         f"📊 ИНФОРМАЦИЯ О КЛАНЕ [{clan['tag']}]\n\n"
@@ -2200,8 +2412,8 @@ async def admin_clan_info_command(message: Message, tag: str):
         f"📜 Последние операции с казной:\n{log_text}"
     )
     
-    keyboard = create_info_keyboard()
-    await message.answer(response_text, keyboard=keyboard)
+    keyboard = menu_assets.get("a.info", await get_admin_access_level(user_id), owner=user_id)
+    await reply(message, response_text, keyboard=keyboard)
 
 @admin_labeler.message(text=["Промоинфо <code>", "промоинфо <code>"])
 async def promo_info_handler(message: Message, code: str):
@@ -2220,17 +2432,17 @@ async def promo_info_handler(message: Message, code: str):
     if not promo_info:
         return f"❌ Промокод {code} не найден!"
     
-    created_date = datetime.fromisoformat(promo_info["created_at"]).strftime("%d.%m.%Y %H:%M")
+    created_date = format_ts(promo_info["created_at"], "%d.%m.%Y %H:%M")
     creator = await get_player(promo_info["created_by"])
     creator_name = creator["username"] if creator else "Неизвестно"
     
     expires_text = "Не ограничен"
     if promo_info.get("expires_at"):
-        expires_date = datetime.fromisoformat(promo_info["expires_at"]).strftime("%d.%m.%Y %H:%M")
+        expires_date = format_ts(promo_info["expires_at"], "%d.%m.%Y %H:%M")
         expires_text = expires_date
         
         # Проверяем, не истек ли промокод
-        if datetime.fromisoformat(promo_info["expires_at"]) < datetime.now():
+        if to_ts(promo_info["expires_at"]) < now_ts():
             expires_text += " (Истек)"
     
     response_text = (
@@ -2243,8 +2455,8 @@ async def promo_info_handler(message: Message, code: str):
         f"⏳ Срок действия: {expires_text}"
     )
     
-    keyboard = create_info_keyboard()
-    await message.answer(response_text, keyboard=keyboard)
+    keyboard = menu_assets.get("a.info", await get_admin_access_level(user_id), owner=user_id)
+    await reply(message, response_text, keyboard=keyboard)
 
 # ======================
 # ДОНАТ УСЛУГИ
@@ -2360,7 +2572,7 @@ async def admin_donate_business_list_handler(message: Message):
         return "❌ Ни у кого нет доступа к донатному бизнесу!"
     
     players_text = ""
-    current_time = datetime.now()
+    current_time = now_ts()
     
     for i, access in enumerate(all_access, 1):
         player = await get_player(access["user_id"])
@@ -2369,15 +2581,15 @@ async def admin_donate_business_list_handler(message: Message):
         if not player:
             continue
         
-        granted_date = datetime.fromisoformat(access["granted_at"]).strftime("%d.%m.%Y")
-        expires_at = datetime.fromisoformat(access["expires_at"])
-        expires_date = expires_at.strftime("%d.%m.%Y")
+        granted_date = format_ts(access["granted_at"], "%d.%m.%Y")
+        expires_at = to_ts(access["expires_at"])
+        expires_date = format_ts(expires_at, "%d.%m.%Y")
         
         # Проверяем, не истек ли доступ
         if expires_at < current_time:
             status = "❌ Истек"
         else:
-            days_left = (expires_at - current_time).days
+            days_left = days_until(expires_at)
             status = f"✅ {days_left} дней"
         
         admin_name = admin["username"] if admin else "Неизвестно"
@@ -2385,8 +2597,6 @@ async def admin_donate_business_list_handler(message: Message):
         players_text += f"{i}. [id{player['user_id']}|{player['username']}] - выдал [id{access['admin_id']}|{admin_name}]\n"
         players_text += f"   📅 Выдан: {granted_date} | Истекает: {expires_date} | Статус: {status}\n"
     
-    keyboard = create_donat_keyboard(await get_admin_access_level(user_id))
-    
     return (
         f"📋 Игроки с доступом к донатному бизнесу:\n\n"
         f"Всего: {len(all_access)} игроков\n\n"
@@ -2436,7 +2646,7 @@ async def grant_info_access_handler(message: Message, cmd_args: str):
         # Отзываем доступ
         if current_access:
             await remove_info_access(target_id, user_id)
-            expires_date = datetime.fromisoformat(current_access["expires_at"]).strftime("%d.%m.%Y")
+            expires_date = format_ts(current_access["expires_at"], "%d.%m.%Y")
             
             # Логируем действие
             await log_admin_action(
@@ -2460,8 +2670,8 @@ async def grant_info_access_handler(message: Message, cmd_args: str):
         if current_access:
             # Продлеваем существующий доступ
             await extend_info_access(target_id, days, user_id)
-            new_expires_at = (datetime.fromisoformat(current_access["expires_at"]) + timedelta(days=days))
-            expires_date = new_expires_at.strftime("%d.%m.%Y")
+            new_expires_at = to_ts(current_access["expires_at"]) + days * SECONDS_PER_DAY
+            expires_date = format_ts(new_expires_at, "%d.%m.%Y")
             action_text = "продлён"
         else:
             # Выдаем новый доступ
@@ -2505,7 +2715,7 @@ async def list_info_access_handler(message: Message):
         return "❌ Ни у кого нет доступа к команде Инфа!"
     
     players_text = ""
-    current_time = datetime.now()
+    current_time = now_ts()
     
     for i, access in enumerate(all_access, 1):
         player = await get_player(access["user_id"])
@@ -2514,15 +2724,15 @@ async def list_info_access_handler(message: Message):
         if not player:
             continue
         
-        granted_date = datetime.fromisoformat(access["granted_at"]).strftime("%d.%m.%Y")
-        expires_at = datetime.fromisoformat(access["expires_at"])
-        expires_date = expires_at.strftime("%d.%m.%Y")
+        granted_date = format_ts(access["granted_at"], "%d.%m.%Y")
+        expires_at = to_ts(access["expires_at"])
+        expires_date = format_ts(expires_at, "%d.%m.%Y")
         
         # Проверяем, не истек ли доступ
         if expires_at < current_time:
             status = "❌ Истек"
         else:
-            days_left = (expires_at - current_time).days
+            days_left = days_until(expires_at)
             status = f"✅ {days_left} дней"
         
         admin_name = admin["username"] if admin else "Неизвестно"
@@ -2530,8 +2740,6 @@ async def list_info_access_handler(message: Message):
         players_text += f"{i}. [id{player['user_id']}|{player['username']}] - выдал [id{access['admin_id']}|{admin_name}]\n"
         players_text += f"   📅 Выдан: {granted_date} | Истекает: {expires_date} | Статус: {status}\n"
     
-    keyboard = create_donat_keyboard(await get_admin_access_level(user_id))
-    
     return (
         f"📋 Игроки с доступом к Инфа:\n\n"
         f"Всего: {len(all_access)} игроков\n\n"
@@ -2605,12 +2813,8 @@ async def delete_player_handler(message: Message, cmd_args: str):
             return f"❌ Ошибка при создании заявки: {result['error']}"
     
     # Для старшей администрации и создателя - прямое удаление
-    created_date = datetime.fromisoformat(target_player["created_at"]).strftime(
-        "%d.%m.%Y"
-    )
-    days_exist = (
-        datetime.now() - datetime.fromisoformat(target_player["created_at"])
-    ).days
+    created_date = format_ts(target_player["created_at"], "%d.%m.%Y")
+    days_exist = days_since(target_player["created_at"])
     
     # Сохраняем запрос на удаление
     PENDING_DELETIONS[target_id] = {
@@ -2686,6 +2890,11 @@ async def admin_delete_clan_command(message: Message, tag: str):
         result = await delete_clan(tag, user_id)
         
         if result["success"]:
+            invalidate_top_contributors(clan["id"])
+            invalidate_clan_cards(clan["id"])
+            clan_search_index.remove(clan["tag"])
+            await delete_clan_bans(clan["id"])
+            
             # Логируем действие
             await log_admin_action(
                 user_id,
@@ -2724,7 +2933,7 @@ async def admin_delete_clan_command(message: Message, tag: str):
             f"👑 Владелец: ID: [id{clan['owner_id']}|{clan['owner_id']}]\n"
             f"👥 Участников: {member_count}\n"
             f"💰 Казна: {format_number(clan['treasury'])} монет\n"
-            f"📅 Существует: {(datetime.now() - datetime.fromisoformat(clan['created_at'])).days} дней\n\n"
+            f"📅 Существует: {days_since(clan['created_at'])} дней\n\n"
             f"❗ ВНИМАНИЕ ❗\n"
             f"• Все участники будут исключены\n"
             f"• Казна будет утеряна\n"
@@ -2732,7 +2941,7 @@ async def admin_delete_clan_command(message: Message, tag: str):
             f"✅ Для подтверждения отправьте команду еще раз:\n"
             f"Акудалить {tag.upper()}"
         )
-        await message.answer(response_text, disable_mentions=True)
+        await reply(message, response_text, disable_mentions=True)
 
 @admin_labeler.message(text=["Рассылка <cmd_args>", "рассылка <cmd_args>"])
 async def broadcast_message_handler(message: Message, cmd_args: str):
@@ -2758,7 +2967,7 @@ async def broadcast_message_handler(message: Message, cmd_args: str):
         if not can_broadcast:
             reset_time = stats.get("reset_time")
             if reset_time:
-                reset_str = datetime.fromisoformat(reset_time).strftime("%H:%M")
+                reset_str = format_ts(reset_time, "%H:%M")
                 return f"❌ Лимит рассылок исчерпан! Вы использовали 5/5 рассылок за сутки.\n🔄 Сброс лимита в {reset_str}"
             else:
                 return "❌ Лимит рассылок исчерпан! Вы использовали 5/5 рассылок за сутки."
@@ -2770,28 +2979,20 @@ async def broadcast_message_handler(message: Message, cmd_args: str):
         return "❌ Нет игроков для рассылки!"
     
     total_players = len(all_players)
-    successful_sends = 0
-    failed_sends = 0
     
     # Обновляем статистику использования для модераторов
     if admin_level == 3:
         await increment_broadcast_usage(user_id)
     
-    # Отправляем сообщение каждому игроку
-    for player in all_players:
-        try:
-            # Используем API VK для отправки сообщения
-            api = API(token=settings.VK_TOKEN)
-            await api.messages.send(
-                user_id=player["user_id"],
-                message=f"📢 Рассылка от администрации:\n\n{message_text}\n\n💎 Gym Legend",
-                random_id=0
-            )
-            successful_sends += 1
-        except Exception as e:
-            failed_sends += 1
-            # Логируем ошибку, но продолжаем рассылку
-            print(f"Ошибка отправки сообщения игроку {player['user_id']}: {e}")
+    # Рассылка идет медленной полосой очереди (по 100 получателей за запрос),
+    # ответы на команды игроков в это время не задерживаются
+    result = await broadcast(
+        message.ctx_api,
+        [player["user_id"] for player in all_players],
+        f"📢 Рассылка от администрации:\n\n{message_text}\n\n💎 Gym Legend",
+    )
+    successful_sends = result["successful"]
+    failed_sends = result["failed"]
     
     # Логируем действие
     await log_admin_action(
@@ -2833,10 +3034,10 @@ async def auto_cleanup_logs():
 # ЗАПУСК АВТООЧИСТКИ ЛОГОВ
 # ======================
 
-async def start_auto_cleanup():
+async def start_auto_cleanup() -> asyncio.Task:
     """Запуск автоочистки логов"""
-    # Запускаем в фоновом режиме
-    asyncio.create_task(auto_cleanup_logs())
+    # Фоновая служба: при остановке бота отменяется вместе с остальными
+    return lifecycle.service("автоочистка логов", auto_cleanup_logs())
 
 # В основном файле бота нужно будет вызвать:
 # await start_auto_cleanup()
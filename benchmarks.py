@@ -0,0 +1,956 @@
+import asyncio
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+
+from aiohttp import ClientSession, TCPConnector, web
+from vkbottle import Keyboard, KeyboardButtonColor, Text
+from vkbottle.bot import BotLabeler
+from vkbottle.tools import MemoryEventDeduplicator
+
+from bot.core.config import settings
+from bot.models import PlayerRow, format_ts
+from bot.services.callback_menu import callback_button
+from bot.services.callback_server import CallbackServer
+from bot.services.command_router import CommandRouter, compile_labelers
+from bot.services.event_dedup import EventDeduplicator
+from bot.services.lifecycle import Lifecycle
+from bot.services.menu_assets import MenuAssets
+from bot.services.outbox import OutgoingQueue
+from bot.services.sharding import ShardSupervisor
+
+# ======================
+# ЗАМЕРЫ ПРОИЗВОДИТЕЛЬНОСТИ
+# ======================
+# Запуск: python -m bot.benchmarks
+
+PLAYERS_COUNT = 100_000
+BASE_TS = 1_700_000_000
+
+
+def _measure(build):
+    """Время и пиковая память на построение набора строк"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = build()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, elapsed, peak
+
+
+# ======================
+# СТРОКИ ИГРОКОВ: ISO-СТРОКИ В dict ПРОТИВ PlayerRow С ЦЕЛЫМИ СЕКУНДАМИ
+# ======================
+
+def _iso_players() -> list:
+    return [
+        {
+            "user_id": i,
+            "username": f"player{i}",
+            "balance": i * 10,
+            "power": i,
+            "dumbbell_level": i % 20 + 1,
+            "created_at": datetime.fromtimestamp(BASE_TS + i).isoformat(),
+            "last_active": datetime.fromtimestamp(BASE_TS + i * 2).isoformat(),
+            "clan_joined_at": datetime.fromtimestamp(BASE_TS + i * 3).isoformat(),
+        }
+        for i in range(PLAYERS_COUNT)
+    ]
+
+
+def _epoch_players() -> list:
+    return [
+        PlayerRow(
+            user_id=i,
+            username=f"player{i}",
+            balance=i * 10,
+            power=i,
+            dumbbell_level=i % 20 + 1,
+            created_at=BASE_TS + i,
+            last_active=BASE_TS + i * 2,
+            clan_joined_at=BASE_TS + i * 3,
+        )
+        for i in range(PLAYERS_COUNT)
+    ]
+
+
+def bench_player_rows():
+    iso_rows, _, iso_memory = _measure(_iso_players)
+    epoch_rows, _, epoch_memory = _measure(_epoch_players)
+
+    # Декодирование - то, что обработчики делают при каждом выводе профиля
+    started = time.perf_counter()
+    for row in iso_rows:
+        datetime.fromisoformat(row["created_at"]).strftime("%d.%m.%Y %H:%M")
+        datetime.fromisoformat(row["last_active"])
+        datetime.fromisoformat(row["clan_joined_at"])
+    iso_decode = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for row in epoch_rows:
+        format_ts(row.created_at)
+        row.last_active
+        row.clan_joined_at
+    epoch_decode = time.perf_counter() - started
+
+    print(f"Игроков: {PLAYERS_COUNT:,}")
+    print(f"  ISO dict:  {iso_memory / 1024 / 1024:7.1f} МБ, "
+          f"декодирование {iso_decode / PLAYERS_COUNT * 1e6:6.2f} мкс/строка")
+    print(f"  PlayerRow: {epoch_memory / 1024 / 1024:7.1f} МБ, "
+          f"декодирование {epoch_decode / PLAYERS_COUNT * 1e6:6.2f} мкс/строка")
+
+
+# ======================
+# ПОДНЯТИЯ В SQLITE: ЗАПИСЬ НА КАЖДЫЙ ПОДХОД ПРОТИВ ПАКЕТНОГО FLUSH
+# ======================
+
+LIFT_PLAYERS = 10_000
+LIFT_CLANS = 500
+LIFT_BENCH_SECONDS = 5
+# Совпадает с LIFT_FLUSH_INTERVAL и LIFT_PLAYER_BATCH_ROWS из пайплайна
+LIFT_FLUSH_INTERVAL = 2
+LIFT_PLAYER_BATCH_ROWS = 100
+
+
+def _lift_db(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.executescript("""
+    CREATE TABLE players (
+        user_id INTEGER PRIMARY KEY, balance INTEGER, power INTEGER,
+        total_lifts INTEGER, total_earned INTEGER, clan_id INTEGER
+    );
+    CREATE TABLE clans (id INTEGER PRIMARY KEY, treasury INTEGER, total_lifts INTEGER);
+    CREATE TABLE clan_treasury_log (
+        id INTEGER PRIMARY KEY, clan_id INTEGER, user_id INTEGER, action_type TEXT,
+        amount INTEGER, description TEXT, created_at INTEGER
+    );
+    """)
+    conn.executemany(
+        "INSERT INTO players VALUES (?, 0, 0, 0, 0, ?)",
+        ((i, i % LIFT_CLANS) for i in range(LIFT_PLAYERS)),
+    )
+    conn.executemany("INSERT INTO clans VALUES (?, 0, 0)", ((i,) for i in range(LIFT_CLANS)))
+    return conn
+
+
+def _lift_per_request(conn: sqlite3.Connection, user_id: int):
+    """Как раньше: чтение игрока и три записи на каждый подход"""
+    _, _, _, _, _, clan_id = conn.execute("SELECT * FROM players WHERE user_id = ?", (user_id,)).fetchone()
+    conn.execute(
+        "UPDATE players SET balance = balance + 5, power = power + 5, "
+        "total_lifts = total_lifts + 1, total_earned = total_earned + 5 WHERE user_id = ?",
+        (user_id,),
+    )
+    conn.execute("UPDATE clans SET treasury = treasury + 1, total_lifts = total_lifts + 1 WHERE id = ?", (clan_id,))
+    conn.execute(
+        "INSERT INTO clan_treasury_log (clan_id, user_id, action_type, amount, description, created_at) "
+        "VALUES (?, ?, 'lift_income', 1, 'Доход с поднятий', ?)",
+        (clan_id, user_id, int(time.time())),
+    )
+
+
+def _delta_update(table: str, key: str, columns: tuple, batch: list) -> tuple:
+    assignments = ", ".join(
+        f"{column} = {column} + CASE {key} {' '.join(['WHEN ? THEN ?'] * len(batch))} END"
+        for column in columns
+    )
+    query = f"UPDATE {table} SET {assignments} WHERE {key} IN ({', '.join(['?'] * len(batch))})"
+    params = []
+    for i in range(len(columns)):
+        for row_id, deltas in batch:
+            params.extend([row_id, deltas[i]])
+    params.extend(row_id for row_id, _ in batch)
+    return query, params
+
+
+def _flush_batched(conn: sqlite3.Connection, players: dict, clans: dict):
+    """Как в пайплайне: накопленные дельты одним UPDATE ... CASE на пачку"""
+    conn.execute("BEGIN")
+    for table, key, columns, pending in (
+        ("players", "user_id", ("balance", "power", "total_lifts", "total_earned"), players),
+        ("clans", "id", ("treasury", "total_lifts"), clans),
+    ):
+        items = list(pending.items())
+        for start in range(0, len(items), LIFT_PLAYER_BATCH_ROWS):
+            conn.execute(*_delta_update(table, key, columns, items[start:start + LIFT_PLAYER_BATCH_ROWS]))
+    conn.execute("COMMIT")
+    players.clear()
+    clans.clear()
+
+
+def _run_lifts(lift) -> float:
+    """Подходов в секунду за LIFT_BENCH_SECONDS секунд"""
+    rng = random.Random(1)
+    lifts = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < LIFT_BENCH_SECONDS:
+        lift(rng.randrange(LIFT_PLAYERS))
+        lifts += 1
+    return lifts / (time.perf_counter() - started)
+
+
+def bench_lifts():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = _lift_db(os.path.join(tmp, "before.db"))
+        before = _run_lifts(lambda user_id: _lift_per_request(conn, user_id))
+        conn.close()
+
+        conn = _lift_db(os.path.join(tmp, "after.db"))
+        players: dict = {}
+        clans: dict = {}
+        last_flush = time.perf_counter()
+
+        def lift(user_id):
+            nonlocal last_flush
+            # Чтение игрока остается, записи копятся в памяти
+            _, _, _, _, _, clan_id = conn.execute(
+                "SELECT * FROM players WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            deltas = players.setdefault(user_id, [0, 0, 0, 0])
+            deltas[0] += 5
+            deltas[1] += 5
+            deltas[2] += 1
+            deltas[3] += 5
+            clan_deltas = clans.setdefault(clan_id, [0, 0])
+            clan_deltas[0] += 1
+            clan_deltas[1] += 1
+            if time.perf_counter() - last_flush >= LIFT_FLUSH_INTERVAL:
+                _flush_batched(conn, players, clans)
+                last_flush = time.perf_counter()
+
+        after = _run_lifts(lift)
+        _flush_batched(conn, players, clans)
+        conn.close()
+
+    print(f"Поднятия в SQLite ({LIFT_PLAYERS:,} игроков, {LIFT_CLANS} кланов):")
+    print(f"  запись на каждый подход: {before:10,.0f} подходов/с")
+    print(f"  пакетный flush раз в {LIFT_FLUSH_INTERVAL} с: {after:10,.0f} подходов/с "
+          f"(x{after / before:.1f})")
+
+
+# ======================
+# МАРШРУТИЗАЦИЯ КОМАНД: ПЕРЕБОР VBML-ШАБЛОНОВ ПРОТИВ ПРЕФИКСНОГО ДЕРЕВА
+# ======================
+
+ROUTING_COMMANDS = 120
+ROUTING_MESSAGES = 20_000
+# Доля сообщений, не являющихся командами (для перебора - худший случай)
+ROUTING_CHATTER = 0.3
+
+
+class _BenchMessage:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def _routing_labeler() -> BotLabeler:
+    """ROUTING_COMMANDS команд с псевдонимами, как у настоящих лейблеров"""
+    labeler = BotLabeler()
+    labeler.vbml_ignore_case = True
+
+    async def handler(message, **kwargs):
+        return None
+
+    for i in range(ROUTING_COMMANDS):
+        if i % 3 == 0:
+            patterns = [f"команда{i}", f"/команда{i}"]
+        elif i % 3 == 1:
+            patterns = [f"к действие{i} <cmd_args>", f"/к действие{i} <cmd_args>"]
+        else:
+            patterns = [f"Админ{i} <cmd_args>", f"админ{i} <cmd_args>", f"/админ{i} <cmd_args>"]
+        labeler.message(text=patterns)(handler)
+    return labeler
+
+
+def _routing_messages() -> list:
+    rng = random.Random(1)
+    messages = []
+    for _ in range(ROUTING_MESSAGES):
+        i = rng.randrange(ROUTING_COMMANDS)
+        if rng.random() < ROUTING_CHATTER:
+            text = f"привет, как дела {i}"
+        elif i % 3 == 0:
+            text = f"/Команда{i}"
+        elif i % 3 == 1:
+            text = f"К действие{i} {rng.randrange(10 ** 6)}"
+        else:
+            text = f"админ{i} {rng.randrange(10 ** 6)} причина"
+        messages.append(_BenchMessage(text))
+    return messages
+
+
+async def _route_all(handlers: list, messages: list) -> float:
+    """Сообщений в секунду: первый обработчик, чей filter прошел, как в vkbottle"""
+    started = time.perf_counter()
+    for message in messages:
+        for handler in handlers:
+            if await handler.filter(message, {}) is not False:
+                break
+    return len(messages) / (time.perf_counter() - started)
+
+
+def bench_command_routing():
+    messages = _routing_messages()
+
+    labeler = _routing_labeler()
+    before = asyncio.run(_route_all(labeler.message_view.handlers, messages))
+
+    labeler = _routing_labeler()
+    router = compile_labelers(labeler, router=CommandRouter())
+    after = asyncio.run(_route_all(labeler.message_view.handlers, messages))
+
+    print(f"Маршрутизация ({ROUTING_COMMANDS} команд, {router.commands} маршрутов, "
+          f"{ROUTING_CHATTER:.0%} не команд):")
+    print(f"  перебор VBML-шаблонов: {before:10,.0f} сообщений/с")
+    print(f"  префиксное дерево:     {after:10,.0f} сообщений/с (x{after / before:.1f})")
+
+
+# ======================
+# ОТВЕТЫ ВО ВРЕМЯ РАССЫЛКИ: ОБЩАЯ ОЧЕРЕДЬ ПРОТИВ ДВУХ ПОЛОС
+# ======================
+# VK заменен заглушкой с задержкой ответа; лимит запросов увеличен в
+# OUTBOX_BENCH_SPEEDUP раз, чтобы рассылка на 50k шла секунды, а не минуты.
+
+OUTBOX_BENCH_SPEEDUP = 200
+OUTBOX_BENCH_RATE = 20 * OUTBOX_BENCH_SPEEDUP
+OUTBOX_BENCH_RECIPIENTS = 50_000
+OUTBOX_BENCH_SECONDS = 3
+OUTBOX_BENCH_REPLIES_PER_SECOND = 20 * OUTBOX_BENCH_SPEEDUP // 10
+VK_LATENCY = 0.03
+
+
+class _BenchSent:
+    error = None
+
+
+class _BenchMessages:
+    async def send(self, peer_ids: list, **kwargs):
+        await asyncio.sleep(VK_LATENCY)
+        return [_BenchSent() for _ in peer_ids]
+
+
+class _BenchAPI:
+    messages = _BenchMessages()
+
+
+class _BenchPeer:
+    ctx_api = _BenchAPI()
+
+    def __init__(self, peer_id: int):
+        self.peer_id = peer_id
+
+    async def answer(self, text: str, **kwargs):
+        await asyncio.sleep(VK_LATENCY)
+        return _BenchSent()
+
+
+def _percentile(values: list, share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] * 1000
+
+
+async def _interactive_latencies(send_reply) -> list:
+    """Ответы на команды с постоянной частотой; задержка каждого до доставки"""
+    latencies = []
+    tasks = []
+
+    async def one(peer_id):
+        started = time.perf_counter()
+        await send_reply(_BenchPeer(peer_id))
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - started < OUTBOX_BENCH_SECONDS:
+        due = int((time.perf_counter() - started) * OUTBOX_BENCH_REPLIES_PER_SECOND)
+        while sent < due:
+            tasks.append(asyncio.create_task(one(sent)))
+            sent += 1
+        await asyncio.sleep(0.001)
+    await asyncio.gather(*tasks)
+    return latencies
+
+
+async def _fifo_run() -> list:
+    """Как раньше: каждое сообщение рассылки - отдельный запрос, ответы ждут в той же очереди"""
+    queue: deque = deque((None, peer_id) for peer_id in range(OUTBOX_BENCH_RECIPIENTS))
+    wakeup = asyncio.Event()
+
+    async def worker():
+        tick = 0.01
+        while True:
+            if not queue:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+            # Тот же лимит запросов: OUTBOX_BENCH_RATE в секунду, пачками раз в tick
+            for _ in range(min(len(queue), int(OUTBOX_BENCH_RATE * tick))):
+                future, peer_id = queue.popleft()
+                if future is None:
+                    asyncio.create_task(_BenchAPI.messages.send([peer_id]))
+                else:
+                    asyncio.create_task(_BenchPeer(peer_id).answer("")).add_done_callback(
+                        lambda task, future=future: future.set_result(task.result())
+                    )
+            await asyncio.sleep(tick)
+
+    async def send_reply(peer):
+        future = asyncio.get_running_loop().create_future()
+        queue.append((future, peer.peer_id))
+        wakeup.set()
+        await future
+
+    task = asyncio.create_task(worker())
+    latencies = await _interactive_latencies(send_reply)
+    task.cancel()
+    return latencies
+
+
+async def _outbox_run() -> tuple:
+    queue = OutgoingQueue(rate=OUTBOX_BENCH_RATE)
+    broadcast_task = asyncio.create_task(_broadcast_with(queue))
+    latencies = await _interactive_latencies(lambda peer: queue.reply(peer, "ответ"))
+    broadcast_started = time.perf_counter()
+    result = await broadcast_task
+    return latencies, result, time.perf_counter() - broadcast_started
+
+
+async def _broadcast_with(queue: OutgoingQueue) -> dict:
+    futures = queue.send_bulk(_BenchAPI(), list(range(OUTBOX_BENCH_RECIPIENTS)), "рассылка")
+    results = await asyncio.gather(*futures)
+    return {"successful": sum(len(result) for result in results), "requests": len(futures)}
+
+
+def bench_outbox():
+    before = asyncio.run(_fifo_run())
+    after, result, tail = asyncio.run(_outbox_run())
+
+    print(f"Ответы во время рассылки на {OUTBOX_BENCH_RECIPIENTS:,} игроков "
+          f"(лимит VK x{OUTBOX_BENCH_SPEEDUP}, задержка VK {VK_LATENCY * 1000:.0f} мс):")
+    print(f"  общая очередь: p50 {_percentile(before, 0.5):8.0f} мс, p99 {_percentile(before, 0.99):8.0f} мс")
+    print(f"  две полосы:    p50 {_percentile(after, 0.5):8.0f} мс, p99 {_percentile(after, 0.99):8.0f} мс")
+    print(f"  рассылка: {result['requests']} запросов вместо {OUTBOX_BENCH_RECIPIENTS:,}, "
+          f"доставлено {result['successful']:,}")
+
+
+# ======================
+# МЕНЮ: СБОРКА КЛАВИАТУРЫ НА КАЖДЫЙ ПОКАЗ ПРОТИВ ГОТОВОГО JSON
+# ======================
+# Клавиатура того же размера, что у раздела "Старшая админ" (7 кнопок,
+# callback-кнопки с id владельца и текстовые команды).
+
+MENU_BENCH_SHOWS = 20_000
+
+
+def _bench_menu_keyboard(admin_level: int, _, owner: int) -> Keyboard:
+    keyboard = Keyboard(inline=True)
+    callback_button(keyboard, "👑 Назначить", "a.h.make_admin", owner, KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "❌ Снять", "a.h.remove_admin", owner, KeyboardButtonColor.NEGATIVE)
+    keyboard.row()
+    keyboard.add(Text("Статистика"), color=KeyboardButtonColor.POSITIVE)
+    keyboard.row()
+    callback_button(keyboard, "✅ Апринять", "a.h.approve", owner, KeyboardButtonColor.POSITIVE)
+    callback_button(keyboard, "❌ Аотклонить", "a.h.reject", owner, KeyboardButtonColor.NEGATIVE)
+    keyboard.row()
+    keyboard.add(Text("Аожидание"), color=KeyboardButtonColor.POSITIVE)
+    back = "a.creator" if admin_level == 1 else "a.main"
+    callback_button(keyboard, "🔙 Назад", back, owner, KeyboardButtonColor.SECONDARY)
+    return keyboard
+
+
+def bench_menu_assets():
+    owners = [random.randint(1, 800_000_000) for _ in range(MENU_BENCH_SHOWS)]
+
+    started = time.perf_counter()
+    built = [_bench_menu_keyboard(2, False, owner).get_json() for owner in owners]
+    before = MENU_BENCH_SHOWS / (time.perf_counter() - started)
+
+    assets = MenuAssets()
+    assets.register("a.senior", _bench_menu_keyboard, (1, 2, 3))
+    assets.build()
+    started = time.perf_counter()
+    cached = [assets.get("a.senior", 2, owner=owner) for owner in owners]
+    after = MENU_BENCH_SHOWS / (time.perf_counter() - started)
+
+    assert cached == built
+    print(f"Показ меню ({MENU_BENCH_SHOWS:,} показов, клавиатура из 7 кнопок):")
+    print(f"  сборка и JSON на каждый показ: {before:10,.0f} показов/с")
+    print(f"  готовый JSON из кэша:          {after:10,.0f} показов/с (x{after / before:.1f})")
+
+
+# ======================
+# ПРИЕМ СОБЫТИЙ: LONG POLL ПРОТИВ CALLBACK API
+# ======================
+# VK изображает отдельный процесс (его работа не отнимает время у бота),
+# события появляются с постоянной частотой, задержка сети до VK -
+# VK_LATENCY туда и обратно. Long poll - один поток запросов, каждый
+# забирает до LONGPOLL_BATCH накопившихся событий. Callback API - VK шлет
+# каждое событие отдельным запросом, параллельно по
+# CALLBACK_BENCH_CONNECTIONS соединениям. Обработка события имитирует
+# запрос к базе (EVENT_HANDLE_TIME).
+
+EVENTS_BENCH_RATES = (1_500, 4_000)
+EVENTS_BENCH_SECONDS = 5
+LONGPOLL_BATCH = 100
+CALLBACK_BENCH_CONNECTIONS = 256
+EVENT_HANDLE_TIME = 0.005
+
+
+class _VkFeed:
+    """События VK: i-е появляется в start + i / rate"""
+
+    def __init__(self, rate: int):
+        self.rate = rate
+        self.count = rate * EVENTS_BENCH_SECONDS
+        self.start = time.time() + 1
+
+    def appeared_at(self, i: int) -> float:
+        return self.start + i / self.rate
+
+    def available(self) -> int:
+        return min(self.count, int((time.time() - self.start) * self.rate) + 1)
+
+    def event(self, i: int) -> dict:
+        return {
+            "type": "message_new",
+            "event_id": f"e{i}",
+            "group_id": 1,
+            "object": {"message": {"text": "профиль"}, "appeared": self.appeared_at(i)},
+        }
+
+
+async def _sleep_until(moment: float):
+    delay = moment - time.time()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+async def _vk_longpoll(feed: _VkFeed, urls):
+    """Сервер long poll: отдает накопившиеся события, пустой ответ - не раньше первого нового"""
+    async def longpoll(request: web.Request) -> web.Response:
+        ts = int(request.query["ts"])
+        # Запрос до VK, ожидание новых событий, ответ обратно
+        await asyncio.sleep(VK_LATENCY / 2)
+        await _sleep_until(feed.appeared_at(ts))
+        await asyncio.sleep(VK_LATENCY / 2)
+        end = min(feed.available(), ts + LONGPOLL_BATCH)
+        return web.json_response({"ts": end, "updates": [feed.event(i) for i in range(ts, end)]})
+
+    app = web.Application()
+    app.router.add_get("/lp", longpoll)
+    runner, url = await _serve(app)
+    urls.put(url)
+    await asyncio.Event().wait()
+
+
+async def _vk_callback(feed: _VkFeed, url: str, secret: str):
+    """VK присылает каждое событие POST-запросом и повторяет его, пока ответ не ok"""
+    appeared: asyncio.Queue = asyncio.Queue()
+
+    async def sender(session: ClientSession):
+        while True:
+            event = await appeared.get()
+            while True:
+                # Запрос до бота, ответ обратно
+                await asyncio.sleep(VK_LATENCY / 2)
+                async with session.post(url, json={**event, "secret": secret}) as response:
+                    ok = await response.text() == "ok"
+                await asyncio.sleep(VK_LATENCY / 2)
+                if ok:
+                    break
+            appeared.task_done()
+
+    async with ClientSession(connector=TCPConnector(limit=CALLBACK_BENCH_CONNECTIONS)) as session:
+        senders = [asyncio.create_task(sender(session)) for _ in range(CALLBACK_BENCH_CONNECTIONS)]
+        for i in range(feed.count):
+            await _sleep_until(feed.appeared_at(i))
+            appeared.put_nowait(feed.event(i))
+        await appeared.join()
+        for task in senders:
+            task.cancel()
+
+
+def _vk_process(mode: str, feed: _VkFeed, *args):
+    if mode == "longpoll":
+        asyncio.run(_vk_longpoll(feed, *args))
+    else:
+        asyncio.run(_vk_callback(feed, *args))
+
+
+class _EventSink:
+    """Обработчик событий: задержка каждого от появления в VK до конца обработки"""
+
+    def __init__(self, count: int):
+        self.count = count
+        self.latencies = []
+        self.finished = None
+        self.done = asyncio.Event()
+
+    async def process(self, event: dict):
+        await asyncio.sleep(EVENT_HANDLE_TIME)
+        self.latencies.append(time.time() - event["object"]["appeared"])
+        if len(self.latencies) == self.count:
+            self.finished = time.time()
+            self.done.set()
+
+
+async def _serve(app: web.Application) -> tuple:
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+
+async def _longpoll_run(rate: int) -> tuple:
+    feed = _VkFeed(rate)
+    urls = multiprocessing.Queue()
+    vk = multiprocessing.Process(target=_vk_process, args=("longpoll", feed, urls), daemon=True)
+    vk.start()
+    url = await asyncio.get_running_loop().run_in_executor(None, urls.get)
+
+    sink = _EventSink(feed.count)
+    pending = set()
+    ts = 0
+    async with ClientSession() as session:
+        # Как Bot.run_polling: по задаче на каждое событие
+        while ts < feed.count:
+            async with session.get(f"{url}/lp", params={"ts": ts}) as response:
+                data = await response.json()
+            ts = data["ts"]
+            for update in data["updates"]:
+                task = asyncio.create_task(sink.process(update))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        await sink.done.wait()
+
+    vk.terminate()
+    return feed.count / (sink.finished - feed.start), sink.latencies
+
+
+async def _callback_run(rate: int) -> tuple:
+    server = CallbackServer(confirmation="bench", secret="s3cret")
+    feed = _VkFeed(rate)
+    sink = _EventSink(feed.count)
+    await server.start(sink.process, "127.0.0.1", 0)
+    host, port = server.addresses[0][:2]
+    url = f"http://{host}:{port}{settings.CALLBACK_PATH}"
+
+    vk = multiprocessing.Process(target=_vk_process, args=("callback", feed, url, "s3cret"), daemon=True)
+    vk.start()
+    await sink.done.wait()
+
+    vk.terminate()
+    await server.stop()
+    return feed.count / (sink.finished - feed.start), sink.latencies, server.rejected
+
+
+def bench_event_intake():
+    print(f"Прием событий (задержка сети {VK_LATENCY * 1000:.0f} мс, обработка {EVENT_HANDLE_TIME * 1000:.0f} мс):")
+    for rate in EVENTS_BENCH_RATES:
+        before, before_latencies = asyncio.run(_longpoll_run(rate))
+        after, after_latencies, rejected = asyncio.run(_callback_run(rate))
+
+        print(f"  {rate:,} событий/с в течение {EVENTS_BENCH_SECONDS} с:")
+        print(f"    long poll (до {LONGPOLL_BATCH} за запрос): {before:7,.0f} событий/с, "
+              f"задержка p50 {_percentile(before_latencies, 0.5):6.0f} мс, "
+              f"p99 {_percentile(before_latencies, 0.99):6.0f} мс")
+        print(f"    Callback API ({CALLBACK_BENCH_CONNECTIONS} соединений): {after:7,.0f} событий/с, "
+              f"задержка p50 {_percentile(after_latencies, 0.5):6.0f} мс, "
+              f"p99 {_percentile(after_latencies, 0.99):6.0f} мс, отказов {rejected}")
+
+# ======================
+# НЕСКОЛЬКО ПРОЦЕССОВ: ТЯЖЕЛЫЕ ДЛЯ ПРОЦЕССОРА КОМАНДЫ
+# ======================
+# Каждое событие - сборка и форматирование топа на SHARD_BENCH_TOP_ROWS строк
+# (без базы), события от SHARD_BENCH_USERS игроков раздаются процессам по
+# user_id. Прирост ограничен числом ядер машины (os.cpu_count()).
+
+SHARD_BENCH_EVENTS = 4_000
+SHARD_BENCH_USERS = 1_000
+SHARD_BENCH_TOP_ROWS = 300
+SHARD_BENCH_WORKERS = (1, 2, 4)
+
+
+def _heavy_command(user_id: int) -> str:
+    rng = random.Random(user_id)
+    rows = sorted(
+        ((rng.randrange(10**9), rng.randrange(1, 10**9)) for _ in range(SHARD_BENCH_TOP_ROWS)),
+        reverse=True,
+    )
+    return "\n".join(
+        f"{place}. [id{uid}|Игрок {uid}] - {balance:,} монет".replace(",", " ")
+        for place, (balance, uid) in enumerate(rows, 1)
+    )
+
+
+async def _heavy_worker_main():
+    async def process_event(event: dict):
+        _heavy_command(event["object"]["message"]["from_id"])
+    return process_event
+
+
+def _sharded_run(workers: int) -> float:
+    started = None
+
+    async def intake(dispatch):
+        nonlocal started
+        started = time.perf_counter()
+        for i in range(SHARD_BENCH_EVENTS):
+            user_id = i % SHARD_BENCH_USERS + 1
+            await dispatch({"type": "message_new", "object": {"message": {"from_id": user_id, "text": "топ"}}})
+
+    # run() возвращается, когда процессы обработали все события
+    ShardSupervisor(workers).run(_heavy_worker_main, intake)
+    return SHARD_BENCH_EVENTS / (time.perf_counter() - started)
+
+
+def bench_sharding():
+    print(f"Тяжелые команды в нескольких процессах ({SHARD_BENCH_EVENTS:,} событий, "
+          f"ядер: {os.cpu_count()}):")
+    base = None
+    for workers in SHARD_BENCH_WORKERS:
+        rate = _sharded_run(workers)
+        base = base or rate
+        print(f"  процессов {workers}: {rate:8,.0f} событий/с (x{rate / base:.1f})")
+
+
+# ======================
+# ПОВТОРНО ДОСТАВЛЕННЫЕ СОБЫТИЯ: ОКНО + БЛУМ-ФИЛЬТР ПРОТИВ СЛОВАРЯ vkbottle
+# ======================
+# Поток сообщений DEDUP_BENCH_RATE в секунду (время модельное). Часть
+# событий приходит повторно: после переподключения long poll (через
+# секунды) и повторной отправки Callback API (через минуты - дольше
+# точного окна). Считаем пойманные повторы, ложно отброшенные новые
+# события, скорость и память.
+
+DEDUP_BENCH_EVENTS = 400_000
+DEDUP_BENCH_RATE = 2_000
+DEDUP_BENCH_RECONNECT_SHARE = 0.02
+DEDUP_BENCH_RETRY_SHARE = 0.01
+
+
+def _dedup_stream() -> tuple:
+    """[(модельное время, событие, повтор ли)] по возрастанию времени"""
+    rng = random.Random(7)
+    stream = []
+    for i in range(DEDUP_BENCH_EVENTS):
+        at = i / DEDUP_BENCH_RATE
+        event = {
+            "type": "message_new",
+            "group_id": 1,
+            "event_id": f"{i:x}",
+            "object": {"message": {"peer_id": 2_000_000_000 + i % 500, "conversation_message_id": i, "text": "поднять"}},
+        }
+        stream.append((at, event, False))
+        roll = rng.random()
+        if roll < DEDUP_BENCH_RECONNECT_SHARE:
+            stream.append((at + rng.uniform(1, 10), event, True))
+        elif roll < DEDUP_BENCH_RECONNECT_SHARE + DEDUP_BENCH_RETRY_SHARE:
+            stream.append((at + rng.uniform(150, 600), event, True))
+    stream.sort(key=lambda item: item[0])
+    return stream
+
+
+def _dedup_score(stream: list, build) -> tuple:
+    """(пойманные повторы, ложно отброшенные, мкс на событие, пиковая память)"""
+    is_new = build()
+    verdicts = []
+    started = time.perf_counter()
+    for at, event, _ in stream:
+        verdicts.append(is_new(event, at))
+    elapsed = time.perf_counter() - started
+
+    caught = sum(1 for (_, _, duplicate), new in zip(stream, verdicts) if duplicate and not new)
+    false_drops = sum(1 for (_, _, duplicate), new in zip(stream, verdicts) if not duplicate and not new)
+
+    # Память - отдельным прогоном, tracemalloc сильно замедляет
+    tracemalloc.start()
+    is_new = build()
+    for at, event, _ in stream:
+        is_new(event, at)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return caught, false_drops, elapsed / len(stream) * 1e6, peak
+
+
+def bench_event_dedup():
+    stream = _dedup_stream()
+    duplicates = sum(1 for _, _, duplicate in stream if duplicate)
+
+    # Словарь vkbottle: 10 000 ключей, TTL 300 с (по времени цикла - здесь не успевает истечь)
+    loop = asyncio.new_event_loop()
+
+    def vkbottle_dedup():
+        dedup = MemoryEventDeduplicator()
+        return lambda event, at: loop.run_until_complete(dedup.claim(event))
+
+    before = _dedup_score(stream, vkbottle_dedup)
+    loop.close()
+
+    after = _dedup_score(stream, lambda: EventDeduplicator().is_new)
+
+    print(f"Повторные события ({len(stream):,} событий, из них повторов {duplicates:,}, "
+          f"{DEDUP_BENCH_RATE:,}/с модельного времени):")
+    for title, (caught, false_drops, per_event, peak) in (
+        ("словарь vkbottle (10k)", before),
+        ("окно + блум-фильтр", after),
+    ):
+        print(f"  {title:22}: поймано {caught:7,} ({caught / duplicates:.1%}), ложно отброшено {false_drops}, "
+              f"{per_event:5.1f} мкс/событие, память {peak / 2**20:5.1f} МБ")
+
+
+
+# ======================
+# ОСТАНОВКА ПО SIGTERM: ПОТЕРЯННЫЕ И ДВАЖДЫ ПРИМЕНЕННЫЕ ЗАПИСИ
+# ======================
+# Процесс бота принимает SHUTDOWN_BENCH_RATE событий в секунду; обработчик
+# работает 0-50 мс, кладет начисление в пакетный накопитель (как поднятия) и
+# отвечает игроку. Пачка пишется в базу в отдельном потоке и занимает
+# большую часть интервала - как запись под нагрузкой; незаписанное при
+# ошибке возвращается в накопитель (как в flush_lifts). Через
+# SHUTDOWN_BENCH_UPTIME секунд (с шагом, чтобы сигнал попадал в разные
+# моменты записи) процессу приходит SIGTERM; так SHUTDOWN_BENCH_RESTARTS раз.
+#   потеряно - начисления из отвеченных событий, которых нет в базе;
+#   дважды   - начисления, записанные в базу больше одного раза.
+
+SHUTDOWN_BENCH_RATE = 500
+SHUTDOWN_BENCH_UPTIME = 2.5
+SHUTDOWN_BENCH_FLUSH_INTERVAL = 0.25
+SHUTDOWN_BENCH_WRITE_TIME = 0.2
+SHUTDOWN_BENCH_RESTARTS = 8
+
+
+def _shutdown_child(mode: str, path: str, answered):
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL")
+    pending = []
+
+    def write(batch: list):
+        time.sleep(SHUTDOWN_BENCH_WRITE_TIME)
+        conn.executemany("INSERT INTO grants (event_id) VALUES (?)", [(event_id,) for event_id in batch])
+
+    async def flush():
+        batch, pending[:] = list(pending), []
+        try:
+            await asyncio.to_thread(write, batch)
+            batch = []
+        finally:
+            # Незаписанное (при ошибке или отмене) - обратно в накопитель
+            pending[:0] = batch
+
+    async def cancelled_flusher():
+        # Прежняя схема: последняя запись при отмене задачи
+        while True:
+            try:
+                await asyncio.sleep(SHUTDOWN_BENCH_FLUSH_INTERVAL)
+                await flush()
+            except asyncio.CancelledError:
+                await flush()
+                raise
+
+    async def paused_flusher(lifecycle: Lifecycle):
+        while True:
+            stopping = await lifecycle.pause(SHUTDOWN_BENCH_FLUSH_INTERVAL)
+            await flush()
+            if stopping:
+                return
+
+    async def handle(event_id: int):
+        await asyncio.sleep(random.uniform(0, 0.05))
+        pending.append(event_id)
+        with answered.get_lock():
+            answered.value += 1
+
+    async def main():
+        lifecycle = Lifecycle()
+        spawn = asyncio.create_task if mode == "none" else lifecycle.track
+
+        async def intake():
+            for event_id in range(10**9):
+                spawn(handle(event_id))
+                await asyncio.sleep(1 / SHUTDOWN_BENCH_RATE)
+
+        if mode == "none":
+            # Без lifecycle: задачи без учета, SIGTERM завершает процесс сразу
+            asyncio.create_task(cancelled_flusher())
+            await intake()
+        elif mode == "cancel":
+            lifecycle.service("начисления", cancelled_flusher())
+        else:
+            lifecycle.service("начисления", paused_flusher(lifecycle), graceful=True)
+        lifecycle.intake("события", intake())
+
+        async def checkpoint():
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        lifecycle.on_stop("close", "WAL", checkpoint)
+        await lifecycle.run()
+
+    asyncio.run(main())
+
+
+def _shutdown_run(mode: str, uptime: float) -> tuple:
+    """(ответов, потеряно, записано дважды, секунд от SIGTERM до выхода, размер WAL)"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bot.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE grants (event_id INTEGER)")
+        conn.commit()
+        conn.close()
+
+        answered = multiprocessing.Value("q", 0)
+        process = multiprocessing.get_context("fork").Process(
+            target=_shutdown_child, args=(mode, path, answered)
+        )
+        process.start()
+        time.sleep(uptime)
+        started = time.perf_counter()
+        process.terminate()
+        process.join()
+        elapsed = time.perf_counter() - started
+
+        wal = path + "-wal"
+        wal_size = os.path.getsize(wal) if os.path.exists(wal) else 0
+        conn = sqlite3.connect(path)
+        rows, distinct = conn.execute("SELECT COUNT(*), COUNT(DISTINCT event_id) FROM grants").fetchone()
+        conn.close()
+        return answered.value, answered.value - distinct, rows - distinct, elapsed, wal_size
+
+
+def bench_graceful_shutdown():
+    print(f"Остановка по SIGTERM x{SHUTDOWN_BENCH_RESTARTS} ({SHUTDOWN_BENCH_RATE}/с, запись пачки {SHUTDOWN_BENCH_WRITE_TIME * 1000:.0f} мс "
+          f"раз в {SHUTDOWN_BENCH_FLUSH_INTERVAL * 1000:.0f} мс, срок дообработки {settings.SHUTDOWN_DRAIN_TIMEOUT} с):")
+    for title, mode in (
+        ("без lifecycle", "none"),
+        ("отмена записи", "cancel"),
+        ("lifecycle.pause", "pause"),
+    ):
+        runs = [
+            _shutdown_run(mode, SHUTDOWN_BENCH_UPTIME + i * SHUTDOWN_BENCH_FLUSH_INTERVAL / SHUTDOWN_BENCH_RESTARTS)
+            for i in range(SHUTDOWN_BENCH_RESTARTS)
+        ]
+        answered, lost, doubled = (sum(run[i] for run in runs) for i in range(3))
+        slowest = max(run[3] for run in runs)
+        wal_size = max(run[4] for run in runs)
+        print(f"  {title:15}: отвечено {answered:6,}, потеряно {lost:5,}, дважды {doubled:5,}, "
+              f"остановка до {slowest * 1000:6.1f} мс, WAL после выхода до {wal_size / 1024:6.1f} КБ")
+
+if __name__ == "__main__":
+    bench_player_rows()
+    bench_lifts()
+    bench_command_routing()
+    bench_outbox()
+    bench_menu_assets()
+    bench_event_intake()
+    bench_sharding()
+    bench_event_dedup()
+    bench_graceful_shutdown()
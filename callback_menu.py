@@ -0,0 +1,86 @@
+from vkbottle import Callback, GroupEventType
+from vkbottle.bot import BotLabeler, MessageEvent
+
+# ======================
+# МЕНЮ НА CALLBACK-КНОПКАХ (message_event)
+# ======================
+# Нажатие callback-кнопки не присылает сообщение в чат и не проходит через
+# текстовые команды: VK передает событие с payload {"m": раздел, "u": владелец}.
+# Роутер по ключу раздела находит функцию, проверяет, что нажал тот, кто
+# открыл меню, и редактирует сообщение с меню на месте.
+
+MENU_KEY = "m"
+MENU_OWNER = "u"
+
+MENU_FOREIGN_TEXT = "❌ Это меню открыл другой игрок"
+MENU_EXPIRED_TEXT = "⌛ Меню устарело, откройте его заново"
+
+
+def callback_button(keyboard, label: str, section: str, owner: int, color=None):
+    """Кнопка раздела меню; payload - только ключ раздела и user_id владельца"""
+    keyboard.add(Callback(label, {MENU_KEY: section, MENU_OWNER: owner}), color=color)
+    return keyboard
+
+
+class CallbackMenuRouter:
+    """Раздел меню -> функция(user_id), которая возвращает (текст, клавиатура) или текст отказа"""
+
+    def __init__(self):
+        self._sections: dict = {}
+
+    def section(self, key: str):
+        def decorator(func):
+            if key in self._sections:
+                raise ValueError(f"Раздел меню {key} уже зарегистрирован")
+            self._sections[key] = func
+            return func
+        return decorator
+
+    def hint(self, key: str, text: str):
+        """Кнопка-подсказка: показывает text во всплывающем уведомлении"""
+        async def show_hint(user_id: int) -> str:
+            return text
+        self.section(key)(show_hint)
+
+    async def dispatch(self, event: MessageEvent):
+        payload = event.payload if isinstance(event.payload, dict) else {}
+        section = self._sections.get(payload.get(MENU_KEY))
+
+        if section is None:
+            await event.show_snackbar(MENU_EXPIRED_TEXT)
+            return
+
+        if payload.get(MENU_OWNER) != event.user_id:
+            await event.show_snackbar(MENU_FOREIGN_TEXT)
+            return
+
+        result = await section(event.user_id)
+        if isinstance(result, str):
+            await event.show_snackbar(result)
+            return
+
+        text, keyboard = result
+        await event.edit_message(
+            message=text,
+            keyboard=keyboard,
+            keep_forward_messages=True,
+            keep_snippets=True,
+            dont_parse_links=True,
+        )
+        await event.send_empty_answer()
+
+
+callback_menus = CallbackMenuRouter()
+
+callback_labeler = BotLabeler()
+
+
+@callback_labeler.raw_event(GroupEventType.MESSAGE_EVENT, dataclass=MessageEvent)
+async def callback_menu_handler(event: MessageEvent):
+    """Все нажатия callback-кнопок меню"""
+    await callback_menus.dispatch(event)
+
+
+# В основном файле бота нужно будет загрузить лейблер (после admin и Clan,
+# которые регистрируют разделы):
+# bot.labeler.load(callback_labeler)
@@ -0,0 +1,142 @@
+import asyncio
+import json
+
+from aiohttp import web
+
+from bot.core.config import settings
+from bot.services.lifecycle import lifecycle
+
+# ======================
+# ПРИЕМ СОБЫТИЙ ЧЕРЕЗ CALLBACK API
+# ======================
+# VK сам присылает каждое событие POST-запросом. Сервер проверяет секрет,
+# отвечает "ok" сразу и кладет событие в ограниченную очередь, которую
+# разбирают CALLBACK_WORKERS воркеров. Если очередь заполнена, VK получает
+# отказ и повторит событие позже - так нагрузка не копится в памяти.
+
+CALLBACK_OK = "ok"
+
+
+class CallbackServer:
+    """aiohttp-сервер для Callback API + очередь событий с воркерами"""
+
+    def __init__(
+        self,
+        confirmation: str = None,
+        secret: str = None,
+        workers: int = None,
+        queue_size: int = None,
+    ):
+        self.confirmation = settings.CALLBACK_CONFIRMATION if confirmation is None else confirmation
+        self.secret = settings.CALLBACK_SECRET if secret is None else secret
+        self.workers = workers or settings.CALLBACK_WORKERS
+        self.queue_size = queue_size or settings.CALLBACK_QUEUE_SIZE
+
+        self.queue: asyncio.Queue | None = None
+        self.received = 0
+        self.rejected = 0
+        self._process_event = None
+        self._runner: web.AppRunner | None = None
+        self._workers: list = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        try:
+            event = await request.json(loads=json.loads)
+        except ValueError:
+            return web.Response(status=400, text="bad request")
+
+        if not isinstance(event, dict):
+            return web.Response(status=400, text="bad request")
+
+        secret = event.pop("secret", None)
+
+        # Строка подтверждения не секретна: VK может запросить ее до сохранения ключа
+        if event.get("type") == "confirmation":
+            return web.Response(text=self.confirmation)
+
+        if self.secret and secret != self.secret:
+            return web.Response(status=403, text="forbidden")
+
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Не "ok" - VK пришлет событие повторно
+            self.rejected += 1
+            return web.Response(status=503, text="busy")
+
+        self.received += 1
+        return web.Response(text=CALLBACK_OK)
+
+    async def _work(self):
+        while True:
+            event = await self.queue.get()
+            try:
+                await self._process_event(event)
+            except Exception as e:
+                print(f"❌ Ошибка обработки события Callback API: {e}")
+            finally:
+                self.queue.task_done()
+
+    def application(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(settings.CALLBACK_PATH, self.handle)
+        return app
+
+    async def start(self, process_event, host: str = None, port: int = None):
+        """process_event(event) - обработка события, например bot.process_event"""
+        self._process_event = process_event
+        self.queue = asyncio.Queue(self.queue_size)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+        self._runner = web.AppRunner(self.application(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(
+            self._runner,
+            settings.CALLBACK_HOST if host is None else host,
+            settings.CALLBACK_PORT if port is None else port,
+        )
+        await site.start()
+
+    @property
+    def addresses(self) -> list:
+        return self._runner.addresses if self._runner is not None else []
+
+    async def stop(self, timeout: float = None):
+        """Перестать принимать события, дообработать очередь (не дольше timeout) и остановить воркеров"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+        if self.queue is not None:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                # VK не получит повтор: "ok" уже отправлен
+                print(f"❌ При остановке не обработано событий Callback API: {self.queue.qsize()}")
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+callback_server = CallbackServer()
+
+
+async def start_callback_server(bot) -> CallbackServer:
+    """Запуск приема событий Callback API для бота (вызывать из main())"""
+    async def process_event(event: dict):
+        await bot.process_event(event, bot.api)
+
+    await callback_server.start(process_event)
+    lifecycle.on_stop("intake", "Callback API", lambda: callback_server.stop(lifecycle.remaining()))
+    return callback_server
+
+
+# В основном файле бота нужно будет выбрать режим по settings.BOT_MODE:
+# bot = Bot(settings.BOT_TOKEN, dual_mode=True, event_deduplicator=event_deduplicator)
+# if settings.BOT_MODE != "polling":
+#     await start_callback_server(bot)
+# if settings.BOT_MODE != "callback":
+#     await run_polling(bot)
+# await lifecycle.run()
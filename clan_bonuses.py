@@ -0,0 +1,63 @@
+from types import MappingProxyType
+
+try:
+    import numpy as np
+except ImportError:  # numpy не установлен - пакетные расчеты идут списками
+    np = None
+
+from bot.core.config import settings
+from bot.services.clans import get_clan_bonuses as calculate_clan_bonuses
+
+# ======================
+# ТАБЛИЦА БОНУСОВ КЛАНОВ ПО УРОВНЯМ
+# ======================
+
+# CLAN_BONUSES[level] - неизменяемый словарь бонусов; индекс 0 не используется
+CLAN_BONUSES = (None,) + tuple(
+    MappingProxyType(dict(calculate_clan_bonuses(level)))
+    for level in range(1, settings.CLAN_MAX_LEVEL + 1)
+)
+
+# Колонки таблицы для пакетных расчетов (индекс - уровень)
+LIFT_BONUS_BY_LEVEL = (0,) + tuple(bonuses["lift_bonus_coins"] for bonuses in CLAN_BONUSES[1:])
+BUSINESS_BONUS_BY_LEVEL = (0,) + tuple(bonuses["business_bonus_percent"] for bonuses in CLAN_BONUSES[1:])
+
+if np is not None:
+    LIFT_BONUS_BY_LEVEL = np.array(LIFT_BONUS_BY_LEVEL, dtype=np.int64)
+    BUSINESS_BONUS_BY_LEVEL = np.array(BUSINESS_BONUS_BY_LEVEL, dtype=np.int64)
+
+
+def get_clan_bonuses(level: int) -> MappingProxyType:
+    """Бонусы клана данного уровня (из таблицы, без пересчета)"""
+    if 0 < level <= settings.CLAN_MAX_LEVEL:
+        return CLAN_BONUSES[level]
+    return MappingProxyType(dict(calculate_clan_bonuses(level)))
+
+
+def _by_level(column, key: str, levels):
+    """Значение бонуса для каждого уровня из levels"""
+    if np is None:
+        return [
+            column[level] if 0 < level <= settings.CLAN_MAX_LEVEL else get_clan_bonuses(level)[key]
+            for level in levels
+        ]
+
+    levels = np.asarray(levels, dtype=np.int64)
+    values = column[np.clip(levels, 0, settings.CLAN_MAX_LEVEL)]
+    outside = (levels < 1) | (levels > settings.CLAN_MAX_LEVEL)
+    if outside.any():
+        values[outside] = [get_clan_bonuses(int(level))[key] for level in levels[outside]]
+    return values
+
+
+def clan_lift_bonuses(levels):
+    """Монеты в казну за одно поднятие для каждого уровня клана"""
+    return _by_level(LIFT_BONUS_BY_LEVEL, "lift_bonus_coins", levels)
+
+
+def clan_business_shares(levels, incomes):
+    """Доля дохода бизнесов, уходящая в казну, для пар (уровень клана, доход)"""
+    percents = _by_level(BUSINESS_BONUS_BY_LEVEL, "business_bonus_percent", levels)
+    if np is None:
+        return [income * percent // 100 for income, percent in zip(incomes, percents)]
+    return np.asarray(incomes, dtype=np.int64) * percents // 100
@@ -0,0 +1,161 @@
+from itertools import islice
+
+from bot.db import get_all_clans
+from bot.services.sharding import shard
+
+# ======================
+# ПОИСКОВЫЙ ИНДЕКС КЛАНОВ (ПРЕФИКСЫ + НЕЧЕТКИЙ ПОИСК)
+# ======================
+
+# Минимальная похожесть (по триграммам) для подсказки "возможно, вы имели в виду"
+FUZZY_MIN_SCORE = 0.5
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().replace("ё", "е").split())
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ClanSearchIndex:
+    """Индекс кланов в памяти: тег -> название, префиксное дерево и триграммы"""
+
+    def __init__(self):
+        self.loaded = False
+        self._names: dict[str, str] = {}
+        # Узел дерева: {"tags": {тег: сколько ключей клана проходит через узел}, "next": {символ: узел}}
+        self._trie: dict = {"tags": {}, "next": {}}
+        self._trigram_tags: dict[str, set] = {}
+        self._tag_trigrams: dict[str, set] = {}
+
+    def _keys(self, tag: str, name: str) -> set:
+        """Строки, по которым клан ищется: тег, название и отдельные слова"""
+        normalized_name = _normalize(name)
+        return {tag.lower(), normalized_name, *normalized_name.split()}
+
+    def _trie_add(self, key: str, tag: str):
+        node = self._trie
+        for char in key:
+            node = node["next"].setdefault(char, {"tags": {}, "next": {}})
+            node["tags"][tag] = node["tags"].get(tag, 0) + 1
+
+    def _trie_remove(self, key: str, tag: str):
+        path = [self._trie]
+        for char in key:
+            node = path[-1]["next"].get(char)
+            if node is None:
+                return
+            path.append(node)
+
+        for i in range(len(path) - 1, 0, -1):
+            tags = path[i]["tags"]
+            tags[tag] -= 1
+            if not tags[tag]:
+                del tags[tag]
+            if not tags:
+                # Ветка больше никому не нужна - удаляем ее целиком
+                del path[i - 1]["next"][key[i - 1]]
+
+    def add(self, tag: str, name: str):
+        """Добавление клана в индекс (create_clan)"""
+        tag = tag.upper()
+        if tag in self._names:
+            self.remove(tag)
+
+        self._names[tag] = name
+        for key in self._keys(tag, name):
+            self._trie_add(key, tag)
+
+        trigrams = _trigrams(tag.lower()) | _trigrams(_normalize(name))
+        self._tag_trigrams[tag] = trigrams
+        for trigram in trigrams:
+            self._trigram_tags.setdefault(trigram, set()).add(tag)
+
+    def remove(self, tag: str):
+        """Удаление клана из индекса (delete_clan)"""
+        tag = tag.upper()
+        name = self._names.pop(tag, None)
+        if name is None:
+            return
+
+        for key in self._keys(tag, name):
+            self._trie_remove(key, tag)
+
+        for trigram in self._tag_trigrams.pop(tag, ()):
+            tags = self._trigram_tags.get(trigram)
+            if tags is not None:
+                tags.discard(tag)
+                if not tags:
+                    del self._trigram_tags[trigram]
+
+    def rename(self, tag: str, new_name: str):
+        """Смена названия клана (update_clan_name)"""
+        self.add(tag, new_name)
+
+    def clear(self):
+        """Полная очистка индекса (сброс сезона)"""
+        self._names.clear()
+        self._trie = {"tags": {}, "next": {}}
+        self._trigram_tags.clear()
+        self._tag_trigrams.clear()
+
+    def has_tag(self, tag: str) -> bool:
+        return tag.upper() in self._names
+
+    def get_name(self, tag: str) -> str | None:
+        return self._names.get(tag.upper())
+
+    def prefix_search(self, query: str, limit: int = 10) -> list:
+        """Кланы, у которых тег, название или слово названия начинается с query"""
+        node = self._trie
+        for char in _normalize(query):
+            node = node["next"].get(char)
+            if node is None:
+                return []
+
+        # islice вместо сортировки - время не зависит от числа кланов
+        tags = list(islice(node["tags"], limit))
+        return [(tag, self._names[tag]) for tag in tags]
+
+    def fuzzy_search(self, query: str, limit: int = 5) -> list:
+        """Похожие кланы по общим триграммам"""
+        query_trigrams = _trigrams(_normalize(query))
+
+        shared: dict[str, int] = {}
+        for trigram in query_trigrams:
+            for tag in self._trigram_tags.get(trigram, ()):
+                shared[tag] = shared.get(tag, 0) + 1
+
+        scored = []
+        for tag, common in shared.items():
+            # Доля триграмм запроса, найденных у клана; при равенстве - Жаккар
+            score = common / len(query_trigrams)
+            if score >= FUZZY_MIN_SCORE:
+                jaccard = common / (len(query_trigrams) + len(self._tag_trigrams[tag]) - common)
+                scored.append((score, jaccard, tag))
+
+        scored.sort(key=lambda item: (-item[0], -item[1], item[2]))
+        return [(tag, self._names[tag]) for _, _, tag in scored[:limit]]
+
+
+clan_search_index = ClanSearchIndex()
+# Изменения индекса повторяются во всех процессах бота
+shard.share_methods("clan_search", clan_search_index, "add", "remove", "rename", "clear")
+
+
+async def load_clan_search_index():
+    """Построение индекса при запуске бота"""
+    clans = await get_all_clans()
+    # Каждый процесс строит свой индекс сам
+    with shard.local():
+        clan_search_index.clear()
+        for clan in clans:
+            clan_search_index.add(clan["tag"], clan["name"])
+    clan_search_index.loaded = True
+
+
+# В основном файле бота нужно будет вызвать при запуске:
+# await load_clan_search_index()
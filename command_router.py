@@ -0,0 +1,208 @@
+import re
+
+from vkbottle.dispatch.handlers import ABCHandler
+from vkbottle.dispatch.rules.base import VBMLRule
+
+from bot.db import is_known_admin
+
+# ======================
+# СКОМПИЛИРОВАННАЯ МАРШРУТИЗАЦИЯ ТЕКСТОВЫХ КОМАНД
+# ======================
+# Вместо перебора всех VBML-шаблонов подряд текст сообщения один раз
+# приводится к нижнему регистру и без ведущего "/", а затем идет по
+# префиксному дереву слов команды до обработчика. Аргументы разбираются
+# только у найденного кандидата. Команды администраторов лежат в том же
+# дереве, но для обычных игроков (по списку администраторов в памяти)
+# пропускаются еще до разбора - без запросов к базе.
+
+_ARGUMENT = re.compile(r"<(\w+)>")
+
+
+def _normalize(text: str) -> str:
+    text = text.strip()
+    if text.startswith("/"):
+        text = text[1:].lstrip()
+    return text
+
+
+def _parse_pattern(text: str) -> tuple | None:
+    """Шаблон "к снять <amount>" -> (("к", "снять"), ("amount",)); None - шаблон не простой"""
+    words = _normalize(text).split()
+    head = []
+    arguments = []
+
+    for word in words:
+        argument = _ARGUMENT.fullmatch(word)
+        if argument:
+            arguments.append(argument.group(1))
+        elif arguments or "<" in word or ">" in word:
+            # Слово после аргумента или составной аргумент - оставляем VBML
+            return None
+        else:
+            head.append(word.lower())
+
+    if not head:
+        return None
+    return tuple(head), tuple(arguments)
+
+
+class CommandRouter:
+    """Префиксное дерево слов команд: слово -> узел, в узле - обработчики с этим началом"""
+
+    def __init__(self):
+        # Узел дерева: {"routes": [(порядок, аргументы, обработчик, только для админов)], "next": {слово: узел}}
+        self._trie: dict = {"routes": [], "next": {}}
+        self._order = 0
+        self.commands = 0
+        self.admin_commands = 0
+
+    def add(self, head: tuple, arguments: tuple, handler, admin_only: bool = False) -> None:
+        node = self._trie
+        for word in head:
+            node = node["next"].setdefault(word, {"routes": [], "next": {}})
+
+        # "к профиль" и "/к профиль" - один и тот же маршрут
+        for _, known_arguments, known_handler, _ in node["routes"]:
+            if known_handler is handler and known_arguments == arguments:
+                return
+
+        node["routes"].append((self._order, arguments, handler, admin_only))
+        self._order += 1
+        self.commands += 1
+        if admin_only:
+            self.admin_commands += 1
+
+    def candidates(self, text: str, admin: bool = True) -> list:
+        """[(обработчик, аргументы)] для текста сообщения в порядке регистрации, как их перебирал бы VBML
+
+        admin=False - без команд администраторов.
+        """
+        if not text:
+            return []
+
+        text = _normalize(text)
+        words = text.lower().split()
+        node = self._trie
+        found = []
+
+        for depth, word in enumerate(words, 1):
+            node = node["next"].get(word)
+            if node is None:
+                break
+            rest = len(words) - depth
+            for order, arguments, handler, admin_only in node["routes"]:
+                if admin_only and not admin:
+                    continue
+                # Аргументов не больше, чем оставшихся слов; без аргументов - только точное совпадение
+                if arguments and rest < len(arguments) or not arguments and rest:
+                    continue
+                found.append((order, depth, arguments, handler))
+
+        # Из нескольких подходящих первым проверяется зарегистрированный раньше, как в VBML
+        found.sort(key=lambda candidate: candidate[0])
+
+        result = []
+        for _, depth, arguments, handler in found:
+            if not arguments:
+                result.append((handler, {}))
+                continue
+            values = text.split(maxsplit=depth)[depth]
+            values = values.split(maxsplit=len(arguments) - 1)
+            result.append((handler, dict(zip(arguments, values))))
+        return result
+
+    def route(self, text: str, admin: bool = True) -> tuple | None:
+        """(обработчик, аргументы) первого подходящего маршрута или None"""
+        found = self.candidates(text, admin)
+        return found[0] if found else None
+
+
+class CompiledCommandsHandler(ABCHandler):
+    """Один обработчик vkbottle вместо всех текстовых команд из лейблеров"""
+
+    def __init__(self, router: CommandRouter, blocking: bool = True):
+        self.router = router
+        self.blocking = blocking
+
+    async def filter(self, event, context: dict | None = None):
+        # None - список администраторов не загружен, проверку сделает AdminRule
+        admin = not self.router.admin_commands or is_known_admin(event.from_id) is not False
+
+        # Если остальные правила обработчика (если были) не прошли - пробуем
+        # следующий подходящий, как лейблер с VBML
+        for handler, arguments in self.router.candidates(event.text, admin):
+            rule_context = await (handler.filter(event, context) if context is not None else handler.filter(event))
+            if rule_context is not False:
+                return {**rule_context, **arguments, "_command_handler": handler}
+
+        return False
+
+    async def handle(self, event, **context):
+        handler = context.pop("_command_handler")
+        # Место в очереди категории (RateLimitMiddleware) держится ровно на время обработчика
+        slot = context.pop("_command_slot", None)
+        if slot is None:
+            return await handler.handle(event, **context)
+
+        async with slot as acquired:
+            if not acquired:
+                return None
+            return await handler.handle(event, **context)
+
+    def __repr__(self) -> str:
+        return f"<CompiledCommandsHandler commands={self.router.commands}>"
+
+
+# Общее дерево бота (его же используют middleware, которым нужна команда сообщения)
+command_router = CommandRouter()
+
+
+def compile_labelers(*labelers, admin_labelers: tuple = (), router: CommandRouter = None) -> CommandRouter:
+    """Переносит текстовые команды лейблеров в префиксное дерево
+
+    Вызывать после импорта всех обработчиков и до загрузки лейблеров в бота.
+    Команды из admin_labelers обычным игрокам не подбираются вовсе.
+    Обработчики с нестандартными шаблонами остаются у лейблера как были.
+    """
+    router = router or command_router
+    compiled = None
+
+    for labeler in (*labelers, *admin_labelers):
+        admin_only = labeler in admin_labelers
+
+        # Дерево нечувствительно к регистру - лейблеры без vbml_ignore_case не трогаем
+        if not labeler.vbml_ignore_case:
+            continue
+
+        view = labeler.message_view
+        remaining = []
+        position = None
+
+        for handler in view.handlers:
+            vbml_rules = [rule for rule in getattr(handler, "rules", ()) if isinstance(rule, VBMLRule)]
+            routes = [_parse_pattern(pattern.text) for rule in vbml_rules for pattern in rule.patterns]
+
+            if len(vbml_rules) != 1 or not routes or None in routes:
+                remaining.append(handler)
+                continue
+
+            # Текстовое правило проверяет дерево, остальные правила - сам обработчик
+            handler.rules = tuple(rule for rule in handler.rules if rule is not vbml_rules[0])
+            for head, arguments in routes:
+                router.add(head, arguments, handler, admin_only)
+
+            if position is None:
+                position = len(remaining)
+
+        if compiled is None and position is not None:
+            compiled = CompiledCommandsHandler(router)
+            remaining.insert(position, compiled)
+
+        view.handlers[:] = remaining
+
+    return router
+
+
+# В основном файле бота нужно будет вызвать при запуске (до bot.labeler.load):
+# await load_admin_ids()
+# compile_labelers(user_labeler, clan_labeler, admin_labelers=(admin_labeler,))
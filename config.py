@@ -16,6 +16,39 @@ class EnvBaseSettings(BaseSettings):
 class BotSettings(EnvBaseSettings):
     BOT_TOKEN: str
 
+    # Callback API: "polling" - только long poll, "callback" - только сервер
+    # для событий VK, "dual" - оба (повторы одного события отсекаются)
+    BOT_MODE: str = "polling"
+    # Строка подтверждения и секретный ключ из настроек Callback API сообщества
+    CALLBACK_CONFIRMATION: str = ""
+    CALLBACK_SECRET: str = ""
+    CALLBACK_HOST: str = "127.0.0.1"
+    CALLBACK_PORT: int = 8080
+    CALLBACK_PATH: str = "/vk/callback"
+    # Сколько событий ждет обработки (дальше VK получает отказ и повторит позже)
+    CALLBACK_QUEUE_SIZE: int = 10_000
+    # Сколько событий обрабатывается одновременно
+    CALLBACK_WORKERS: int = 64
+
+    # Сколько процессов обрабатывают события (1 - один процесс, как раньше)
+    SHARD_WORKERS: int = 1
+    # Сколько миллисекунд запись ждет, пока базу пишет другой процесс бота
+    SHARD_BUSY_TIMEOUT: int = 5000
+
+    # Отсев повторных событий: точное окно (секунды и число ключей) и
+    # блум-фильтр для более старых (ключей в поколении, доля ложных
+    # срабатываний, секунды жизни поколения)
+    DEDUP_WINDOW: float = 120
+    DEDUP_WINDOW_SIZE: int = 50_000
+    DEDUP_BLOOM_CAPACITY: int = 1_000_000
+    DEDUP_BLOOM_ERROR_RATE: float = 1e-6
+    DEDUP_BLOOM_PERIOD: float = 3600
+
+    # Остановка по SIGTERM: сколько секунд дообрабатывать принятые события
+    # и сколько - отправлять очередь исходящих сообщений
+    SHUTDOWN_DRAIN_TIMEOUT: float = 10
+    SHUTDOWN_OUTBOX_TIMEOUT: float = 5
+
 
 class DBSettings(EnvBaseSettings):
     # Left for future compatibility with postgresql
@@ -29,6 +62,10 @@ class DBSettings(EnvBaseSettings):
     def database_path(self) -> str: 
         return "/home/timur/Documents/Languages/Python/Freelance/tutikovstanislav1/GymLegend/gym_legend.db"
 
+    @property
+    def season_archive_dir(self) -> str:
+        return str(DIR / "season_archives")
+
 
 class GameSettings(EnvBaseSettings):
     # ==============================
@@ -124,6 +161,8 @@ class GameSettings(EnvBaseSettings):
 
     CLAN_CREATE_COST: int = 1000
     CLAN_UPGRADE_BASE_COST: int = 500
+    # До какого уровня бонусы кланов считаются заранее (выше - считаются на лету)
+    CLAN_MAX_LEVEL: int = 100
 
     # ==============================
     # АДМИН КОНСТАНТЫ
@@ -131,6 +170,36 @@ class GameSettings(EnvBaseSettings):
 
     ADMIN_USERS: list[int] = [1, 322615766, 768764050]
 
+    # ==============================
+    # ОГРАНИЧЕНИЕ ЧАСТОТЫ КОМАНД
+    # ==============================
+
+    # Скользящее окно (секунды) и сколько команд в нем можно отправить
+    RATE_LIMIT_WINDOW: int = 10
+    RATE_LIMIT_PER_USER: int = 15
+    RATE_LIMIT_PER_COMMAND: int = 5
+    # Сколько игроков помнит ограничитель (давно не писавшие вытесняются)
+    RATE_LIMIT_MAX_USERS: int = 50_000
+
+    # Сколько команд каждой категории выполняется одновременно
+    RATE_LIMIT_CONCURRENCY: dict = {"heavy": 4, "default": 32}
+    # Сколько секунд команда ждет свободного места, прежде чем получить отказ
+    RATE_LIMIT_QUEUE_TIMEOUT: float = 5
+    # Обработчики, которые делают несколько запросов к базе
+    RATE_LIMIT_CATEGORIES: dict = {
+        "player_info_handler": "heavy",
+        "get_profile_handler": "heavy",
+        "clan_profile_handler": "heavy",
+        "clan_top_handler": "heavy",
+        "clan_members_list_handler": "heavy",
+        "clan_detailed_roster_handler": "heavy",
+        "player_contributions_handler": "heavy",
+        "clan_info_handler": "heavy",
+        "clan_search_handler": "heavy",
+        "clan_log_handler": "heavy",
+        "bot_statistics_handler": "heavy",
+    }
+
 
 class Settings(BotSettings, DBSettings, GameSettings):
     DEBUG: bool = False
@@ -0,0 +1,155 @@
+import hashlib
+import math
+import time
+from collections import OrderedDict
+
+from vkbottle.tools import ABCEventDeduplicator
+
+from bot.core.config import settings
+
+# ======================
+# ОТСЕВ ПОВТОРНО ДОСТАВЛЕННЫХ СОБЫТИЙ VK
+# ======================
+# После переподключения long poll или повторной отправки Callback API одно
+# и то же событие может прийти дважды - и перевод, вклад или подход
+# применились бы дважды. Ключ события - (тип, peer_id,
+# conversation_message_id) для сообщений и event_id для остальных.
+# Недавние ключи хранятся точно, более старые - во вращающемся
+# блум-фильтре. Память не зависит от числа событий: окно ограничено по
+# размеру, а у фильтра два поколения битовых массивов фиксированного размера.
+
+
+def event_key(event: dict) -> str | None:
+    """Ключ идемпотентности события (None - событие не с чем сравнивать)"""
+    event_type = event.get("type")
+    obj = event.get("object") or {}
+
+    # Нажатие callback-кнопки: у каждого нажатия свой event_id
+    # (conversation_message_id у всех нажатий одного меню общий)
+    if obj.get("event_id") is not None:
+        return f"{event_type}:{obj['event_id']}"
+
+    message = obj.get("message") if isinstance(obj.get("message"), dict) else obj
+    cmid = message.get("conversation_message_id")
+    if cmid is not None and message.get("peer_id") is not None:
+        return f"{event_type}:{message['peer_id']}:{cmid}"
+
+    if event.get("event_id") is not None:
+        return f"{event.get('group_id')}:{event['event_id']}"
+    return None
+
+
+class RotatingBloomFilter:
+    """Блум-фильтр из двух поколений: ключ помнится от period до 2 * period секунд
+
+    Поколение сменяется и раньше, если в него добавлено capacity ключей, -
+    так доля ложных срабатываний не превышает error_rate при любом потоке.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, period: float):
+        self.capacity = capacity
+        self.period = period
+        self.bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+
+        self._current = bytearray((self.bits + 7) // 8)
+        self._previous = bytearray(len(self._current))
+        self._count = 0
+        self._rotated = time.monotonic()
+
+    @property
+    def memory(self) -> int:
+        return len(self._current) + len(self._previous)
+
+    def _positions(self, key: str) -> list:
+        # Двойное хеширование: k позиций из двух 64-битных половин одного хеша
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * step) % self.bits for i in range(self.hashes)]
+
+    def _rotate(self, now: float):
+        self._previous = self._current
+        self._current = bytearray(len(self._previous))
+        self._count = 0
+        self._rotated = now
+
+    def add(self, key: str, now: float = None) -> bool:
+        """Добавить ключ; True - ключ (вероятно) уже был"""
+        now = time.monotonic() if now is None else now
+        if now - self._rotated >= self.period or self._count >= self.capacity:
+            self._rotate(now)
+
+        seen_current = True
+        seen_previous = True
+        for position in self._positions(key):
+            byte, bit = position >> 3, 1 << (position & 7)
+            if not self._current[byte] & bit:
+                seen_current = False
+                self._current[byte] |= bit
+            if not self._previous[byte] & bit:
+                seen_previous = False
+
+        if not seen_current:
+            self._count += 1
+        return seen_current or seen_previous
+
+
+class EventDeduplicator(ABCEventDeduplicator):
+    """Точное окно недавних ключей + вращающийся блум-фильтр для более старых"""
+
+    def __init__(
+        self,
+        window: float = None,
+        window_size: int = None,
+        capacity: int = None,
+        error_rate: float = None,
+        period: float = None,
+    ):
+        self.window = window or settings.DEDUP_WINDOW
+        self.window_size = window_size or settings.DEDUP_WINDOW_SIZE
+        self.bloom = RotatingBloomFilter(
+            capacity or settings.DEDUP_BLOOM_CAPACITY,
+            error_rate or settings.DEDUP_BLOOM_ERROR_RATE,
+            period or settings.DEDUP_BLOOM_PERIOD,
+        )
+        # ключ -> время первого появления (старые слева)
+        self._recent: OrderedDict = OrderedDict()
+        self.duplicates = 0
+
+    def is_new(self, event: dict, now: float = None) -> bool:
+        """Проверить событие и запомнить его; False - повтор, обрабатывать не нужно"""
+        key = event_key(event)
+        if key is None:
+            return True
+
+        now = time.monotonic() if now is None else now
+        if key in self._recent:
+            self.duplicates += 1
+            return False
+
+        seen = self.bloom.add(key, now)
+
+        self._recent[key] = now
+        while self._recent and (
+            len(self._recent) > self.window_size
+            or next(iter(self._recent.values())) < now - self.window
+        ):
+            self._recent.popitem(last=False)
+
+        if seen:
+            # Ключ старше окна, но фильтр его помнит
+            self.duplicates += 1
+            return False
+        return True
+
+    async def claim(self, event) -> bool:
+        return self.is_new(event)
+
+
+event_deduplicator = EventDeduplicator()
+
+
+# В основном файле бота нужно будет передать его боту (dual_mode=True
+# включает проверку повторов в Bot.process_event при любом BOT_MODE):
+# bot = Bot(settings.BOT_TOKEN, dual_mode=True, event_deduplicator=event_deduplicator)
@@ -0,0 +1,224 @@
+import asyncio
+import signal
+import time
+
+from bot.core.config import settings
+
+# ======================
+# ЗАПУСК И ОСТАНОВКА ФОНОВЫХ СЛУЖБ БОТА
+# ======================
+# Все фоновые задачи регистрируются здесь. По SIGTERM (или SIGINT) бот
+# останавливается по шагам:
+#   1. прием событий (long poll, Callback API) прекращается;
+#   2. начатые обработчики доделываются - не дольше SHUTDOWN_DRAIN_TIMEOUT;
+#   3. стадия "drain": очередь исходящих сообщений отправляется -
+#      не дольше SHUTDOWN_OUTBOX_TIMEOUT;
+#   4. фоновые службы останавливаются в обратном порядке запуска.
+#      Пакетные записи (поднятия, кулдауны, лог казны) не отменяются:
+#      они ждут в lifecycle.pause(), делают последнюю запись и выходят
+#      сами - отмена посреди записи применила бы пачку дважды;
+#   5. стадия "close": WAL переносится в основной файл базы.
+
+SHUTDOWN_STAGES = ("intake", "drain", "close")
+
+
+class Lifecycle:
+    """Фоновые службы, прием событий и обработчики в работе"""
+
+    def __init__(self):
+        # имя -> задача приема событий (отменяется первой)
+        self._intake: dict[str, asyncio.Task] = {}
+        # имя -> (фоновая служба, завершается ли сама), в порядке запуска
+        self._services: dict[str, tuple] = {}
+        # Сигнал службам с пакетной записью: последняя запись и выход
+        self._services_stop = asyncio.Event()
+        # Обработчики событий и разовые фоновые записи в работе
+        self._handlers: set = set()
+        # стадия -> [(имя, async функция остановки)]
+        self._stops: dict[str, list] = {stage: [] for stage in SHUTDOWN_STAGES}
+        self._stop_requested: asyncio.Event | None = None
+        self._deadline: float | None = None
+        self.stopping = False
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._handlers)
+
+    def remaining(self) -> float | None:
+        """Сколько секунд осталось дообрабатывать события (None - остановка не начата)"""
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.monotonic())
+
+    # ----- регистрация -----
+
+    def service(self, name: str, task, graceful: bool = False) -> asyncio.Task | None:
+        """Фоновая служба (задача или корутина)
+
+        graceful=False - при остановке служба отменяется; graceful=True -
+        служба ждет в pause() и завершается сама (пакетные записи).
+        """
+        if task is None:
+            return None
+        if asyncio.iscoroutine(task):
+            task = asyncio.create_task(task, name=name)
+        self._services[name] = (task, graceful)
+        task.add_done_callback(lambda done: self._forget(name, done))
+        return task
+
+    async def pause(self, seconds: float) -> bool:
+        """Пауза службы с пакетной записью; True - бот останавливается, пора записать все и выйти"""
+        try:
+            await asyncio.wait_for(self._services_stop.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        return self._services_stop.is_set()
+
+    def _forget(self, name: str, task: asyncio.Task):
+        if self._services.get(name, (None,))[0] is task:
+            del self._services[name]
+        if not task.cancelled() and task.exception() is not None:
+            print(f"❌ Фоновая служба {name} завершилась с ошибкой: {task.exception()}")
+
+    def intake(self, name: str, coro) -> asyncio.Task:
+        """Источник событий (long poll); при остановке отменяется первым"""
+        task = asyncio.create_task(coro, name=name)
+        self._intake[name] = task
+        return task
+
+    def track(self, coro) -> asyncio.Task:
+        """Обработчик события или разовая запись: остановка дождется ее завершения"""
+        task = asyncio.create_task(coro)
+        self._handlers.add(task)
+        task.add_done_callback(self._handlers.discard)
+        return task
+
+    def on_stop(self, stage: str, name: str, stop):
+        """stop() - async функция, вызываемая на стадии stage (см. SHUTDOWN_STAGES)"""
+        if stage not in self._stops:
+            raise ValueError(f"Неизвестная стадия остановки {stage}")
+        self._stops[stage].append((name, stop))
+
+    # ----- сигналы -----
+
+    def install_signal_handlers(self):
+        """SIGTERM и SIGINT запускают остановку (вызывать из работающего цикла)"""
+        loop = asyncio.get_running_loop()
+        if self._stop_requested is None:
+            self._stop_requested = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.request_stop, sig.name)
+
+    def request_stop(self, reason: str = "запрос"):
+        if self._stop_requested is None:
+            self._stop_requested = asyncio.Event()
+        if not self._stop_requested.is_set():
+            print(f"⏹ Остановка бота: {reason}")
+            self._stop_requested.set()
+
+    async def wait(self):
+        """Ждать сигнала остановки или завершения приема событий (например, из-за ошибки)"""
+        if self._stop_requested is None:
+            self._stop_requested = asyncio.Event()
+        stop = asyncio.create_task(self._stop_requested.wait())
+        await asyncio.wait([stop, *self._intake.values()], return_when=asyncio.FIRST_COMPLETED)
+        stop.cancel()
+
+        for name, task in self._intake.items():
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                print(f"❌ Прием событий {name} остановлен ошибкой: {task.exception()}")
+
+    # ----- остановка -----
+
+    async def _run_stops(self, stage: str):
+        for name, stop in self._stops[stage]:
+            try:
+                await stop()
+            except Exception as e:
+                print(f"❌ Ошибка остановки {name}: {e}")
+
+    async def _drain_handlers(self) -> int:
+        """Дождаться обработчиков до срока; возвращает число прерванных"""
+        if self._handlers:
+            await asyncio.wait(list(self._handlers), timeout=self.remaining())
+
+        unfinished = list(self._handlers)
+        for task in unfinished:
+            task.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+        return len(unfinished)
+
+    async def shutdown(self, drain_timeout: float = None) -> dict:
+        """Остановить бота по шагам; возвращает сводку"""
+        if self.stopping:
+            return {}
+        self.stopping = True
+        started = time.monotonic()
+        self._deadline = started + (settings.SHUTDOWN_DRAIN_TIMEOUT if drain_timeout is None else drain_timeout)
+
+        # 1. Новые события больше не принимаются (Callback API дообрабатывает
+        # свою очередь до того же срока, что и обработчики)
+        for task in self._intake.values():
+            task.cancel()
+        await asyncio.gather(*self._intake.values(), return_exceptions=True)
+        await self._run_stops("intake")
+
+        # 2. Начатые обработчики
+        handlers = self.in_flight
+        interrupted = await self._drain_handlers()
+
+        # 3. Исходящие сообщения
+        await self._run_stops("drain")
+
+        # 4. Фоновые службы - в обратном порядке запуска; пакетные записи
+        # не отменяются, а дописывают накопленное и выходят сами
+        services = list(self._services.values())
+        self._services_stop.set()
+        for task, graceful in reversed(services):
+            if not graceful:
+                task.cancel()
+            # Ошибку (например, незаписанный пакет) уже напечатал _forget
+            await asyncio.gather(task, return_exceptions=True)
+
+        # 5. База
+        await self._run_stops("close")
+
+        summary = {
+            "handlers": handlers,
+            "interrupted": interrupted,
+            "services": len(services),
+            "seconds": time.monotonic() - started,
+        }
+        print(
+            f"✅ Бот остановлен за {summary['seconds']:.1f} сек.: "
+            f"обработчиков дождались {handlers - interrupted} из {handlers}, "
+            f"фоновых служб остановлено {len(services)}"
+        )
+        return summary
+
+    async def run(self):
+        """Работать до SIGTERM/SIGINT, затем остановиться (последний вызов в main())"""
+        self.install_signal_handlers()
+        await self.wait()
+        await self.shutdown()
+
+
+lifecycle = Lifecycle()
+
+
+async def run_polling(bot):
+    """Замена bot.run_polling: обработчики учитываются, прием останавливается по SIGTERM"""
+    polling = bot.polling
+
+    async def listen():
+        async for event in polling.listen():
+            for update in event.get("updates", []):
+                lifecycle.track(bot.process_event(update, polling.api))
+
+    lifecycle.intake("long poll", listen())
+
+
+# В основном файле бота нужно будет регистрировать фоновые службы в lifecycle,
+# а вместо await bot.run_polling() запускать прием и ждать остановки:
+# await run_polling(bot)
+# await lifecycle.run()
@@ -0,0 +1,162 @@
+import asyncio
+import math
+import time
+
+from bot.core.config import settings
+from bot.db import load_lift_cooldowns, save_lift_ready_times
+from bot.models import now_ts
+from bot.services.lifecycle import lifecycle
+from bot.services.sharding import shard
+
+# ======================
+# КУЛДАУН ПОДНЯТИЙ В ПАМЯТИ
+# ======================
+
+# Сколько подходов можно сделать подряд после простоя (1 - строго раз в кулдаун)
+LIFT_BURST = 1
+
+# Как часто чистим истекшие записи и сохраняем изменения в базу
+LIFT_COOLDOWN_FLUSH_INTERVAL = 30
+
+
+class LiftCooldownTracker:
+    """user_id -> время (monotonic), когда ведро снова полное; проверка без обращений к БД"""
+
+    def __init__(self, cooldown: int = settings.DUMBBELL_COOLDOWN, burst: int = LIFT_BURST):
+        self.cooldown = cooldown
+        self.burst = burst
+        self._ready_at: dict[int, float] = {}
+        self._overrides: dict[int, int] = {}
+        self._dirty: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._ready_at)
+
+    def get_cooldown(self, user_id: int) -> int:
+        return self._overrides.get(user_id, self.cooldown)
+
+    def try_lift(self, user_id: int) -> float:
+        """Попытка подхода: 0 - разрешен и засчитан, иначе сколько секунд ждать"""
+        now = time.monotonic()
+        cooldown = self.get_cooldown(user_id)
+        ready_at = self._ready_at.get(user_id, now)
+
+        # Ведро на burst подходов: каждый подход сдвигает ready_at на один кулдаун
+        wait = ready_at - (self.burst - 1) * cooldown - now
+        if wait > 0:
+            return wait
+
+        self._ready_at[user_id] = max(ready_at, now) + cooldown
+        self._dirty.add(user_id)
+        return 0
+
+    def remaining(self, user_id: int) -> float:
+        """Сколько секунд до следующего подхода (без списания)"""
+        ready_at = self._ready_at.get(user_id)
+        if ready_at is None:
+            return 0
+        return max(0, ready_at - (self.burst - 1) * self.get_cooldown(user_id) - time.monotonic())
+
+    def reset(self, user_id: int):
+        """Снять текущий кулдаун (администратор, удаление игрока)"""
+        if self._ready_at.pop(user_id, None) is not None:
+            self._dirty.add(user_id)
+
+    def set_override(self, user_id: int, seconds: int | None):
+        """Индивидуальный кулдаун игрока (None - стандартный)"""
+        if seconds is None:
+            self._overrides.pop(user_id, None)
+        else:
+            self._overrides[user_id] = seconds
+
+    def compact(self) -> int:
+        """Удаление истекших записей, чтобы словарь не рос от разовых игроков"""
+        now = time.monotonic()
+        expired = [user_id for user_id, ready_at in self._ready_at.items() if ready_at <= now]
+        for user_id in expired:
+            del self._ready_at[user_id]
+            # В базе лежит еще более раннее время - перезаписывать нечего
+            self._dirty.discard(user_id)
+        return len(expired)
+
+    def reset_all(self):
+        """Снять все кулдауны (сброс сезона); индивидуальные кулдауны администраторов остаются"""
+        self._ready_at.clear()
+        self._dirty.clear()
+
+    def clear(self):
+        self._ready_at.clear()
+        self._overrides.clear()
+        self._dirty.clear()
+
+    async def load(self):
+        """Восстановление кулдаунов после перезапуска"""
+        monotonic_now = time.monotonic()
+        epoch_now = now_ts()
+
+        rows = await load_lift_cooldowns()
+        # Каждый процесс загружает кулдауны сам
+        with shard.local():
+            self.clear()
+        for row in rows:
+            if row["lift_cooldown"] is not None:
+                self._overrides[row["user_id"]] = row["lift_cooldown"]
+            if row["lift_ready_at"] and row["lift_ready_at"] > epoch_now:
+                self._ready_at[row["user_id"]] = monotonic_now + row["lift_ready_at"] - epoch_now
+
+    async def flush(self) -> int:
+        """Ленивое сохранение изменившихся записей одним пакетом"""
+        if not self._dirty:
+            return 0
+
+        dirty = self._dirty
+        self._dirty = set()
+
+        monotonic_now = time.monotonic()
+        epoch_now = now_ts()
+        ready_times = {}
+        for user_id in dirty:
+            ready_at = self._ready_at.get(user_id)
+            # Снятый кулдаун сохраняем как 0
+            ready_times[user_id] = (
+                epoch_now + math.ceil(ready_at - monotonic_now) if ready_at is not None else 0
+            )
+
+        try:
+            return await save_lift_ready_times(ready_times)
+        except Exception:
+            self._dirty |= dirty
+            raise
+
+
+lift_cooldowns = LiftCooldownTracker()
+# Администратор может менять кулдаун игрока, которого обслуживает другой процесс
+shard.share_methods("lift_cooldowns", lift_cooldowns, "reset", "set_override", "reset_all", "clear")
+
+
+async def lift_cooldown_flusher(interval: int = LIFT_COOLDOWN_FLUSH_INTERVAL):
+    """Фоновая чистка и сохранение кулдаунов; при остановке бота - последняя запись и выход"""
+    while True:
+        stopping = await lifecycle.pause(interval)
+        try:
+            lift_cooldowns.compact()
+            await lift_cooldowns.flush()
+        except Exception as e:
+            print(f"❌ Ошибка сохранения кулдаунов: {e}")
+        if stopping:
+            return
+
+
+def start_lift_cooldown_flusher() -> asyncio.Task:
+    """Запуск фоновой записи (вызывать из main())"""
+    return lifecycle.service("кулдауны поднятий", lift_cooldown_flusher(), graceful=True)
+
+
+# В основном файле бота нужно будет вызвать при запуске:
+# await lift_cooldowns.load()
+# start_lift_cooldown_flusher()
+#
+# В обработчике "Поднять" вместо чтения/записи времени подъема в БД:
+# wait = lift_cooldowns.try_lift(user_id)
+# if wait:
+#     return f"⏳ Следующий подход через {math.ceil(wait)} сек."
@@ -0,0 +1,174 @@
+import asyncio
+import dataclasses
+
+from bot.core.config import settings
+from bot.db import apply_lift_deltas, invalidate_player_card, queue_treasury_log
+from bot.services.clan_bonuses import get_clan_bonuses
+from bot.services.lifecycle import lifecycle
+from bot.services.player_table import player_table
+from bot.services.sharding import shard
+
+# ======================
+# ПАКЕТНАЯ ОБРАБОТКА ПОДНЯТИЙ
+# ======================
+
+# Как часто накопленные поднятия уходят в базу (секунды)
+LIFT_FLUSH_INTERVAL = 2
+
+# Порядок значений в накопителях
+LIFT_PLAYER_FIELDS = ("balance", "power", "total_lifts", "total_earned")
+LIFT_CLAN_FIELDS = ("treasury", "total_lifts")
+
+# user_id -> [balance, power, total_lifts, total_earned], еще не записанные в базу
+_pending_players: dict[int, list] = {}
+# clan_id -> [treasury, total_lifts]
+_pending_clans: dict[int, list] = {}
+# Пачка, которая сейчас пишется - тоже учитывается при наложении
+_flushing_players: dict[int, list] = {}
+_flushing_clans: dict[int, list] = {}
+
+
+def _unsaved_lift_users() -> set:
+    return _pending_players.keys() | _flushing_players.keys()
+
+
+# Перезагрузка копии таблицы игроков не затирает еще не записанные поднятия
+player_table.track_unsaved(_unsaved_lift_users)
+
+
+def get_lift_reward(player) -> tuple:
+    """Доход и сила за один подход"""
+    dumbbell = settings.DUMBBELL_LEVELS[player["dumbbell_level"]]
+    income = player.get("custom_income")
+    if income is None:
+        income = dumbbell["income_per_use"]
+    return income, dumbbell["power_per_use"]
+
+
+def _merge(target: dict, row_id: int, deltas) -> None:
+    current = target.get(row_id)
+    if current is None:
+        target[row_id] = list(deltas)
+    else:
+        for i, delta in enumerate(deltas):
+            current[i] += delta
+
+
+def _pending_sum(pending: dict, flushing: dict, row_id: int, size: int) -> list | None:
+    first = pending.get(row_id)
+    second = flushing.get(row_id)
+    if first is None and second is None:
+        return None
+    return [(first[i] if first else 0) + (second[i] if second else 0) for i in range(size)]
+
+
+def _overlay(row, fields: tuple, deltas: list):
+    changes = {field: row[field] + delta for field, delta in zip(fields, deltas)}
+    if isinstance(row, dict):
+        return {**row, **changes}
+    return dataclasses.replace(row, **changes)
+
+
+def with_pending_lifts(player):
+    """Игрок из базы + еще не записанные поднятия (для вывода баланса, силы, поднятий)"""
+    if player is None:
+        return None
+    deltas = _pending_sum(_pending_players, _flushing_players, player["user_id"], len(LIFT_PLAYER_FIELDS))
+    if deltas is None:
+        return player
+    return _overlay(player, LIFT_PLAYER_FIELDS, deltas)
+
+
+def with_pending_clan_lifts(clan):
+    """Клан из базы + еще не записанные поднятия участников"""
+    if clan is None:
+        return None
+    deltas = _pending_sum(_pending_clans, _flushing_clans, clan["id"], len(LIFT_CLAN_FIELDS))
+    if deltas is None:
+        return clan
+    return _overlay(clan, LIFT_CLAN_FIELDS, deltas)
+
+
+def record_lift(player, clan=None) -> dict:
+    """Засчитать подход в памяти; в базу он уйдет со следующим flush_lifts
+
+    player - строка игрока из базы (без наложения), clan - его клан или None.
+    """
+    user_id = player["user_id"]
+    income, power = get_lift_reward(player)
+
+    _merge(_pending_players, user_id, (income, power, 1, income))
+    player_table.add(user_id, balance=income, power=power, total_lifts=1, total_earned=income)
+
+    clan_bonus = 0
+    if clan:
+        clan_bonus = get_clan_bonuses(clan["level"])["lift_bonus_coins"]
+        _merge(_pending_clans, clan["id"], (clan_bonus, 1))
+        queue_treasury_log(clan["id"], user_id, "lift_income", clan_bonus, "Доход с поднятий", player["username"])
+
+    return {
+        "income": income,
+        "power": power,
+        "clan_bonus": clan_bonus,
+        "player": with_pending_lifts(player),
+    }
+
+
+async def flush_lifts() -> int:
+    """Запись всех накопленных поднятий пакетными UPDATE"""
+    global _pending_players, _pending_clans, _flushing_players, _flushing_clans
+
+    if not _pending_players and not _pending_clans:
+        return 0
+
+    _flushing_players, _pending_players = _pending_players, {}
+    _flushing_clans, _pending_clans = _pending_clans, {}
+    flushed_users = list(_flushing_players)
+
+    try:
+        return await apply_lift_deltas(_flushing_players, _flushing_clans)
+    finally:
+        # Незаписанное (при ошибке) возвращаем в накопитель до следующей попытки
+        for user_id, deltas in _flushing_players.items():
+            _merge(_pending_players, user_id, deltas)
+        for clan_id, deltas in _flushing_clans.items():
+            _merge(_pending_clans, clan_id, deltas)
+        _flushing_players = {}
+        _flushing_clans = {}
+
+        for user_id in flushed_users:
+            invalidate_player_card(user_id)
+
+
+@shard.shared("lifts.clear")
+def clear_pending_lifts() -> None:
+    """Забыть незаписанные поднятия (после сброса сезона их игроков и кланов уже нет)"""
+    _pending_players.clear()
+    _pending_clans.clear()
+
+
+async def lift_flusher(interval: int = LIFT_FLUSH_INTERVAL):
+    """Фоновая пакетная запись поднятий; при остановке бота - последняя запись и выход"""
+    while True:
+        stopping = await lifecycle.pause(interval)
+        try:
+            await flush_lifts()
+        except Exception as e:
+            print(f"❌ Ошибка записи поднятий: {e}")
+        if stopping:
+            return
+
+
+def start_lift_flusher() -> asyncio.Task:
+    """Запуск фоновой записи (вызывать из main())"""
+    # Не отменяется при остановке: отмена во время UPDATE вернула бы
+    # уже записанную пачку в накопитель и записала ее второй раз
+    return lifecycle.service("поднятия", lift_flusher(), graceful=True)
+
+
+# В основном файле бота нужно будет вызвать при запуске:
+# start_lift_flusher()
+#
+# В обработчике "Поднять" вместо отдельных UPDATE игрока, казны и лога:
+# result = record_lift(player, clan)
+# player = result["player"]  # баланс, сила и поднятия уже с учетом подхода
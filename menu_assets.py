@@ -0,0 +1,79 @@
+from vkbottle import Keyboard
+
+# ======================
+# ГОТОВЫЕ КЛАВИАТУРЫ И ТЕКСТЫ СПРАВКИ
+# ======================
+# Меню и справка зависят только от уровня администратора и доступа к "Инфа".
+# От самого игрока в клавиатуре - лишь id владельца в payload callback-кнопок,
+# поэтому клавиатура один раз сериализуется с заглушкой вместо id, а при
+# показе заглушка заменяется id игрока. Показ меню - поиск в словаре.
+
+# Заглушка id владельца: такого числа нет ни в подписях, ни в разделах кнопок
+MENU_OWNER_PLACEHOLDER = -707070707
+
+
+class MenuAssets:
+    """(меню, уровень администратора, доступ к Инфа) -> готовая строка"""
+
+    def __init__(self):
+        # меню -> (сборщик, уровни или None, учитывать ли доступ к Инфа)
+        self._builders: dict = {}
+        # (меню, уровень, доступ) -> текст или части JSON клавиатуры вокруг заглушки
+        self._assets: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._assets)
+
+    def register(self, menu: str, build, admin_levels: tuple = None, info_access: bool = False):
+        """build(admin_level, has_info_access, owner) -> Keyboard или текст
+
+        admin_levels - уровни, от которых зависит меню (None - не зависит);
+        info_access - зависит ли меню от доступа к Инфа.
+        """
+        if menu in self._builders:
+            raise ValueError(f"Меню {menu} уже зарегистрировано")
+        self._builders[menu] = (build, admin_levels, info_access)
+
+    def _key(self, menu: str, admin_level: int, has_info_access: bool) -> tuple:
+        _, admin_levels, info_access = self._builders[menu]
+        return (
+            menu,
+            admin_level if admin_levels is not None else 0,
+            bool(has_info_access) if info_access else False,
+        )
+
+    def _build(self, key: tuple):
+        menu, admin_level, has_info_access = key
+        build = self._builders[menu][0]
+        value = build(admin_level, has_info_access, MENU_OWNER_PLACEHOLDER)
+        if isinstance(value, Keyboard):
+            value = tuple(value.get_json().split(str(MENU_OWNER_PLACEHOLDER)))
+        self._assets[key] = value
+        return value
+
+    def get(self, menu: str, admin_level: int = 0, has_info_access: bool = False, owner: int = None) -> str:
+        """Готовый текст или JSON клавиатуры (owner - id игрока для callback-кнопок)"""
+        key = self._key(menu, admin_level, has_info_access)
+        value = self._assets.get(key)
+        if value is None:
+            # Уровень, которого не было при сборке, - собираем и запоминаем
+            value = self._build(key)
+        if isinstance(value, tuple):
+            return str(owner).join(value)
+        return value
+
+    def build(self) -> int:
+        """Собрать все варианты всех зарегистрированных меню (вызывать при запуске)"""
+        for menu, (_, admin_levels, info_access) in self._builders.items():
+            for admin_level in admin_levels or (0,):
+                for has_info_access in ((False, True) if info_access else (False,)):
+                    self._build((menu, admin_level, has_info_access))
+        return len(self._assets)
+
+
+menu_assets = MenuAssets()
+
+
+# В основном файле бота нужно будет собрать все меню при запуске
+# (после импорта admin, user и Clan, которые их регистрируют):
+# menu_assets.build()
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+
+# ======================
+# ВРЕМЯ (ЦЕЛЫЕ СЕКУНДЫ UNIX EPOCH)
+# ======================
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def now_ts() -> int:
+    """Текущее время в секундах epoch"""
+    return int(time.time())
+
+
+def to_ts(value) -> int | None:
+    """Время из базы в секундах epoch
+
+    Строки остаются в строках, созданных в обход now_ts(): DEFAULT
+    CURRENT_TIMESTAMP ("2024-01-31 12:00:00", UTC) и datetime.now().isoformat()
+    ("2024-01-31T15:00:00", местное время) - они переводятся при чтении.
+    """
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+
+    text = str(value).strip()
+    if text.lstrip("-").isdigit():
+        return int(text)
+    parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    if parsed.tzinfo is None and "T" not in text:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def format_ts(ts, fmt: str = "%d.%m.%Y %H:%M", default: str = "—") -> str:
+    """Форматирование epoch-времени для вывода"""
+    ts = to_ts(ts)
+    if ts is None:
+        return default
+    return datetime.fromtimestamp(ts).strftime(fmt)
+
+
+def days_since(ts) -> int:
+    """Сколько полных дней прошло с момента ts"""
+    return (now_ts() - to_ts(ts)) // SECONDS_PER_DAY
+
+
+def days_until(ts) -> int:
+    """Сколько полных дней осталось до момента ts"""
+    return (to_ts(ts) - now_ts()) // SECONDS_PER_DAY
+
+
+# ======================
+# МОДЕЛИ СТРОК
+# ======================
+
+class RowAccess:
+    """Доступ к полям как к ключам словаря - для кода, написанного под dict-строки"""
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        return hasattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    @classmethod
+    def from_row(cls, row):
+        """Создание модели из строки БД (dict или sqlite3.Row), лишние колонки игнорируются"""
+        data = dict(row)
+        return cls(**{f.name: data[f.name] for f in fields(cls) if f.name in data})
+
+
+@dataclass(slots=True)
+class PlayerRow(RowAccess):
+    user_id: int
+    username: str
+    balance: int = 0
+    magnesia: int = 0
+    power: int = 0
+    dumbbell_level: int = 1
+    dumbbell_name: str = ""
+    total_lifts: int = 0
+    total_earned: int = 0
+    total_spent: int = 0
+    custom_income: int | None = None
+    admin_level: int = 0
+    admin_nickname: str | None = None
+    is_banned: int = 0
+    clan_id: int | None = None
+    clan_role: str | None = None
+    clan_contributions: int = 0
+    clan_joined_at: int | None = None
+    created_at: int = 0
+    last_active: int | None = None
+
+
+@dataclass(slots=True)
+class PlayerCard(PlayerRow):
+    clan_tag: str | None = None
+    clan_name: str | None = None
+    clan_level: int | None = None
+
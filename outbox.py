@@ -0,0 +1,291 @@
+import asyncio
+import time
+from collections import deque
+
+from vkbottle.dispatch.return_manager import BaseReturnManager
+
+from bot.core.config import settings
+from bot.services.lifecycle import lifecycle
+
+# ======================
+# ОЧЕРЕДЬ ИСХОДЯЩИХ СООБЩЕНИЙ (ПРИОРИТЕТЫ + СКЛЕЙКА ОТВЕТОВ)
+# ======================
+# Все сообщения бота идут через одну очередь с общим бюджетом запросов к VK:
+#   - ответы на команды - в быструю полосу, несколько ответов одному
+#     собеседнику за несколько миллисекунд склеиваются в одно сообщение;
+#   - рассылки и уведомления - в медленную полосу, им никогда не достается
+#     последние OUTBOX_INTERACTIVE_RESERVE запросов бюджета.
+
+# Лимит VK для токена сообщества - 20 запросов в секунду
+OUTBOX_RATE_PER_SECOND = 20
+# Сколько запросов бюджета всегда остается ответам на команды
+OUTBOX_INTERACTIVE_RESERVE = 3
+# Сколько ждать других ответов тому же собеседнику перед отправкой (секунды)
+OUTBOX_COALESCE_DELAY = 0.005
+# Ограничения messages.send
+VK_MESSAGE_MAX_LENGTH = 4096
+VK_PEER_IDS_PER_SEND = 100
+
+
+class _Reply:
+    __slots__ = ("message", "text", "kwargs", "created", "future")
+
+    def __init__(self, message, text: str, kwargs: dict, future):
+        self.message = message
+        self.text = text
+        self.kwargs = kwargs
+        self.created = time.monotonic()
+        self.future = future
+
+
+class _Bulk:
+    __slots__ = ("api", "peer_ids", "text", "kwargs", "future")
+
+    def __init__(self, api, peer_ids: list, text: str, kwargs: dict, future):
+        self.api = api
+        self.peer_ids = peer_ids
+        self.text = text
+        self.kwargs = kwargs
+        self.future = future
+
+
+class OutgoingQueue:
+    """Две полосы сообщений и корзина токенов на запросы к VK"""
+
+    def __init__(self, rate: int = OUTBOX_RATE_PER_SECOND, reserve: int = OUTBOX_INTERACTIVE_RESERVE):
+        self.rate = rate
+        self.reserve = reserve
+        self._tokens = float(rate)
+        self._refilled = time.monotonic()
+
+        self._interactive: deque = deque()
+        # peer_id -> еще не отправленный ответ (к нему приклеиваются следующие)
+        self._pending_replies: dict[int, _Reply] = {}
+        self._bulk: deque = deque()
+
+        self._wakeup: asyncio.Event | None = None
+        self._worker: asyncio.Task | None = None
+        self._sending: set = set()
+
+    def __len__(self) -> int:
+        return len(self._interactive) + len(self._bulk)
+
+    def share(self, parts: int):
+        """Доля общего лимита VK, когда бот запущен в parts процессах"""
+        self.rate = OUTBOX_RATE_PER_SECOND / parts
+        self.reserve = OUTBOX_INTERACTIVE_RESERVE / parts
+        self._tokens = min(self._tokens, self.rate)
+
+    # ----- постановка в очередь -----
+
+    def reply(self, message, text: str, **kwargs) -> asyncio.Future:
+        """Ответ на команду (быстрая полоса); результат - как у message.answer"""
+        pending = self._pending_replies.get(message.peer_id)
+        if (
+            pending is not None
+            and text
+            and pending.text
+            and pending.kwargs == kwargs
+            and len(pending.text) + len(text) + 2 <= VK_MESSAGE_MAX_LENGTH
+        ):
+            pending.text = f"{pending.text}\n\n{text}"
+            return pending.future
+
+        item = _Reply(message, text, kwargs, asyncio.get_running_loop().create_future())
+        self._interactive.append(item)
+        self._pending_replies[message.peer_id] = item
+        self._wake()
+        return item.future
+
+    def send_bulk(self, api, peer_ids: list, text: str, **kwargs) -> list:
+        """Сообщение многим собеседникам (медленная полоса) - по VK_PEER_IDS_PER_SEND за запрос"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for start in range(0, len(peer_ids), VK_PEER_IDS_PER_SEND):
+            future = loop.create_future()
+            self._bulk.append(_Bulk(api, peer_ids[start:start + VK_PEER_IDS_PER_SEND], text, kwargs, future))
+            futures.append(future)
+        self._wake()
+        return futures
+
+    # ----- отправка -----
+
+    def _wake(self):
+        if self._worker is None or self._worker.done():
+            self.start()
+        self._wakeup.set()
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+        return now
+
+    async def _sleep(self, timeout: float):
+        """Пауза, которую прерывает новое сообщение в очереди"""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _spawn(self, coro, future):
+        task = asyncio.create_task(self._deliver(coro, future))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    @staticmethod
+    async def _deliver(coro, future):
+        try:
+            result = await coro
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+
+    async def _run(self):
+        while True:
+            if not self._interactive and not self._bulk:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = self._refill()
+
+            if self._interactive:
+                item = self._interactive[0]
+                wait = item.created + OUTBOX_COALESCE_DELAY - now
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                if self._tokens < 1:
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+                    continue
+
+                self._interactive.popleft()
+                if self._pending_replies.get(item.message.peer_id) is item:
+                    del self._pending_replies[item.message.peer_id]
+                self._tokens -= 1
+                self._spawn(item.message.answer(item.text, **item.kwargs), item.future)
+                continue
+
+            # Рассылке достаются только токены сверх резерва для ответов
+            if self._tokens < 1 + self.reserve:
+                await self._sleep((1 + self.reserve - self._tokens) / self.rate)
+                continue
+
+            item = self._bulk.popleft()
+            self._tokens -= 1
+            send = item.api.messages.send(peer_ids=item.peer_ids, message=item.text, random_id=0, **item.kwargs)
+            self._spawn(send, item.future)
+
+    def start(self) -> asyncio.Task:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        return self._worker
+
+    async def drain(self):
+        """Дождаться отправки всего, что уже стоит в очереди"""
+        while self or self._sending:
+            if self._sending:
+                await asyncio.gather(*self._sending, return_exceptions=True)
+            else:
+                await asyncio.sleep(1 / self.rate)
+
+    async def stop(self, timeout: float = None) -> int:
+        """Отправить очередь (не дольше timeout секунд) и остановить отправку
+
+        Возвращает число сообщений, которые не успели уйти.
+        """
+        timeout = settings.SHUTDOWN_OUTBOX_TIMEOUT if timeout is None else timeout
+        try:
+            await asyncio.wait_for(self.drain(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        left = len(self)
+        for item in (*self._interactive, *self._bulk):
+            if not item.future.done():
+                item.future.cancel()
+        self._interactive.clear()
+        self._bulk.clear()
+        self._pending_replies.clear()
+
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        if left:
+            print(f"❌ При остановке не отправлено сообщений: {left}")
+        return left
+
+
+outbox = OutgoingQueue()
+
+
+async def reply(message, text: str, **kwargs):
+    """Замена message.answer: ответ уходит через очередь, результат тот же"""
+    return await outbox.reply(message, text, **kwargs)
+
+
+async def broadcast(api, peer_ids: list, text: str, **kwargs) -> dict:
+    """Рассылка через медленную полосу; ответы на команды во время нее не задерживаются"""
+    futures = outbox.send_bulk(api, peer_ids, text, **kwargs)
+    results = await asyncio.gather(*futures, return_exceptions=True)
+
+    successful = 0
+    for start, result in zip(range(0, len(peer_ids), VK_PEER_IDS_PER_SEND), results):
+        if isinstance(result, Exception):
+            print(f"Ошибка рассылки (получатели {start + 1}-{start + VK_PEER_IDS_PER_SEND}): {result}")
+            continue
+        # Для каждого получателя VK возвращает message_id или error
+        successful += sum(1 for sent in result if getattr(sent, "error", None) is None)
+
+    return {"successful": successful, "failed": len(peer_ids) - successful}
+
+
+def notifier(message):
+    """Уведомления в беседу message через медленную полосу (для долгих фоновых задач)"""
+    async def notify(text: str):
+        for future in outbox.send_bulk(message.ctx_api, [message.peer_id], text):
+            # Результат не ждем; ошибку отправки только печатаем
+            future.add_done_callback(_report_notify_error)
+    return notify
+
+
+def _report_notify_error(future: asyncio.Future):
+    if not future.cancelled() and future.exception():
+        print(f"❌ Ошибка отправки уведомления: {future.exception()}")
+
+
+class OutboxReturnHandler(BaseReturnManager):
+    """Строки, списки и словари, возвращенные обработчиками, тоже идут через очередь"""
+
+    @BaseReturnManager.instance_of(str)
+    async def str_handler(self, value: str, message, _: dict):
+        await reply(message, value)
+
+    @BaseReturnManager.instance_of((tuple, list))
+    async def iter_handler(self, value, message, _: dict):
+        # Сначала все части в очередь - тогда они склеиваются в одно сообщение
+        await asyncio.gather(*(outbox.reply(message, str(part)) for part in value))
+
+    @BaseReturnManager.instance_of(dict)
+    async def dict_handler(self, value: dict, message, _: dict):
+        value = dict(value)
+        await reply(message, value.pop("message", None), **value)
+
+
+def start_outbox() -> asyncio.Task:
+    """Запуск отправки (вызывать из main()); при остановке бота очередь отправляется"""
+    lifecycle.on_stop("drain", "очередь сообщений", outbox.stop)
+    return outbox.start()
+
+
+# В основном файле бота нужно будет вызвать при запуске:
+# start_outbox()
+# bot.labeler.message_view.handler_return_manager = OutboxReturnHandler()
@@ -0,0 +1,284 @@
+import asyncio
+
+try:
+    import numpy as np
+except ImportError:  # numpy не установлен - аналитика идет через SQL как раньше
+    np = None
+
+from bot.db import iter_player_columns
+from bot.services.lifecycle import lifecycle
+from bot.services.sharding import shard
+
+# ======================
+# КОЛОНОЧНАЯ КОПИЯ ТАБЛИЦЫ ИГРОКОВ В ПАМЯТИ (NUMPY)
+# ======================
+
+# Колонки и их типы; строка i во всех массивах - один и тот же игрок
+PLAYER_COLUMNS = {
+    "user_id": "int64",
+    "balance": "int64",
+    "power": "int64",
+    "total_lifts": "int64",
+    "total_earned": "int64",
+    "dumbbell_level": "int16",
+    "admin_level": "int8",
+    "is_banned": "int8",
+}
+
+# Полная перезагрузка как страховка от записей в обход хуков
+PLAYER_TABLE_RELOAD_INTERVAL = 15 * 60
+
+INITIAL_CAPACITY = 1024
+
+
+class PlayerTable:
+    """Массивы по колонкам + user_id -> номер строки; удаление переносом последней строки"""
+
+    def __init__(self):
+        self.loaded = False
+        self._size = 0
+        self._rows: dict[int, int] = {}
+        self._usernames: list[str] = []
+        self._columns: dict = {}
+        # Во время перезагрузки: user_id -> "upsert", "remove" или "touch" (add/update)
+        self._journal: dict[int, str] | None = None
+        # Функции, возвращающие user_id игроков с изменениями, еще не записанными в базу
+        self._unsaved_sources: list = []
+        if np is not None:
+            self._allocate(INITIAL_CAPACITY)
+
+    @property
+    def enabled(self) -> bool:
+        """Копией можно пользоваться: numpy есть и данные загружены"""
+        return np is not None and self.loaded
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _allocate(self, capacity: int):
+        new_columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in PLAYER_COLUMNS.items()}
+        for name, column in self._columns.items():
+            new_columns[name][:self._size] = column[:self._size]
+        self._columns = new_columns
+
+    def column(self, name: str):
+        """Заполненная часть колонки (view, без копирования)"""
+        return self._columns[name][:self._size]
+
+    # ======================
+    # ЗАПИСЬ (ВЫЗЫВАЕТСЯ ИЗ ПУТЕЙ ЗАПИСИ В БД)
+    # ======================
+
+    def clear(self):
+        self._size = 0
+        self._rows.clear()
+        self._usernames.clear()
+
+    def upsert(self, player):
+        """Добавление или полная замена строки игрока (create_player, загрузка)"""
+        if np is None:
+            return
+
+        user_id = player["user_id"]
+        if self._journal is not None:
+            self._journal[user_id] = "upsert"
+        row = self._rows.get(user_id)
+        if row is None:
+            row = self._size
+            if row == len(self._columns["user_id"]):
+                self._allocate(row * 2)
+            self._rows[user_id] = row
+            self._usernames.append(player["username"])
+            self._size += 1
+        else:
+            self._usernames[row] = player["username"]
+
+        for name in PLAYER_COLUMNS:
+            self._columns[name][row] = player.get(name) or 0
+
+    def update(self, user_id: int, **values):
+        """Установка значений колонок (set_dumbbell_level, make_admin, ...)"""
+        row = self._rows.get(user_id)
+        if row is None:
+            return
+        if self._journal is not None:
+            self._journal.setdefault(user_id, "touch")
+        if "username" in values:
+            self._usernames[row] = values.pop("username")
+        for name, value in values.items():
+            self._columns[name][row] = value
+
+    def add(self, user_id: int, **deltas):
+        """Приращение значений колонок (update_player_balance, поднятия)"""
+        row = self._rows.get(user_id)
+        if row is None:
+            return
+        if self._journal is not None:
+            self._journal.setdefault(user_id, "touch")
+        for name, delta in deltas.items():
+            self._columns[name][row] += delta
+
+    def remove(self, user_id: int):
+        """Удаление игрока (delete_player)"""
+        if self._journal is not None:
+            self._journal[user_id] = "remove"
+        row = self._rows.pop(user_id, None)
+        if row is None:
+            return
+
+        last = self._size - 1
+        if row != last:
+            for column in self._columns.values():
+                column[row] = column[last]
+            self._usernames[row] = self._usernames[last]
+            self._rows[int(self._columns["user_id"][row])] = row
+        self._usernames.pop()
+        self._size = last
+
+    def track_unsaved(self, source):
+        """source() - user_id игроков, чьи изменения копия уже учла, а база еще нет
+        (накопленные поднятия); перезагрузка оставляет их строки из копии"""
+        self._unsaved_sources.append(source)
+
+    def _row_of(self, user_id: int) -> dict | None:
+        row = self._rows.get(user_id)
+        return None if row is None else self.players([row])[0]
+
+    # ======================
+    # АНАЛИТИКА
+    # ======================
+
+    def count(self, **filters) -> int:
+        """Количество игроков, у которых колонки равны заданным значениям"""
+        if not filters:
+            return self._size
+        return int(np.count_nonzero(self._mask(filters)))
+
+    def _mask(self, filters: dict):
+        mask = np.ones(self._size, dtype=bool)
+        for name, value in filters.items():
+            mask &= self.column(name) == value
+        return mask
+
+    def total(self, name: str) -> int:
+        return int(self.column(name).sum())
+
+    def histogram(self, name: str) -> dict:
+        """Сколько игроков с каждым значением колонки (для небольших целых: уровни, флаги)"""
+        values = self.column(name)
+        if not self._size:
+            return {}
+        offset = int(values.min())
+        counts = np.bincount(values.astype(np.int64) - offset)
+        return {int(value) + offset: int(count) for value, count in enumerate(counts) if count}
+
+    def top(self, name: str, n: int = 10, **filters) -> list:
+        """Топ-n игроков по колонке без полной сортировки: (user_id, username, значение)"""
+        values = self.column(name)
+        if filters:
+            rows = np.flatnonzero(self._mask(filters))
+            candidates = values[rows]
+        else:
+            rows = None
+            candidates = values
+        if not len(candidates):
+            return []
+
+        n = min(n, len(candidates))
+        # argpartition - O(N), сортируем только выбранные n строк
+        best = np.argpartition(candidates, -n)[-n:]
+        if rows is not None:
+            best = rows[best]
+        best = best[np.argsort(-values[best], kind="stable")]
+        return [
+            (int(self._columns["user_id"][row]), self._usernames[row], int(values[row]))
+            for row in best
+        ]
+
+    def players(self, rows) -> list:
+        """Строки игроков в виде словарей (для вывода списков)"""
+        result = []
+        for row in rows:
+            player = {name: int(self._columns[name][row]) for name in PLAYER_COLUMNS}
+            player["username"] = self._usernames[row]
+            result.append(player)
+        return result
+
+    def top_players(self, name: str, n: int = 10) -> list:
+        """Топ-n игроков по колонке целыми строками"""
+        return self.players(self._rows[user_id] for user_id, _, _ in self.top(name, n))
+
+
+player_table = PlayerTable()
+
+_load_lock = asyncio.Lock()
+
+
+async def load_player_table():
+    """Загрузка копии таблицы игроков (при запуске и после сброса)"""
+    if np is None:
+        return
+
+    async with _load_lock:
+        await _load_player_table()
+
+
+async def _load_player_table():
+    # Игроки, измененные во время чтения или с незаписанными изменениями: их
+    # страница могла быть прочитана до записи в базу - строку берем из копии
+    unsaved = set()
+    for source in player_table._unsaved_sources:
+        unsaved.update(source())
+    player_table._journal = {user_id: "touch" for user_id in unsaved}
+
+    table = PlayerTable()
+    try:
+        async for rows in iter_player_columns():
+            for player in rows:
+                table.upsert(player)
+        journal = player_table._journal
+    finally:
+        player_table._journal = None
+
+    for user_id, change in journal.items():
+        if change == "remove":
+            table.remove(user_id)
+            continue
+        player = player_table._row_of(user_id)
+        # "touch" игрока, которого уже нет в базе (удален мимо хуков), не возвращаем
+        if player is not None and (change == "upsert" or user_id in table._rows):
+            table.upsert(player)
+
+    # Подменяем содержимое целиком, чтобы обработчики не увидели половину данных
+    player_table._size = table._size
+    player_table._rows = table._rows
+    player_table._usernames = table._usernames
+    player_table._columns = table._columns
+    player_table.loaded = True
+
+
+@shard.shared_async("player_table.reload")
+async def reload_player_table():
+    """Перезагрузка копии во всех процессах бота (после сброса сезона)"""
+    await load_player_table()
+
+
+async def player_table_reloader(interval: int = PLAYER_TABLE_RELOAD_INTERVAL):
+    """Фоновая периодическая перезагрузка копии"""
+    while not await lifecycle.pause(interval):
+        try:
+            await load_player_table()
+        except Exception as e:
+            print(f"❌ Ошибка перезагрузки таблицы игроков: {e}")
+
+
+def start_player_table_reloader() -> asyncio.Task | None:
+    """Запуск фоновой перезагрузки (вызывать из main())"""
+    if np is None:
+        return None
+    return lifecycle.service("таблица игроков", player_table_reloader())
+
+
+# В основном файле бота нужно будет вызвать при запуске:
+# await load_player_table()
+# start_player_table_reloader()
@@ -0,0 +1,152 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from vkbottle.bot import Message
+from vkbottle.dispatch.middlewares import BaseMiddleware
+
+from bot.core.config import settings
+from bot.db import is_known_admin
+from bot.services.command_router import command_router
+from bot.services.outbox import reply
+
+# ======================
+# ОГРАНИЧЕНИЕ ЧАСТОТЫ КОМАНД (СКОЛЬЗЯЩЕЕ ОКНО + ОЧЕРЕДЬ ПО КАТЕГОРИЯМ)
+# ======================
+# Все счетчики живут в памяти - ограничитель не делает запросов к базе.
+
+RATE_LIMIT_REPLY = "⏳ Слишком часто! Подождите несколько секунд и повторите команду."
+RATE_LIMIT_BUSY_REPLY = "⏳ Бот сейчас сильно нагружен, повторите команду чуть позже."
+
+
+class SlidingWindowCounter:
+    """Счетчики скользящего окна по ключам; давно не обновлявшиеся ключи вытесняются (LRU)
+
+    Для ключа хранится [номер окна, счет прошлого окна, счет текущего окна];
+    число событий за последние window секунд оценивается как
+    прошлое окно * (непрошедшая доля текущего) + текущее окно.
+    """
+
+    def __init__(self, window: float, limit: int, max_keys: int):
+        self.window = window
+        self.limit = limit
+        self.max_keys = max_keys
+        self._entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def hit(self, key, now: float = None) -> bool:
+        """Засчитать событие; False - лимит исчерпан (событие не засчитывается)"""
+        position = (time.monotonic() if now is None else now) / self.window
+        period = int(position)
+
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = [period, 0, 0]
+            self._entries[key] = entry
+            if len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+            if entry[0] != period:
+                entry[1] = entry[2] if entry[0] == period - 1 else 0
+                entry[2] = 0
+                entry[0] = period
+
+        if entry[1] * (1 - (position - period)) + entry[2] >= self.limit:
+            return False
+
+        entry[2] += 1
+        return True
+
+
+class RateLimiter:
+    """Лимиты на игрока и на команду игрока + число одновременных команд по категориям"""
+
+    def __init__(self):
+        window = settings.RATE_LIMIT_WINDOW
+        max_users = settings.RATE_LIMIT_MAX_USERS
+        self.users = SlidingWindowCounter(window, settings.RATE_LIMIT_PER_USER, max_users)
+        self.commands = SlidingWindowCounter(window, settings.RATE_LIMIT_PER_COMMAND, max_users * 4)
+        # Одно предупреждение за окно, чтобы ответы сами не превращались в спам
+        self._warnings = SlidingWindowCounter(window, 1, max_users)
+        self._slots: dict[str, asyncio.Semaphore] = {}
+
+    def allow(self, user_id: int, command: str, now: float = None) -> bool:
+        return self.users.hit(user_id, now) and self.commands.hit((user_id, command), now)
+
+    def should_warn(self, user_id: int, now: float = None) -> bool:
+        return self._warnings.hit(user_id, now)
+
+    def category(self, command: str) -> str:
+        return settings.RATE_LIMIT_CATEGORIES.get(command, "default")
+
+    def slot(self, category: str) -> asyncio.Semaphore:
+        semaphore = self._slots.get(category)
+        if semaphore is None:
+            limit = settings.RATE_LIMIT_CONCURRENCY.get(category, settings.RATE_LIMIT_CONCURRENCY["default"])
+            semaphore = self._slots[category] = asyncio.Semaphore(limit)
+        return semaphore
+
+
+rate_limiter = RateLimiter()
+
+
+class CommandSlot:
+    """Место в очереди категории на время одного обработчика (async with)
+
+    Занимается и освобождается вокруг самого вызова обработчика
+    (CompiledCommandsHandler.handle), а не между pre и post middleware:
+    post выполняется не всегда, и место терялось бы навсегда.
+    """
+
+    def __init__(self, semaphore: asyncio.Semaphore, event: Message):
+        self.semaphore = semaphore
+        self.event = event
+        self.acquired = False
+
+    async def __aenter__(self) -> bool:
+        """False - место не освободилось за RATE_LIMIT_QUEUE_TIMEOUT, игроку уже ответили"""
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), settings.RATE_LIMIT_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            await reply(self.event, RATE_LIMIT_BUSY_REPLY)
+            return False
+        self.acquired = True
+        return True
+
+    async def __aexit__(self, *_):
+        if self.acquired:
+            self.acquired = False
+            self.semaphore.release()
+
+
+class RateLimitMiddleware(BaseMiddleware[Message]):
+    """Отсекает слишком частые команды до обработчиков и ограничивает одновременные тяжелые команды"""
+
+    async def pre(self):
+        user_id = self.event.from_id
+        admin = is_known_admin(user_id)
+
+        found = command_router.route(self.event.text, admin is not False)
+        if found is None:
+            # Не команда - базу не трогает, считать нечего
+            return
+
+        command = found[0].handler.__name__
+
+        # Администраторов частота не ограничивает, очередь - ограничивает
+        if not admin and not rate_limiter.allow(user_id, command):
+            if rate_limiter.should_warn(user_id):
+                await reply(self.event, RATE_LIMIT_REPLY)
+            self.stop("Слишком частые команды")
+
+        # Место в очереди займет CompiledCommandsHandler на время обработчика
+        semaphore = rate_limiter.slot(rate_limiter.category(command))
+        self.send({"_command_slot": CommandSlot(semaphore, self.event)})
+
+
+# В основном файле бота нужно будет подключить (последним из middleware -
+# тогда частоту считают только сообщения, прошедшие остальные проверки):
+# bot.labeler.message_view.register_middleware(RateLimitMiddleware)
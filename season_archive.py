@@ -0,0 +1,127 @@
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+
+from bot.core.config import settings
+from bot.db import (
+    create_season,
+    get_season,
+    save_season_leaderboards,
+    snapshot_database,
+)
+
+# ======================
+# АРХИВ СЕЗОНА (СНИМОК БАЗЫ + ИНДЕКС ИГРОКОВ)
+# ======================
+# На каждый сезон в settings.season_archive_dir пишутся два файла:
+#   season_N.db.gz        - полный снимок базы (VACUUM INTO), сжатый gzip
+#   season_N_players.db   - только игроки: user_id -> значения колонок (JSON-массив),
+#                           имена колонок хранятся один раз; поиск по первичному ключу
+
+ARCHIVE_INDEX_BATCH = 5000
+
+
+def _build_player_index(snapshot_path: str, index_path: str) -> int:
+    """Индекс игроков из снимка (выполняется в отдельном потоке)"""
+    source = sqlite3.connect(snapshot_path)
+    source.row_factory = sqlite3.Row
+    target = sqlite3.connect(index_path)
+    try:
+        target.execute("CREATE TABLE columns (names TEXT NOT NULL)")
+        target.execute("CREATE TABLE players (user_id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+
+        count = 0
+        cursor = source.execute("SELECT * FROM players ORDER BY user_id")
+        names = [column[0] for column in cursor.description]
+        target.execute("INSERT INTO columns (names) VALUES (?)", (json.dumps(names),))
+
+        while rows := cursor.fetchmany(ARCHIVE_INDEX_BATCH):
+            target.executemany(
+                "INSERT INTO players (user_id, data) VALUES (?, ?)",
+                ((row["user_id"], json.dumps(tuple(row), ensure_ascii=False, separators=(",", ":"))) for row in rows),
+            )
+            count += len(rows)
+        target.commit()
+        return count
+    finally:
+        source.close()
+        target.close()
+
+
+def _compress_file(path: str, compressed_path: str) -> None:
+    # Готовый архив появляется одним переименованием - по его наличию
+    # season_archive_exists отличает сохраненный сезон от прерванного сохранения
+    partial_path = compressed_path + ".tmp"
+    with open(path, "rb") as source, gzip.open(partial_path, "wb", compresslevel=6) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+    os.replace(partial_path, compressed_path)
+    os.remove(path)
+
+
+def _archive_paths(season_id: int, directory: str = None) -> tuple:
+    directory = directory or settings.season_archive_dir
+    return (
+        os.path.join(directory, f"season_{season_id}.db.gz"),
+        os.path.join(directory, f"season_{season_id}_players.db"),
+    )
+
+
+async def archive_season() -> dict:
+    """Снимок базы, индекс игроков и итоговая таблица перед сбросом сезона"""
+    directory = settings.season_archive_dir
+    os.makedirs(directory, exist_ok=True)
+
+    snapshot_path = os.path.join(directory, "snapshot.tmp.db")
+    if os.path.exists(snapshot_path):
+        os.remove(snapshot_path)
+
+    await snapshot_database(snapshot_path)
+
+    season_id = await create_season(directory)
+    # Из снимка, а не из живой базы: записи после снимка в итоги не попадают
+    await save_season_leaderboards(season_id, snapshot_path)
+
+    archive_path, index_path = _archive_paths(season_id)
+    players = await asyncio.to_thread(_build_player_index, snapshot_path, index_path)
+    await asyncio.to_thread(_compress_file, snapshot_path, archive_path)
+
+    return {
+        "season_id": season_id,
+        "players": players,
+        "archive_path": archive_path,
+        "archive_size": os.path.getsize(archive_path),
+    }
+
+
+def season_archive_exists(season: dict) -> bool:
+    """Архив сезона сохранен полностью (последним пишется сжатый снимок)"""
+    archive_path, _ = _archive_paths(season["id"], season["archive_dir"])
+    return os.path.exists(archive_path)
+
+
+def _lookup_player(index_path: str, user_id: int) -> dict | None:
+    conn = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT data FROM players WHERE user_id = ?", (user_id,)).fetchone()
+        if not row:
+            return None
+        names = json.loads(conn.execute("SELECT names FROM columns").fetchone()[0])
+        return dict(zip(names, json.loads(row[0])))
+    finally:
+        conn.close()
+
+
+async def get_season_player(season_id: int, user_id: int) -> dict | None:
+    """Строка игрока из архива сезона - один поиск по первичному ключу"""
+    season = await get_season(season_id)
+    if not season:
+        return None
+
+    _, index_path = _archive_paths(season_id, season["archive_dir"])
+    if not os.path.exists(index_path):
+        return None
+
+    return await asyncio.to_thread(_lookup_player, index_path, user_id)
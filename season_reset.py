@@ -0,0 +1,148 @@
+import asyncio
+import time
+
+from bot.db import (
+    SEASON_RESET_CHUNK,
+    SEASON_RESET_STEPS,
+    clear_clan_caches,
+    finish_season_reset,
+    flush_treasury_log,
+    get_unfinished_season,
+    reset_season_chunk,
+)
+from bot.services.clan_search import clan_search_index
+from bot.services.lifecycle import lifecycle
+from bot.services.lift_cooldown import lift_cooldowns
+from bot.services.lift_pipeline import clear_pending_lifts, flush_lifts
+from bot.services.player_table import reload_player_table
+from bot.services.season_archive import archive_season, season_archive_exists
+from bot.services.sharding import shard
+from bot.utils import format_number
+
+# ======================
+# ПОЭТАПНЫЙ СБРОС СЕЗОНА В ФОНЕ
+# ======================
+
+# Пауза между порциями - в нее успевают записать остальные обработчики
+SEASON_RESET_PAUSE = 0.05
+# Как часто присылать создателю прогресс (секунды)
+SEASON_RESET_PROGRESS_INTERVAL = 15
+
+SEASON_RESET_STEP_NAMES = {
+    "clan_treasury_log": "Лог казны кланов",
+    "clan_log": "Лог кланов",
+    "clan_bans": "Исключения из кланов",
+    "admin_clan_members": "Выход администраторов из кланов",
+    "players": "Игроки",
+    "clans": "Кланы",
+}
+
+_reset_task: asyncio.Task | None = None
+
+
+@shard.shared_async("season_reset.flush")
+async def flush_write_buffers():
+    """Накопленные поднятия и лог казны - в базу (во всех процессах, перед снимком)"""
+    await flush_lifts()
+    await flush_treasury_log(force=True)
+
+
+@shard.shared_async("season_reset.flush_lifts")
+async def flush_lifts_everywhere():
+    """Поднятия, засчитанные во время сброса, - в базу во всех процессах"""
+    await flush_lifts()
+
+
+def is_season_reset_running() -> bool:
+    return _reset_task is not None and not _reset_task.done()
+
+
+async def run_season_reset(notify) -> dict:
+    """Сброс порциями с паузами; notify(text) получает прогресс"""
+    totals = {step: 0 for step, _ in SEASON_RESET_STEPS}
+    last_report = time.monotonic()
+
+    for step, _ in SEASON_RESET_STEPS:
+        while True:
+            affected = await reset_season_chunk(step)
+            totals[step] += affected
+            if affected < SEASON_RESET_CHUNK:
+                break
+
+            await asyncio.sleep(SEASON_RESET_PAUSE)
+
+            if time.monotonic() - last_report >= SEASON_RESET_PROGRESS_INTERVAL:
+                last_report = time.monotonic()
+                await notify(
+                    f"🔄 Сброс сезона идет...\n"
+                    f"📋 Этап: {SEASON_RESET_STEP_NAMES[step]}\n"
+                    f"🧹 Обработано строк: {format_number(totals[step])}"
+                )
+
+    # Поднятия оставшихся игроков (администраторов) сохраняем, остальное -
+    # поднятия и кулдауны прошлого сезона - в новый не переносится
+    await flush_lifts_everywhere()
+    clear_pending_lifts()
+    lift_cooldowns.reset_all()
+    clear_clan_caches()
+    clan_search_index.clear()
+    await reload_player_table()
+
+    return totals
+
+
+async def _run_and_report(notify):
+    started = time.monotonic()
+
+    # Накопленные в памяти поднятия и лог казны всех процессов должны попасть в архив
+    await flush_write_buffers()
+
+    # Прерванный сброс продолжается с архивом первого запуска: новый снимок
+    # сохранил бы наполовину очищенную базу как отдельный сезон
+    unfinished = await get_unfinished_season()
+    if unfinished and season_archive_exists(unfinished):
+        season_id = unfinished["id"]
+        await notify(f"📦 Архив сезона #{season_id} уже сохранен\n\n🔄 Продолжаю сброс...")
+    else:
+        # Без архива не удаляем ничего
+        try:
+            archive = await archive_season()
+        except Exception as e:
+            await notify(f"❌ Не удалось сохранить архив сезона, сброс отменен: {e}")
+            raise
+
+        season_id = archive["season_id"]
+        await notify(
+            f"📦 Архив сезона #{season_id} сохранен\n"
+            f"👥 Игроков в архиве: {format_number(archive['players'])}\n"
+            f"💾 Размер снимка: {archive['archive_size'] // (1024 * 1024)} МБ\n\n"
+            f"🔄 Начинаю сброс..."
+        )
+
+    try:
+        totals = await run_season_reset(notify)
+    except Exception as e:
+        await notify(f"❌ Сброс сезона прерван: {e}\nПовторите команду - сброс продолжится с места остановки")
+        raise
+
+    await finish_season_reset(season_id)
+
+    await notify(
+        f"✅ Сброс сезона завершен за {int(time.monotonic() - started)} сек.\n\n"
+        f"📊 Удалено игроков: {format_number(totals['players'])}\n"
+        f"📊 Удалено кланов: {format_number(totals['clans'])}\n"
+        f"📊 Удалено записей логов: {format_number(totals['clan_log'] + totals['clan_treasury_log'])}\n\n"
+        f"✅ Бот готов к новому сезону!"
+    )
+
+
+def start_season_reset(notify) -> asyncio.Task | None:
+    """Запуск сброса в фоне (None - сброс уже идет)"""
+    global _reset_task
+
+    if is_season_reset_running():
+        return None
+
+    # При остановке бота сброс прерывается и продолжится повторной командой
+    _reset_task = lifecycle.service("сброс сезона", _run_and_report(notify))
+    return _reset_task
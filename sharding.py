@@ -0,0 +1,401 @@
+import asyncio
+import contextlib
+import functools
+import json
+import multiprocessing
+import signal
+import socket
+import struct
+from collections import deque
+
+from bot.core.config import settings
+from bot.services.event_dedup import event_deduplicator
+from bot.services.lifecycle import Lifecycle, lifecycle
+from bot.services.outbox import outbox
+
+# ======================
+# НЕСКОЛЬКО ПРОЦЕССОВ БОТА (ШАРДЫ ПО user_id)
+# ======================
+# Супервизор получает события (long poll или Callback API) и раздает их
+# SHARD_WORKERS процессам по user_id: все события одного игрока попадают
+# в один процесс и обрабатываются там строго по очереди. Процессы связаны
+# с супервизором локальными сокетами; по ним же ходят сообщения об
+# изменении кэшей в памяти - супервизор пересылает их остальным процессам.
+#
+# Кадр в сокете - 4 байта длины и JSON:
+#   {"e": событие VK}                   супервизор -> процесс
+#   {"s": [имя, аргументы]}             процесс -> супервизор -> остальные процессы
+#   {"r": [имя, аргументы, id]}         запрос: выполнить и ответить (так же пересылается)
+#   {"a": [id, ошибка или null]}        ответ на запрос (так же пересылается)
+
+_FRAME = struct.Struct("!I")
+
+# Сколько ждать ответа остальных процессов на запрос (секунды)
+SHARD_REQUEST_TIMEOUT = 60
+
+
+def _encode(message: dict) -> bytes:
+    data = json.dumps(message, ensure_ascii=False).encode()
+    return _FRAME.pack(len(data)) + data
+
+
+async def _read(reader: asyncio.StreamReader) -> dict | None:
+    """Следующий кадр или None, если другая сторона закрыла сокет"""
+    try:
+        header = await reader.readexactly(_FRAME.size)
+        return json.loads(await reader.readexactly(_FRAME.unpack(header)[0]))
+    except asyncio.IncompleteReadError:
+        return None
+
+
+def event_user_id(event: dict) -> int:
+    """Игрок, к которому относится событие VK (0 - не определить)"""
+    obj = event.get("object") or {}
+    message = obj.get("message")
+    if isinstance(message, dict):
+        return message.get("from_id") or message.get("peer_id") or 0
+    return obj.get("user_id") or obj.get("from_id") or obj.get("peer_id") or 0
+
+
+def shard_of(user_id: int, shards: int) -> int:
+    return abs(user_id) % shards
+
+
+class ShardChannel:
+    """Связь процесса-шарда с супервизором; в одиночном процессе ничего не пересылает"""
+
+    def __init__(self):
+        self.index = 0
+        self.shards = 1
+        self._writer: asyncio.StreamWriter | None = None
+        # имя -> функция, которую надо повторить в этом процессе
+        self._handlers: dict = {}
+        # Вложенные вызовы общих функций не пересылаются: их повторит внешний вызов
+        self._nested = False
+        # user_id -> события игрока, ожидающие обработки (по порядку)
+        self._users: dict[int, deque] = {}
+        # имя -> async функция, которую выполняют по запросу другого процесса
+        self._async_handlers: dict = {}
+        # id запроса -> [сколько ответов ждем, ошибки, future]
+        self._requests: dict[str, list] = {}
+        self._request_seq = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._writer is not None
+
+    def shared(self, name: str):
+        """Декоратор: изменение кэша в памяти повторяется во всех процессах бота
+
+        Аргументы функции должны переводиться в JSON (числа, строки, None).
+        """
+        def decorator(func):
+            self._handlers[name] = func
+
+            @functools.wraps(func)
+            def wrapper(*args):
+                if self._nested:
+                    return func(*args)
+                self._nested = True
+                try:
+                    result = func(*args)
+                finally:
+                    self._nested = False
+                self.publish(name, args)
+                return result
+
+            return wrapper
+        return decorator
+
+    def shared_async(self, name: str):
+        """Декоратор для async функции: вызов выполняет ее во всех процессах бота и
+        ждет, пока закончит каждый (запись буферов перед снимком базы)
+
+        Аргументы функции должны переводиться в JSON (числа, строки, None).
+        """
+        def decorator(func):
+            self._async_handlers[name] = func
+
+            @functools.wraps(func)
+            async def wrapper(*args):
+                result = await func(*args)
+                if self._writer is not None and self.shards > 1:
+                    await self._request(name, args)
+                return result
+
+            return wrapper
+        return decorator
+
+    async def _request(self, name: str, args: tuple):
+        self._request_seq += 1
+        request_id = f"{self.index}.{self._request_seq}"
+        future = asyncio.get_running_loop().create_future()
+        self._requests[request_id] = [self.shards - 1, [], future]
+        self._writer.write(_encode({"r": [name, list(args), request_id]}))
+        try:
+            errors = await asyncio.wait_for(future, SHARD_REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"{name}: не все процессы ответили за {SHARD_REQUEST_TIMEOUT} сек.")
+        finally:
+            self._requests.pop(request_id, None)
+        if errors:
+            raise RuntimeError(f"{name}: " + "; ".join(errors))
+
+    async def _answer(self, name: str, args: list, request_id: str):
+        error = None
+        handler = self._async_handlers.get(name)
+        try:
+            if handler is None:
+                raise RuntimeError(f"неизвестный запрос {name}")
+            await handler(*args)
+        except Exception as e:
+            error = f"процесс {self.index}: {e}"
+        if self._writer is not None:
+            self._writer.write(_encode({"a": [request_id, error]}))
+
+    def _acknowledge(self, request_id: str, error: str | None):
+        waiting = self._requests.get(request_id)
+        if waiting is None:
+            # Ответ на запрос другого процесса
+            return
+        if error:
+            waiting[1].append(error)
+        waiting[0] -= 1
+        if waiting[0] <= 0 and not waiting[2].done():
+            waiting[2].set_result(waiting[1])
+
+    def on(self, name: str):
+        """Декоратор: что сделать в этом процессе, когда другой процесс опубликовал name"""
+        def decorator(func):
+            self._handlers[name] = func
+            return func
+        return decorator
+
+    def share_methods(self, name: str, instance, *methods: str):
+        """Методы объекта-кэша (индекс кланов, кулдауны) повторяются во всех процессах"""
+        for method in methods:
+            setattr(instance, method, self.shared(f"{name}.{method}")(getattr(instance, method)))
+
+    @contextlib.contextmanager
+    def local(self):
+        """Изменения внутри блока остаются в этом процессе (загрузка кэшей при запуске)"""
+        nested = self._nested
+        self._nested = True
+        try:
+            yield
+        finally:
+            self._nested = nested
+
+    def publish(self, name: str, args: tuple):
+        if self._writer is not None:
+            self._writer.write(_encode({"s": [name, list(args)]}))
+
+    def _replay(self, name: str, args: list):
+        handler = self._handlers.get(name)
+        if handler is None:
+            print(f"❌ Неизвестное общее изменение {name}")
+            return
+        with self.local():
+            handler(*args)
+
+    def _enqueue(self, event: dict, process_event):
+        user_id = event_user_id(event)
+        queue = self._users.get(user_id)
+        if queue is not None:
+            queue.append(event)
+            return
+        self._users[user_id] = deque([event])
+        # Остановка процесса дождется очереди игрока (до срока SHUTDOWN_DRAIN_TIMEOUT)
+        lifecycle.track(self._drain_user(user_id, process_event))
+
+    async def _drain_user(self, user_id: int, process_event):
+        queue = self._users[user_id]
+        while queue:
+            try:
+                await process_event(queue[0])
+            except Exception as e:
+                print(f"❌ Ошибка обработки события в процессе {self.index}: {e}")
+            queue.popleft()
+        del self._users[user_id]
+
+    async def serve(self, sock: socket.socket, worker_main):
+        """Цикл процесса-шарда: worker_main() готовит бота и возвращает process_event(event)"""
+        reader, self._writer = await asyncio.open_connection(sock=sock)
+        process_event = await worker_main()
+
+        while True:
+            message = await _read(reader)
+            if message is None:
+                break
+            if "e" in message:
+                self._enqueue(message["e"], process_event)
+            elif "s" in message:
+                self._replay(*message["s"])
+            elif "r" in message:
+                # Обработка событий не ждет ответа на запрос
+                lifecycle.track(self._answer(*message["r"]))
+            elif "a" in message:
+                self._acknowledge(*message["a"])
+
+        # Супервизор закрыл канал: принятые события дообработает lifecycle.shutdown()
+        self._writer.close()
+        self._writer = None
+
+
+shard = ShardChannel()
+
+
+def _worker_process(index: int, shards: int, sock: socket.socket, inherited: list, worker_main):
+    for other in inherited:
+        other.close()
+    shard.index = index
+    shard.shards = shards
+    # Лимит VK на сообщения общий для всех процессов
+    outbox.share(shards)
+    # Процесс останавливает супервизор, закрывая канал: SIGTERM всей группе
+    # процессов не должен прервать обработку и пакетную запись
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve_worker(sock, worker_main))
+
+
+async def _serve_worker(sock: socket.socket, worker_main):
+    await shard.serve(sock, worker_main)
+    await lifecycle.shutdown()
+
+
+class ShardSupervisor:
+    """Запускает процессы-шарды и раздает им события по user_id"""
+
+    def __init__(self, shards: int = None):
+        self.shards = shards or settings.SHARD_WORKERS
+        self.processes: list = []
+        self.dispatched = 0
+        self._sockets: list = []
+        self._writers: list = []
+        self._relays: list = []
+        self._stopping = False
+        self._failed: asyncio.Event | None = None
+        # Прием событий и сигналы супервизора; у процессов-шардов свой lifecycle
+        self.lifecycle = Lifecycle()
+
+    def start(self, worker_main):
+        """Запуск процессов (до asyncio.run: процессы создаются через fork)"""
+        context = multiprocessing.get_context("fork")
+        for index in range(self.shards):
+            parent, child = socket.socketpair()
+            process = context.Process(
+                target=_worker_process,
+                args=(index, self.shards, child, list(self._sockets) + [parent], worker_main),
+                name=f"bot-shard-{index}",
+                daemon=True,
+            )
+            process.start()
+            child.close()
+            self._sockets.append(parent)
+            self.processes.append(process)
+
+    async def connect(self):
+        self._failed = asyncio.Event()
+        for index, sock in enumerate(self._sockets):
+            reader, writer = await asyncio.open_connection(sock=sock)
+            self._writers.append(writer)
+            self._relays.append(asyncio.create_task(self._relay(index, reader)))
+
+    async def _relay(self, index: int, reader: asyncio.StreamReader):
+        """Изменения кэшей от процесса index - всем остальным процессам"""
+        while True:
+            message = await _read(reader)
+            if message is None:
+                break
+            frame = _encode(message)
+            for other, writer in enumerate(self._writers):
+                if other != index:
+                    writer.write(frame)
+
+        if not self._stopping:
+            print(f"❌ Процесс бота {index} завершился")
+            self._failed.set()
+
+    async def dispatch(self, event: dict):
+        """Отправить событие процессу его игрока (повторно доставленные VK - отбросить)"""
+        # Повторы отсеиваются здесь, до пересылки: Bot в процессах-шардах
+        # создается без event_deduplicator
+        if not event_deduplicator.is_new(event):
+            return
+        writer = self._writers[shard_of(event_user_id(event), self.shards)]
+        writer.write(_encode({"e": event}))
+        self.dispatched += 1
+        await writer.drain()
+
+    async def stop(self):
+        """Закрыть каналы и дождаться, пока процессы доделают принятые события"""
+        self._stopping = True
+        for writer in self._writers:
+            writer.close()
+        loop = asyncio.get_running_loop()
+        for process in self.processes:
+            await loop.run_in_executor(None, process.join)
+        for relay in self._relays:
+            relay.cancel()
+
+    async def _run(self, intake):
+        await self.connect()
+        self.lifecycle.install_signal_handlers()
+        intake_task = self.lifecycle.intake("события VK", intake(self.dispatch))
+        failed = asyncio.create_task(self._failed.wait())
+        # До SIGTERM или остановки приема событий
+        stop = asyncio.create_task(self.lifecycle.wait())
+        await asyncio.wait((stop, failed), return_when=asyncio.FIRST_COMPLETED)
+
+        if failed.done():
+            stop.cancel()
+            intake_task.cancel()
+            for process in self.processes:
+                process.terminate()
+            raise RuntimeError("Процесс бота завершился, перезапустите бота")
+
+        failed.cancel()
+        # Сначала прием событий (Callback API дообрабатывает свою очередь),
+        # затем каналы - процессы доделают принятое и сохранят пакеты
+        intake_task.cancel()
+        await asyncio.gather(intake_task, return_exceptions=True)
+        await self.stop()
+
+    def run(self, worker_main, intake):
+        """worker_main() - подготовка бота в процессе; intake(dispatch) - источник событий"""
+        self.start(worker_main)
+        asyncio.run(self._run(intake))
+
+
+def polling_intake(polling):
+    """События из long poll (polling = bot.polling)"""
+    async def intake(dispatch):
+        async for event in polling.listen():
+            for update in event.get("updates", []):
+                await dispatch(update)
+    return intake
+
+
+def callback_intake(server):
+    """События из Callback API (server = callback_server)"""
+    async def intake(dispatch):
+        await server.start(dispatch)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop(settings.SHUTDOWN_DRAIN_TIMEOUT)
+    return intake
+
+
+# В основном файле бота при SHARD_WORKERS > 1 нужно будет запускать так
+# (без asyncio.run вокруг):
+# async def worker_main():
+#     bot = Bot(settings.BOT_TOKEN)  # повторы VK уже отсеяны в ShardSupervisor.dispatch
+#     await configure_shared_writes()
+#     ...  # то же, что сейчас в main(), кроме запуска polling/Callback API;
+#          # фоновые задачи на всю базу (автоочистка логов) - только в shard.index == 0
+#     return lambda event: bot.process_event(event, bot.api)
+#
+# ShardSupervisor().run(worker_main, polling_intake(Bot(settings.BOT_TOKEN).polling))
+# SIGTERM получает супервизор; процессы останавливаются через lifecycle.shutdown()
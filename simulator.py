@@ -0,0 +1,312 @@
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from bot.core.config import GameSettings, settings
+from bot.db import LIFT_CLAN_BATCH_ROWS, LIFT_PLAYER_BATCH_ROWS, build_delta_update
+from bot.services.clan_bonuses import get_clan_bonuses
+from bot.services.lift_pipeline import get_lift_reward
+
+# ======================
+# ОФЛАЙН-СИМУЛЯТОР ЭКОНОМИКИ
+# ======================
+# Запуск: python -m bot.services.simulator --players 1000 --days 14
+#
+# Берет настоящие настройки игры (гантели, бизнесы, кулдаун), доход за подход
+# (get_lift_reward) и бонусы кланов, прогоняет синтетических игроков по часам
+# и пишет итог каждого часа во временную SQLite запросами build_delta_update -
+# теми же, что строит пайплайн поднятий. Час игрока считается одним шагом
+# (подходы за час умножаются), поэтому скорость симуляции - это объем
+# модельной экономики, а не пропускная способность обработчика "Поднять":
+# ее меряет benchmarks.py.
+
+# Поведение игроков (допущения модели, не настройки игры)
+ACTIVE_HOURS_PER_DAY = (1, 4)   # сколько часов в день игрок поднимает гантелю
+CLAN_MEMBER_SHARE = 0.5         # доля игроков в кланах
+PLAYERS_PER_CLAN = 20
+CLAN_DEPOSIT_SHARE = 0.1        # какую часть дохода участник кладет в казну
+BUSINESS_RESERVE = 0.5          # тратим на бизнес, только если после покупки остается столько от цены
+BUSINESS_MAX_UPGRADES = 5
+
+PLAYER_COLUMNS = ("balance", "magnesia", "power", "total_lifts", "total_earned", "total_spent")
+
+
+class SimPlayer:
+    __slots__ = (
+        "user_id", "clan_id", "active_hours", "dumbbell_level",
+        "balance", "magnesia", "power", "total_lifts", "total_earned", "total_spent",
+        "businesses", "deltas",
+    )
+
+    def __init__(self, user_id: int, clan_id: int | None, active_hours: set):
+        self.user_id = user_id
+        self.clan_id = clan_id
+        self.active_hours = active_hours
+        self.dumbbell_level = 1
+        self.balance = 0
+        self.magnesia = 0
+        self.power = 0
+        self.total_lifts = 0
+        self.total_earned = 0
+        self.total_spent = 0
+        # business_id -> число улучшений
+        self.businesses: dict[int, int] = {}
+        # Изменения за текущий час, которые уйдут в базу
+        self.deltas = [0] * len(PLAYER_COLUMNS)
+
+    def add(self, column: str, amount: int):
+        setattr(self, column, getattr(self, column) + amount)
+        self.deltas[PLAYER_COLUMNS.index(column)] += amount
+
+
+class Simulation:
+    """Синтетические игроки и кланы, шаг - один час"""
+
+    def __init__(self, game: GameSettings, players: int, seed: int, db_path: str):
+        self.game = game
+        self.rng = random.Random(seed)
+        self.lifts_per_hour = 3600 // game.DUMBBELL_COOLDOWN
+        self.max_dumbbell = max(game.DUMBBELL_LEVELS)
+
+        clans = max(1, int(players * CLAN_MEMBER_SHARE) // PLAYERS_PER_CLAN)
+        self.clan_treasury = {clan_id: 0 for clan_id in range(1, clans + 1)}
+        self.clan_level = {clan_id: 1 for clan_id in self.clan_treasury}
+        self.clan_deltas = {clan_id: [0, 0] for clan_id in self.clan_treasury}
+
+        self.players = []
+        for user_id in range(1, players + 1):
+            in_clan = self.rng.random() < CLAN_MEMBER_SHARE
+            hours = self.rng.randint(*ACTIVE_HOURS_PER_DAY)
+            self.players.append(SimPlayer(
+                user_id,
+                self.rng.randint(1, clans) if in_clan else None,
+                set(self.rng.sample(range(24), hours)),
+            ))
+
+        self.conn = sqlite3.connect(db_path, isolation_level=None)
+        self._create_schema()
+
+        self.lifts = 0
+        self.sim_seconds = 0.0
+        self.db_seconds = 0.0
+        self.db_rows = 0
+
+    def _create_schema(self):
+        self.conn.executescript("""
+        CREATE TABLE players (
+            user_id INTEGER PRIMARY KEY, clan_id INTEGER,
+            balance INTEGER DEFAULT 0, magnesia INTEGER DEFAULT 0, power INTEGER DEFAULT 0,
+            total_lifts INTEGER DEFAULT 0, total_earned INTEGER DEFAULT 0, total_spent INTEGER DEFAULT 0,
+            dumbbell_level INTEGER DEFAULT 1
+        );
+        CREATE TABLE clans (id INTEGER PRIMARY KEY, treasury INTEGER DEFAULT 0, total_lifts INTEGER DEFAULT 0);
+        """)
+        self.conn.executemany(
+            "INSERT INTO players (user_id, clan_id) VALUES (?, ?)",
+            ((player.user_id, player.clan_id) for player in self.players),
+        )
+        self.conn.executemany("INSERT INTO clans (id) VALUES (?)", ((clan_id,) for clan_id in self.clan_treasury))
+
+    # ======================
+    # ИГРОВЫЕ ДЕЙСТВИЯ
+    # ======================
+
+    def _business_income(self, business_id: int, upgrades: int) -> int:
+        business = self.game.BUSINESSES[business_id]
+        return business["base_income"] + upgrades * business["income_increase"]
+
+    def _pay(self, player: SimPlayer, currency: str, amount: int) -> bool:
+        column = "magnesia" if "магнези" in currency else "balance"
+        if getattr(player, column) < amount:
+            return False
+        player.add(column, -amount)
+        if column == "balance":
+            player.add("total_spent", amount)
+        return True
+
+    def _lift_hour(self, player: SimPlayer):
+        income_per_use, power_per_use = get_lift_reward({"dumbbell_level": player.dumbbell_level})
+        lifts = self.lifts_per_hour
+        income = lifts * income_per_use
+
+        player.add("balance", income)
+        player.add("power", lifts * power_per_use)
+        player.add("total_lifts", lifts)
+        player.add("total_earned", income)
+        self.lifts += lifts
+
+        if player.clan_id:
+            bonus = lifts * get_clan_bonuses(self.clan_level[player.clan_id])["lift_bonus_coins"]
+            self._to_treasury(player.clan_id, bonus, lifts)
+
+            deposit = int(income * CLAN_DEPOSIT_SHARE)
+            if deposit and self._pay(player, "монет", deposit):
+                self._to_treasury(player.clan_id, deposit, 0)
+
+    def _to_treasury(self, clan_id: int, amount: int, lifts: int):
+        self.clan_treasury[clan_id] += amount
+        self.clan_deltas[clan_id][0] += amount
+        self.clan_deltas[clan_id][1] += lifts
+
+    def _business_hour(self, player: SimPlayer):
+        for business_id, upgrades in player.businesses.items():
+            income = self._business_income(business_id, upgrades)
+            player.add("magnesia", income)
+            if player.clan_id:
+                percent = get_clan_bonuses(self.clan_level[player.clan_id])["business_bonus_percent"]
+                self._to_treasury(player.clan_id, income * percent // 100, 0)
+
+    def _spend(self, player: SimPlayer):
+        # Гантели - жадно, как только хватает на следующую
+        while player.dumbbell_level < self.max_dumbbell:
+            price = self.game.DUMBBELL_LEVELS[player.dumbbell_level + 1]["price"]
+            if not self._pay(player, "монет", price):
+                break
+            player.dumbbell_level += 1
+
+        for business_id, business in self.game.BUSINESSES.items():
+            if business_id not in player.businesses:
+                price = business["base_price"]
+                reserve = int(price * BUSINESS_RESERVE)
+                column = "magnesia" if "магнези" in business["currency"] else "balance"
+                if getattr(player, column) >= price + reserve and self._pay(player, business["currency"], price):
+                    player.businesses[business_id] = 0
+            elif player.businesses[business_id] < BUSINESS_MAX_UPGRADES:
+                if self._pay(player, business["upgrade_currency"], business["upgrade_price"]):
+                    player.businesses[business_id] += 1
+
+    def _upgrade_clans(self):
+        for clan_id, treasury in self.clan_treasury.items():
+            cost = self.game.CLAN_UPGRADE_BASE_COST * self.clan_level[clan_id]
+            if treasury >= cost * 2:
+                self._to_treasury(clan_id, -cost, 0)
+                self.clan_level[clan_id] += 1
+
+    # ======================
+    # ЗАПИСЬ В БАЗУ
+    # ======================
+
+    def _execute_delta_update(self, table: str, key: str, columns: tuple, batch: list):
+        query, params = build_delta_update(table, key, columns, batch)
+        self.conn.execute(query.replace("%s", "?"), params)
+
+    def _flush(self):
+        started = time.perf_counter()
+
+        players = [(player.user_id, player.deltas) for player in self.players if any(player.deltas)]
+        clans = [(clan_id, deltas) for clan_id, deltas in self.clan_deltas.items() if any(deltas)]
+
+        self.conn.execute("BEGIN")
+        for start in range(0, len(players), LIFT_PLAYER_BATCH_ROWS):
+            batch = players[start:start + LIFT_PLAYER_BATCH_ROWS]
+            self._execute_delta_update("players", "user_id", PLAYER_COLUMNS, batch)
+        for start in range(0, len(clans), LIFT_CLAN_BATCH_ROWS):
+            batch = clans[start:start + LIFT_CLAN_BATCH_ROWS]
+            self._execute_delta_update("clans", "id", ("treasury", "total_lifts"), batch)
+        self.conn.execute("COMMIT")
+
+        for _, deltas in players:
+            deltas[:] = [0] * len(PLAYER_COLUMNS)
+        for _, deltas in clans:
+            deltas[:] = [0, 0]
+
+        self.db_rows += len(players) + len(clans)
+        self.db_seconds += time.perf_counter() - started
+
+    # ======================
+    # ПРОГОН
+    # ======================
+
+    def run_hour(self, hour: int):
+        started = time.perf_counter()
+        for player in self.players:
+            if hour in player.active_hours:
+                self._lift_hour(player)
+            self._business_hour(player)
+            self._spend(player)
+        self._upgrade_clans()
+        self.sim_seconds += time.perf_counter() - started
+
+        self._flush()
+
+    def day_stats(self, day: int) -> dict:
+        balances = sorted(player.balance for player in self.players)
+        return {
+            "day": day,
+            "median_balance": int(statistics.median(balances)),
+            "p90_balance": balances[int(len(balances) * 0.9)],
+            "money_supply": sum(balances),
+            "magnesia": sum(player.magnesia for player in self.players),
+            "avg_dumbbell": statistics.fmean(player.dumbbell_level for player in self.players),
+            "max_dumbbell_share": sum(p.dumbbell_level == self.max_dumbbell for p in self.players) / len(self.players),
+            "business_owners": {
+                business_id: sum(business_id in p.businesses for p in self.players) / len(self.players)
+                for business_id in self.game.BUSINESSES
+            },
+            "clan_treasury": sum(self.clan_treasury.values()),
+            "avg_clan_level": statistics.fmean(self.clan_level.values()),
+        }
+
+    def check_db(self) -> bool:
+        """Итоги в базе совпадают с состоянием в памяти"""
+        db_balance, db_lifts = self.conn.execute("SELECT SUM(balance), SUM(total_lifts) FROM players").fetchone()
+        db_treasury = self.conn.execute("SELECT SUM(treasury) FROM clans").fetchone()[0]
+        return (
+            db_balance == sum(player.balance for player in self.players)
+            and db_lifts == self.lifts
+            and db_treasury == sum(self.clan_treasury.values())
+        )
+
+
+def print_curves(rows: list, businesses: dict):
+    business_headers = "".join(f" биз{business_id:>2}" for business_id in businesses)
+    print(
+        f"{'день':>4} {'медиана':>10} {'p90':>10} {'монет всего':>14} {'магнезия':>12} "
+        f"{'гантеля':>7} {'макс.':>6}{business_headers} {'казна':>12} {'ур.клана':>8}"
+    )
+    for row in rows:
+        owners = "".join(f" {share:5.0%}" for share in row["business_owners"].values())
+        print(
+            f"{row['day']:>4} {row['median_balance']:>10,} {row['p90_balance']:>10,} "
+            f"{row['money_supply']:>14,} {row['magnesia']:>12,} {row['avg_dumbbell']:>7.1f} "
+            f"{row['max_dumbbell_share']:>6.0%}{owners} {row['clan_treasury']:>12,} {row['avg_clan_level']:>8.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн-симуляция экономики Gym Legend")
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # Те же настройки, что у бота (get_lift_reward читает их же)
+    game = settings
+
+    with tempfile.TemporaryDirectory() as tmp:
+        simulation = Simulation(game, args.players, args.seed, os.path.join(tmp, "simulation.db"))
+
+        rows = []
+        for day in range(1, args.days + 1):
+            for hour in range(24):
+                simulation.run_hour(hour)
+            rows.append(simulation.day_stats(day))
+
+        consistent = simulation.check_db()
+        simulation.conn.close()
+
+    print_curves(rows, game.BUSINESSES)
+    print()
+    print(f"Модельных поднятий: {simulation.lifts:,}")
+    print(f"Объем симуляции: {simulation.lifts / simulation.sim_seconds:,.0f} модельных поднятий/с "
+          f"(по часам, не скорость обработчика)")
+    print(f"Запись в SQLite: {simulation.db_rows / simulation.db_seconds:,.0f} строк/с")
+    print(f"База совпадает с памятью: {'да' if consistent else 'НЕТ'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,4 @@
 import re
-from datetime import datetime
 
 from vkbottle.bot import BotLabeler, Message
 
@@ -7,16 +6,21 @@ from bot.core.config import settings
 from bot.db import (
     create_player,
     get_player,
-    get_player_clan,
+    get_player_card,
+    invalidate_player_card,
     update_player_balance,
     update_username,
     set_info_access,  # Добавим эту функцию
     get_info_access_status,  # И эту
     remove_info_access,  # И эту
+    schedule_username_rewrite,
 )
-from bot.services.clans import (
-    get_clan_bonuses,
-)
+from bot.models import days_since, format_ts
+from bot.services.clan_bonuses import get_clan_bonuses
+from bot.services.lift_pipeline import with_pending_lifts
+from bot.services.menu_assets import menu_assets
+from bot.services.outbox import reply
+from bot.services.player_table import player_table
 from bot.services.users import is_admin
 from bot.utils import format_number, pointer_to_screen_name
 
@@ -44,20 +48,18 @@ async def player_info_handler(message: Message, cmd_args: str):
     except ValueError:
         return "❌ Айди игрока должно быть числом!"
 
-    target_player = await get_player(target_id)
+    # Игрок и его клан одним запросом
+    target_player = with_pending_lifts(await get_player_card(target_id))
 
     if not target_player:
         return "❌ Игрок с таким айди не найден!"
 
-    # Получаем информацию о клане игрока
-    clan = await get_player_clan(target_id)
-
     # Форматируем даты
-    created_date = datetime.fromisoformat(target_player["created_at"]).strftime("%d.%m.%Y %H:%M")
+    created_date = format_ts(target_player["created_at"], "%d.%m.%Y %H:%M")
     last_active = target_player.get("last_active")
     if last_active:
-        last_active_date = datetime.fromisoformat(last_active).strftime("%d.%m.%Y %H:%M")
-        days_inactive = (datetime.now() - datetime.fromisoformat(last_active)).days
+        last_active_date = format_ts(last_active, "%d.%m.%Y %H:%M")
+        days_inactive = days_since(last_active)
         if days_inactive == 0:
             last_active_text = f"{last_active_date} (сегодня)"
         else:
@@ -103,15 +105,15 @@ async def player_info_handler(message: Message, cmd_args: str):
         f"⚖️ Доход за подход: {income_per_use}\n"
     )
 
-    if clan:
+    if target_player["clan_tag"]:
         info_text += (
             f"\n🏰 Клан:\n"
-            f"🛡️ Название: [{clan['tag']}] {clan['name']}\n"
-            f"🛡️ Уровень клана: {clan['level']}\n"
+            f"🛡️ Название: [{target_player['clan_tag']}] {target_player['clan_name']}\n"
+            f"🛡️ Уровень клана: {target_player['clan_level']}\n"
             f"🛡️ Вклад в казну: {format_number(target_player.get('clan_contributions', 0))} монет\n"
         )
 
-    await message.answer(info_text, disable_mentions=True)
+    await reply(message, info_text, disable_mentions=True)
 
 
 # ======================
@@ -184,6 +186,7 @@ async def transfer_money_handler(message: Message, cmd_args: str):
             None,
             target_id,
         )
+        player_table.add(user_id, balance=-amount)
 
         # Зачисляем деньги получателю (за вычетом комиссии)
         await update_player_balance(
@@ -194,6 +197,9 @@ async def transfer_money_handler(message: Message, cmd_args: str):
             None,
             user_id,
         )
+        player_table.add(target_id, balance=net_amount)
+        invalidate_player_card(user_id)
+        invalidate_player_card(target_id)
 
         response_text = (
             f"💸 Перевод выполнен успешно!\n\n"
@@ -205,7 +211,7 @@ async def transfer_money_handler(message: Message, cmd_args: str):
             f"🏦 Ваш баланс: {format_number(player['balance'] - amount)} монет\n\n"
             f"✅ Деньги успешно переведены!"
         )
-        await message.answer(response_text, disable_mentions=True)
+        await reply(message, response_text, disable_mentions=True)
     except Exception as e:
         return f"❌ Ошибка при выполнении перевода: {str(e)}"
 
@@ -223,6 +229,7 @@ async def welcome_handler(message: Message):
     player = await get_player(user_id)
     if not player:
         player = await create_player(user_id, str(user_id))
+        player_table.upsert(player)
 
     welcome_text = (
         f"👋Привет! [id{user_id}|{player['username']}], ты попал в \n"
@@ -240,14 +247,15 @@ async def welcome_handler(message: Message):
         f"👨‍💻 Напиши команду Помощь, чтобы узнать все команды подробнее. Удачи в развитии! 🫶"
     )
 
-    await message.answer(welcome_text, disable_mentions=True)
+    await reply(message, welcome_text, disable_mentions=True)
 
 
 @user_labeler.message(text=["профиль", "/профиль"])
 async def get_profile_handler(message: Message):
     """Профиль игрока"""
     user_id = message.from_id
-    player = await get_player(user_id)
+    # Игрок и его клан одним запросом
+    player = with_pending_lifts(await get_player_card(user_id))
 
     if not player:
         return "❌ Игрок не найден"
@@ -261,17 +269,16 @@ async def get_profile_handler(message: Message):
         income_note = f"💰 Доход за подход: {income_per_use} монет\n"
 
     # Добавляем информацию о бонусах клана
-    clan = await get_player_clan(user_id)
     clan_info = ""
     clan_bonus_text = ""
-    if clan:
-        clan_bonuses = get_clan_bonuses(clan["level"])
-        clan_info = f"🏰 Клан: [{clan['tag']}] {clan['name']}\n"
+    if player["clan_tag"]:
+        clan_bonuses = get_clan_bonuses(player["clan_level"])
+        clan_info = f"🏰 Клан: [{player['clan_tag']}] {player['clan_name']}\n"
         clan_bonus_text = (
             f"🏰 Бонус клана: +{clan_bonuses['lift_bonus_coins']} монет за поднятие\n"
         )
 
-    created_date = datetime.fromisoformat(player["created_at"]).strftime("%d.%m.%Y")
+    created_date = format_ts(player["created_at"], "%d.%m.%Y")
 
     admin_level = player.get("admin_level", 0)
     if admin_level > 0:
@@ -294,65 +301,73 @@ async def get_profile_handler(message: Message):
         f"📅 Дата регистрации: {created_date}"
     )
 
-    await message.answer(profile_text, disable_mentions=True)
+    await reply(message, profile_text, disable_mentions=True)
 
 
 @user_labeler.message(text=["баланс", "/баланс"])
 async def get_balance_handler(message: Message):
     """Баланс игрока"""
     user_id = message.from_id
-    player = await get_player(user_id)
+    player = with_pending_lifts(await get_player(user_id))
 
     return f"💰 Ваш баланс: {format_number(player['balance'])} монет"
 
 
+# Строки справки по командам
+HELP_COMMANDS = (
+    "🏋️‍♂️ Gym Legend - Доступные команды:\n",
+    "📊 Профиль и информация:",
+    "📒 Профиль - ваш профиль",
+    "📒 Баланс - текущий баланс\n",
+    "💪 Гантели:",
+    "♦️ Гантеля - информация о гантеле",
+    "♦️ Поднять - поднять гантелю",
+    "♦️ Прокачаться - улучшить гантелю",
+    "♦️ Магазин - магазин гантелей\n",
+    "🏢 Бизнес системы:",
+    "🌟 Б - список ваших бизнесов",
+    "🌟 Б [номер] - информация о бизнесе",
+    "🌟 Б магазин - магазин бизнесов",
+    "🌟 Б [номер] купить - купить бизнес",
+    "🌟 Б [номер] [1-5] улучшить - улучшить бизнес\n",
+    "🏰 Кланы (НОВАЯ СИСТЕМА):",
+    "🗡️ К создать [ТЭГ] [название] - создать клан (1000 монет)",
+    "🗡️ К улучшить - улучшить уровень клана",
+    "🗡️ К казна - посмотреть казну клана",
+    "🗡️ К профиль - информация о клане",
+    "🗡️ К топ - топ кланов",
+    "🗡️ К положить [сумма] - положить деньги в казну",
+    "🗡️ К распределить всем [сумма] - распределить казну\n",
+    "💸 Перевод денег:",
+    "💚 Перевод [айди] [сумма] - перевести деньги",
+    "💚 Перевести [айди] [сумма] - перевести деньги\n",
+    "🎫 Промокоды:",
+    "👑 Промо [код] - активировать промокод\n",
+    "🏆 Рейтинги:",
+    "🥇 Топ - общий список рейтингов",
+    "🥇 Топ монет - топ по балансу",
+    "🥇 Топ поднятий - топ по поднятиям",
+    "🥇 Топ заработка - топ по заработку",
+)
+
+
+def build_help_text(admin_level: int, has_info_access: bool, owner: int) -> str:
+    """Справка по командам (собирается один раз на каждый вариант доступа)"""
+    commands = list(HELP_COMMANDS)
+    if has_info_access:
+        commands.insert(3, "📒 Инфа [айди] - полная информация об игроке (VIP доступ)")
+    return "\n".join(commands)
+
+
+menu_assets.register("help", build_help_text, info_access=True)
+
+
 @user_labeler.message(text=["помощь", "/помощь"])
 async def get_help_handler(message: Message):
     """Справка по командам"""
-    commands = [
-        "🏋️‍♂️ Gym Legend - Доступные команды:\n",
-        "📊 Профиль и информация:",
-        "📒 Профиль - ваш профиль",
-        "📒 Баланс - текущий баланс\n",
-        "💪 Гантели:",
-        "♦️ Гантеля - информация о гантеле",
-        "♦️ Поднять - поднять гантелю",
-        "♦️ Прокачаться - улучшить гантелю",
-        "♦️ Магазин - магазин гантелей\n",
-        "🏢 Бизнес системы:",
-        "🌟 Б - список ваших бизнесов",
-        "🌟 Б [номер] - информация о бизнесе",
-        "🌟 Б магазин - магазин бизнесов",
-        "🌟 Б [номер] купить - купить бизнес",
-        "🌟 Б [номер] [1-5] улучшить - улучшить бизнес\n",
-        "🏰 Кланы (НОВАЯ СИСТЕМА):",
-        "🗡️ К создать [ТЭГ] [название] - создать клан (1000 монет)",
-        "🗡️ К улучшить - улучшить уровень клана",
-        "🗡️ К казна - посмотреть казну клана",
-        "🗡️ К профиль - информация о клане",
-        "🗡️ К топ - топ кланов",
-        "🗡️ К положить [сумма] - положить деньги в казну",
-        "🗡️ К распределить всем [сумма] - распределить казну\n",
-        "💸 Перевод денег:",
-        "💚 Перевод [айди] [сумма] - перевести деньги",
-        "💚 Перевести [айди] [сумма] - перевести деньги\n",
-        "🎫 Промокоды:",
-        "👑 Промо [код] - активировать промокод\n",
-        "🏆 Рейтинги:",
-        "🥇 Топ - общий список рейтингов",
-        "🥇 Топ монет - топ по балансу",
-        "🥇 Топ поднятий - топ по поднятиям",
-        "🥇 Топ заработка - топ по заработку",
-    ]
-    
     # Проверяем, есть ли у пользователя доступ к команде инфа
-    user_id = message.from_id
-    has_access = await get_info_access_status(user_id)
-    
-    if has_access:
-        commands.insert(3, "📒 Инфа [айди] - полная информация об игроке (VIP доступ)")
-
-    return "\n".join(commands)
+    has_access = await get_info_access_status(message.from_id)
+    return menu_assets.get("help", has_info_access=has_access)
 
 
 @user_labeler.message(text=["магазин", "/магазин"])
@@ -363,6 +378,7 @@ async def get_dumbbell_shop_handler(message: Message):
 
     if not player:
         player = await create_player(user_id, str(message.from_id))
+        player_table.upsert(player)
 
     current_level = player["dumbbell_level"]
 
@@ -435,5 +451,9 @@ async def change_username_handler(message: Message, cmd_args: str):
         return "❌ Ник содержит недопустимые символы!\n✅ Разрешены: буквы, цифры, пробелы, дефисы, подчеркивания"
 
     await update_username(user_id, new_username)
+    player_table.update(user_id, username=new_username)
+    invalidate_player_card(user_id)
+    # Ник хранится в логах клана - обновляем их в фоне
+    schedule_username_rewrite(user_id, new_username)
 
     return f"✅ Ваш ник изменен на: {new_username}"
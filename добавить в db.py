@@ -1,5 +1,17 @@
+import asyncio
+import heapq
 import json
-from datetime import datetime, timedelta
+import re
+import sqlite3
+import time
+import zlib
+from collections import deque
+from datetime import datetime
+
+from bot.core.config import settings
+from bot.models import SECONDS_PER_DAY, PlayerCard, now_ts, to_ts
+from bot.services.lifecycle import lifecycle
+from bot.services.sharding import shard
 
 # ======================
 # ФУНКЦИИ ДЛЯ РАБОТЫ С ЛОГАМИ
@@ -16,10 +28,12 @@ async def add_admin_log(
     """Добавление записи в логи администратора"""
     query = """
     INSERT INTO admin_logs 
-    (user_id, admin_name, admin_level, action_type, details, log_type)
-    VALUES (%s, %s, %s, %s, %s, %s)
+    (user_id, admin_name, admin_level, action_type, details, log_type, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
     """
-    await db.execute(query, user_id, admin_name, admin_level, action_type, details, log_type)
+    await db.execute(
+        query, user_id, admin_name, admin_level, action_type, details, log_type, now_ts()
+    )
     return True
 
 
@@ -51,9 +65,9 @@ async def cleanup_old_logs(days: int = 15) -> int:
     """Очистка старых логов"""
     query = """
     DELETE FROM admin_logs 
-    WHERE created_at < DATE_SUB(NOW(), INTERVAL %s DAY)
+    WHERE created_at < %s
     """
-    result = await db.execute(query, days)
+    result = await db.execute(query, now_ts() - days * SECONDS_PER_DAY)
     return result.rowcount
 
 
@@ -73,8 +87,8 @@ async def create_request(
     """Создание заявки"""
     query = """
     INSERT INTO admin_requests 
-    (id, admin_id, admin_name, request_type, target_id, reason, additional_info)
-    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    (id, admin_id, admin_name, request_type, target_id, reason, additional_info, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
     """
     
     additional_info_json = json.dumps(additional_info) if additional_info else None
@@ -82,7 +96,7 @@ async def create_request(
     try:
         await db.execute(
             query, request_id, admin_id, admin_name, request_type, 
-            target_id, reason, additional_info_json
+            target_id, reason, additional_info_json, now_ts()
         )
         return {"success": True, "request_id": request_id}
     except Exception as e:
@@ -117,12 +131,12 @@ async def approve_request(request_id: int, approved_by: int) -> dict:
     """Подтверждение заявки"""
     query = """
     UPDATE admin_requests 
-    SET status = 'approved', approved_by = %s, approved_at = NOW()
+    SET status = 'approved', approved_by = %s, approved_at = %s
     WHERE id = %s AND status = 'pending'
     """
     
     try:
-        result = await db.execute(query, approved_by, request_id)
+        result = await db.execute(query, approved_by, now_ts(), request_id)
         if result.rowcount > 0:
             return {"success": True}
         else:
@@ -137,7 +151,7 @@ async def reject_request(request_id: int, rejected_by: int, reason: str = None)
     UPDATE admin_requests 
     SET status = 'rejected', 
         approved_by = %s, 
-        approved_at = NOW(),
+        approved_at = %s,
         additional_info = JSON_SET(
             COALESCE(additional_info, '{}'), 
             '$.reject_reason', %s
@@ -146,7 +160,9 @@ async def reject_request(request_id: int, rejected_by: int, reason: str = None)
     """
     
     try:
-        result = await db.execute(query, rejected_by, reason or "Отклонено администратором", request_id)
+        result = await db.execute(
+            query, rejected_by, now_ts(), reason or "Отклонено администратором", request_id
+        )
         if result.rowcount > 0:
             return {"success": True}
         else:
@@ -166,10 +182,10 @@ async def cleanup_old_requests(days: int = 15) -> int:
     """Очистка старых заявок"""
     query = """
     DELETE FROM admin_requests 
-    WHERE created_at < DATE_SUB(NOW(), INTERVAL %s DAY) 
+    WHERE created_at < %s 
     AND status != 'pending'
     """
-    result = await db.execute(query, days)
+    result = await db.execute(query, now_ts() - days * SECONDS_PER_DAY)
     return result.rowcount
 
 
@@ -245,10 +261,10 @@ async def update_admin_usage_stats(admin_id: int, stat_type: str, value: int = 1
     VALUES (%s, %s, %s, %s)
     ON DUPLICATE KEY UPDATE 
     stat_value = stat_value + VALUES(stat_value),
-    updated_at = NOW()
+    updated_at = %s
     """
     
-    await db.execute(query, admin_id, stat_type, value, today)
+    await db.execute(query, admin_id, stat_type, value, today, now_ts())
     return True
 
 
@@ -263,24 +279,20 @@ async def get_broadcast_usage(admin_id: int) -> dict:
     
     if not result:
         # Создаем запись если нет
-        await reset_broadcast_usage(admin_id)
+        next_reset = await reset_broadcast_usage(admin_id)
         return {
             "usage_count": 0,
-            "last_used": datetime.now(),
-            "reset_time": datetime.now() + timedelta(days=1)
+            "last_used": now_ts(),
+            "reset_time": next_reset
         }
     
     # Проверяем нужно ли сбросить счетчик (прошло 24 часа)
-    reset_time = result["reset_time"]
-    if isinstance(reset_time, str):
-        reset_time = datetime.fromisoformat(reset_time.replace('Z', '+00:00'))
-    
-    if datetime.now() > reset_time:
-        await reset_broadcast_usage(admin_id)
+    if now_ts() > to_ts(result["reset_time"]):
+        next_reset = await reset_broadcast_usage(admin_id)
         return {
             "usage_count": 0,
-            "last_used": datetime.now(),
-            "reset_time": datetime.now() + timedelta(days=1)
+            "last_used": now_ts(),
+            "reset_time": next_reset
         }
     
     return result
@@ -290,19 +302,20 @@ async def increment_broadcast_usage(admin_id: int) -> bool:
     """Увеличение счетчика рассылок"""
     query = """
     INSERT INTO admin_broadcast_stats (admin_id, usage_count, last_used)
-    VALUES (%s, 1, NOW())
+    VALUES (%s, 1, %s)
     ON DUPLICATE KEY UPDATE 
     usage_count = usage_count + 1,
-    last_used = NOW()
+    last_used = VALUES(last_used)
     """
     
-    await db.execute(query, admin_id)
+    await db.execute(query, admin_id, now_ts())
     return True
 
 
-async def reset_broadcast_usage(admin_id: int) -> bool:
-    """Сброс счетчика рассылок"""
-    next_reset = datetime.now() + timedelta(days=1)
+async def reset_broadcast_usage(admin_id: int) -> int:
+    """Сброс счетчика рассылок (возвращает время следующего сброса)"""
+    now = now_ts()
+    next_reset = now + SECONDS_PER_DAY
     
     query = """
     INSERT INTO admin_broadcast_stats (admin_id, usage_count, reset_time)
@@ -310,11 +323,11 @@ async def reset_broadcast_usage(admin_id: int) -> bool:
     ON DUPLICATE KEY UPDATE 
     usage_count = 0,
     reset_time = %s,
-    updated_at = NOW()
+    updated_at = %s
     """
     
-    await db.execute(query, admin_id, next_reset, next_reset)
-    return True
+    await db.execute(query, admin_id, next_reset, next_reset, now)
+    return next_reset
 
 
 async def check_broadcast_limit(admin_id: int) -> tuple:
@@ -376,17 +389,19 @@ async def update_moderator_promo_stats(admin_id: int, reward_type: str, amount:
     query = """
     INSERT INTO moderator_promo_stats 
     (admin_id, coins_used, magnesia_used, power_used, total_created, last_created)
-    VALUES (%s, %s, %s, %s, %s, NOW())
+    VALUES (%s, %s, %s, %s, %s, %s)
     ON DUPLICATE KEY UPDATE 
     coins_used = VALUES(coins_used),
     magnesia_used = VALUES(magnesia_used),
     power_used = VALUES(power_used),
     total_created = VALUES(total_created),
-    last_created = NOW(),
-    updated_at = NOW()
+    last_created = VALUES(last_created),
+    updated_at = VALUES(last_created)
     """
     
-    await db.execute(query, admin_id, coins_used, magnesia_used, power_used, total_created)
+    await db.execute(
+        query, admin_id, coins_used, magnesia_used, power_used, total_created, now_ts()
+    )
     return True
 
 
@@ -434,11 +449,12 @@ async def make_admin(user_id: int, admin_id: int, level: int) -> int:
     """Назначение администратора"""
     query = """
     UPDATE players 
-    SET admin_level = %s, admin_since = NOW()
+    SET admin_level = %s, admin_since = %s
     WHERE user_id = %s
     """
     
-    await db.execute(query, level, user_id)
+    await db.execute(query, level, now_ts(), user_id)
+    _set_known_admin(user_id, level > 0)
     
     # Логируем действие
     admin = await get_player(admin_id)
@@ -468,6 +484,8 @@ async def remove_admin(user_id: int, admin_id: int) -> bool:
     result = await db.execute(query, user_id)
     
     if result.rowcount > 0:
+        _set_known_admin(user_id, False)
+
         # Логируем действие
         admin = await get_player(admin_id)
         target = await get_player(user_id)
@@ -485,3 +503,1029 @@ async def remove_admin(user_id: int, admin_id: int) -> bool:
         return True
     
     return False
+
+
+# ======================
+# ФУНКЦИИ ДЛЯ СПИСКА АДМИНИСТРАТОРОВ В ПАМЯТИ
+# ======================
+
+# user_id всех игроков с admin_level > 0 (None - список еще не загружен)
+_admin_ids: set | None = None
+
+
+async def load_admin_ids() -> int:
+    """Загрузка списка администраторов (при запуске бота)"""
+    global _admin_ids
+    rows = await db.fetch_all("SELECT user_id FROM players WHERE admin_level > 0")
+    _admin_ids = {row["user_id"] for row in rows}
+    return len(_admin_ids)
+
+
+def is_known_admin(user_id: int) -> bool | None:
+    """Проверка администратора без запроса к базе (None - список не загружен, нужна обычная проверка)"""
+    if user_id == settings.CREATOR_ID:
+        return True
+    if _admin_ids is None:
+        return None
+    return user_id in _admin_ids
+
+
+@shard.shared("admin_ids")
+def _set_known_admin(user_id: int, is_admin: bool) -> None:
+    if _admin_ids is None:
+        return
+    if is_admin:
+        _admin_ids.add(user_id)
+    else:
+        _admin_ids.discard(user_id)
+
+
+def forget_admin_id(user_id: int) -> None:
+    """Убрать игрока из списка администраторов (после удаления игрока)"""
+    _set_known_admin(user_id, False)
+
+
+# ======================
+# ФУНКЦИИ ДЛЯ ТОПА ВКЛАДЧИКОВ КЛАНА
+# ======================
+
+# Сколько лучших вкладчиков держим в памяти для каждого клана
+TOP_CONTRIBUTORS_CACHE_SIZE = 10
+
+# clan_id -> min-куча (contributions, user_id) размером не больше TOP_CONTRIBUTORS_CACHE_SIZE
+_top_contributors_heaps: dict[int, list] = {}
+# clan_id -> {user_id: строка участника} для участников из кучи
+_top_contributors_rows: dict[int, dict] = {}
+
+
+async def _load_top_contributors(clan_id: int) -> None:
+    """Загрузка топа вкладчиков клана из индекса idx_players_clan_contributions"""
+    query = """
+    SELECT user_id, username, clan_role AS role, clan_contributions AS contributions
+    FROM players
+    WHERE clan_id = %s
+    ORDER BY clan_contributions DESC
+    LIMIT %s
+    """
+    rows = await db.fetch_all(query, clan_id, TOP_CONTRIBUTORS_CACHE_SIZE)
+
+    heap = [(row["contributions"] or 0, row["user_id"]) for row in rows]
+    heapq.heapify(heap)
+    _top_contributors_heaps[clan_id] = heap
+    _top_contributors_rows[clan_id] = {row["user_id"]: dict(row) for row in rows}
+
+
+async def get_top_contributors(clan_id: int, n: int = 3) -> list:
+    """Получение топ-n вкладчиков клана (по убыванию вкладов)"""
+    if n > TOP_CONTRIBUTORS_CACHE_SIZE:
+        # Редкий случай - идем напрямую в индекс, кэш не трогаем
+        query = """
+        SELECT user_id, username, clan_role AS role, clan_contributions AS contributions
+        FROM players
+        WHERE clan_id = %s
+        ORDER BY clan_contributions DESC
+        LIMIT %s
+        """
+        return await db.fetch_all(query, clan_id, n)
+
+    if clan_id not in _top_contributors_heaps:
+        await _load_top_contributors(clan_id)
+
+    rows = _top_contributors_rows[clan_id]
+    top = heapq.nlargest(n, _top_contributors_heaps[clan_id])
+    return [dict(rows[user_id]) for _, user_id in top]
+
+
+@shard.shared("top_contributors.update")
+def update_top_contributors(
+    clan_id: int,
+    user_id: int,
+    username: str,
+    role: str,
+    total_contributions: int
+) -> None:
+    """Обновление кучи топа вкладчиков после deposit_to_clan_treasury"""
+    heap = _top_contributors_heaps.get(clan_id)
+    if heap is None:
+        # Клан еще не загружен - прочитаем из индекса при первом запросе
+        return
+
+    rows = _top_contributors_rows[clan_id]
+    row = {
+        "user_id": user_id,
+        "username": username,
+        "role": role,
+        "contributions": total_contributions,
+    }
+
+    if user_id in rows:
+        # Вклады только растут, поэтому игрок остается в топе
+        rows[user_id] = row
+        heap[:] = [(rows[uid]["contributions"], uid) for _, uid in heap]
+        heapq.heapify(heap)
+    elif len(heap) < TOP_CONTRIBUTORS_CACHE_SIZE:
+        rows[user_id] = row
+        heapq.heappush(heap, (total_contributions, user_id))
+    elif total_contributions > heap[0][0]:
+        _, dropped_id = heapq.heapreplace(heap, (total_contributions, user_id))
+        del rows[dropped_id]
+        rows[user_id] = row
+
+
+@shard.shared("top_contributors.invalidate")
+def invalidate_top_contributors(clan_id: int) -> None:
+    """Сброс кэша топа вкладчиков (выход, исключение, смена ролей, роспуск)"""
+    _top_contributors_heaps.pop(clan_id, None)
+    _top_contributors_rows.pop(clan_id, None)
+
+
+# ======================
+# ФУНКЦИИ ДЛЯ ЛОГА КАЗНЫ КЛАНА (КОЛЬЦЕВОЙ БУФЕР + ПАКЕТНАЯ ЗАПИСЬ)
+# ======================
+
+# Сколько последних операций держим в памяти для каждого клана
+TREASURY_LOG_BUFFER_SIZE = 20
+# Как часто сбрасываем накопленные записи в базу (секунды)
+TREASURY_LOG_FLUSH_INTERVAL = 5
+# Строк в одном INSERT (7 параметров на строку, укладываемся в лимит SQLite)
+TREASURY_LOG_BATCH_ROWS = 140
+
+# clan_id -> deque последних операций (новые слева)
+_treasury_log_recent: dict[int, deque] = {}
+# Записи, ожидающие записи в базу
+_treasury_log_pending: list[dict] = []
+# (clan_id, минута) -> накопительная запись lift_income за эту минуту
+_lift_income_rollups: dict[tuple, dict] = {}
+# Чтение лога из базы не пересекается с записью пачки: иначе записи, которые
+# flush забрал из очереди во время чтения, попали бы в буфер дважды или пропали
+_treasury_log_lock = asyncio.Lock()
+# clan_id -> сколько раз буфер сбрасывали: буфер, прочитанный до сброса, не сохраняется
+_treasury_log_drops: dict[int, int] = {}
+
+
+def queue_treasury_log(
+    clan_id: int,
+    user_id: int,
+    action_type: str,
+    amount: int,
+    description: str,
+    username: str = None
+) -> None:
+    """Добавление операции в лог казны (запись в базу - пакетом при flush)"""
+    now = now_ts()
+
+    if action_type == "lift_income":
+        # Доход с поднятий сворачиваем в одну запись на клан в минуту
+        minute = now - now % 60
+        entry = _lift_income_rollups.get((clan_id, minute))
+        if entry:
+            entry["amount"] += amount
+            entry["lifts"] += 1
+            entry["description"] = f"Доход с поднятий: {entry['lifts']} шт."
+            return
+
+        entry = {
+            "clan_id": clan_id,
+            "user_id": None,
+            "username": None,
+            "action_type": action_type,
+            "amount": amount,
+            "description": "Доход с поднятий: 1 шт.",
+            "created_at": minute,
+            "lifts": 1,
+        }
+        _lift_income_rollups[(clan_id, minute)] = entry
+    else:
+        entry = {
+            "clan_id": clan_id,
+            "user_id": user_id,
+            "username": username,
+            "action_type": action_type,
+            "amount": amount,
+            "description": description,
+            "created_at": now,
+        }
+        _treasury_log_pending.append(entry)
+
+    recent = _treasury_log_recent.get(clan_id)
+    if recent is not None:
+        recent.appendleft(entry)
+
+
+async def get_recent_treasury_log(clan_id: int, limit: int = 5) -> list:
+    """Получение последних операций казны из памяти"""
+    recent = _treasury_log_recent.get(clan_id)
+
+    if recent is None:
+        async with _treasury_log_lock:
+            recent = _treasury_log_recent.get(clan_id)
+            if recent is None:
+                drops = _treasury_log_drops.get(clan_id, 0)
+                rows = await get_clan_treasury_log(clan_id, TREASURY_LOG_BUFFER_SIZE)
+                recent = deque(rows, maxlen=TREASURY_LOG_BUFFER_SIZE)
+
+                # Добавляем то, что еще не успело попасть в базу
+                unsaved = [e for e in _treasury_log_pending if e["clan_id"] == clan_id]
+                unsaved += [e for (cid, _), e in _lift_income_rollups.items() if cid == clan_id]
+                unsaved.sort(key=lambda e: e["created_at"])
+                for entry in unsaved:
+                    recent.appendleft(entry)
+
+                # Пока шло чтение, в лог записали мимо буфера - прочитанное могло устареть
+                if drops == _treasury_log_drops.get(clan_id, 0):
+                    _treasury_log_recent[clan_id] = recent
+
+    return [dict(entry) for entry in list(recent)[:limit]]
+
+
+@shard.on("treasury_log")
+def _drop_recent_treasury_log(clan_id: int) -> None:
+    _treasury_log_recent.pop(clan_id, None)
+    _treasury_log_drops[clan_id] = _treasury_log_drops.get(clan_id, 0) + 1
+
+
+def invalidate_treasury_log(clan_id: int) -> None:
+    """Сброс буфера лога казны во всех процессах после записи в clan_treasury_log мимо
+    queue_treasury_log (взнос в казну, доход бизнесов)"""
+    _drop_recent_treasury_log(clan_id)
+    shard.publish("treasury_log", (clan_id,))
+
+
+async def flush_treasury_log(force: bool = False) -> int:
+    """Пакетная запись накопленных операций казны в базу"""
+    async with _treasury_log_lock:
+        return await _flush_treasury_log(force)
+
+
+async def _flush_treasury_log(force: bool) -> int:
+    global _treasury_log_pending
+
+    entries = _treasury_log_pending
+    _treasury_log_pending = []
+
+    # Закрытые минуты (или все при force) уходят в базу одной строкой
+    now = now_ts()
+    current_minute = now - now % 60
+    for key in list(_lift_income_rollups):
+        if force or key[1] < current_minute:
+            entries.append(_lift_income_rollups.pop(key))
+
+    if not entries:
+        return 0
+
+    written = 0
+    try:
+        for start in range(0, len(entries), TREASURY_LOG_BATCH_ROWS):
+            batch = entries[start:start + TREASURY_LOG_BATCH_ROWS]
+            placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(batch))
+            query = f"""
+            INSERT INTO clan_treasury_log
+            (clan_id, user_id, username, action_type, amount, description, created_at)
+            VALUES {placeholders}
+            """
+            params = []
+            for entry in batch:
+                params.extend([
+                    entry["clan_id"], entry["user_id"], entry["username"],
+                    entry["action_type"], entry["amount"], entry["description"],
+                    entry["created_at"]
+                ])
+            await execute_write(query, *params)
+            written += len(batch)
+    except Exception:
+        # Не теряем записи - вернем их в очередь до следующего flush
+        _treasury_log_pending = entries[written:] + _treasury_log_pending
+        raise
+
+    # Остальные процессы бота перечитают последние операции этих кланов
+    for clan_id in {entry["clan_id"] for entry in entries}:
+        shard.publish("treasury_log", (clan_id,))
+
+    return written
+
+
+async def treasury_log_flusher(interval: int = TREASURY_LOG_FLUSH_INTERVAL):
+    """Фоновая пакетная запись лога казны; при остановке бота - все накопленное и выход"""
+    while True:
+        stopping = await lifecycle.pause(interval)
+        try:
+            await flush_treasury_log(force=stopping)
+        except Exception as e:
+            print(f"❌ Ошибка записи лога казны: {e}")
+        if stopping:
+            return
+
+
+def start_treasury_log_flusher() -> asyncio.Task:
+    """Запуск фоновой записи лога казны"""
+    # Не отменяется при остановке: отмена во время INSERT записала бы пачку дважды
+    return lifecycle.service("лог казны", treasury_log_flusher(), graceful=True)
+
+
+# В основном файле бота нужно будет после начисления дохода бизнесов в казну
+# (запись в clan_treasury_log напрямую) вызывать invalidate_treasury_log(clan_id);
+# взнос в казну буфер уже сбрасывает clan_deposit_handler
+
+
+# ======================
+# ФУНКЦИИ ДЛЯ ЛОГОВ КЛАНА С НИКАМИ (БЕЗ ДОПОЛНИТЕЛЬНЫХ ЗАПРОСОВ ПРИ ЧТЕНИИ)
+# ======================
+
+# Сколько строк переписываем за один UPDATE при смене ника
+USERNAME_REWRITE_CHUNK = 500
+
+
+async def log_clan_action(
+    clan_id: int,
+    user_id: int,
+    action_type: str,
+    details: str,
+    username: str = None
+) -> bool:
+    """Запись действия в лог клана вместе с ником игрока (заменяет прежнюю версию)"""
+    if username is None:
+        player = await get_player(user_id)
+        username = player["username"] if player else None
+
+    query = """
+    INSERT INTO clan_log (clan_id, user_id, username, action_type, details, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    """
+    await db.execute(
+        query, clan_id, user_id, username, action_type, details, now_ts()
+    )
+    return True
+
+
+async def get_clan_log(clan_id: int, limit: int = 15) -> list:
+    """Получение лога клана одним запросом (ник хранится в строке)"""
+    query = """
+    SELECT user_id, username, action_type, details, created_at
+    FROM clan_log
+    WHERE clan_id = %s
+    ORDER BY created_at DESC
+    LIMIT %s
+    """
+    return await db.fetch_all(query, clan_id, limit)
+
+
+async def get_clan_treasury_log(clan_id: int, limit: int = 5) -> list:
+    """Получение лога казны без JOIN с players (ник хранится в строке)"""
+    query = """
+    SELECT user_id, username, action_type, amount, description, created_at
+    FROM clan_treasury_log
+    WHERE clan_id = %s
+    ORDER BY created_at DESC
+    LIMIT %s
+    """
+    return await db.fetch_all(query, clan_id, limit)
+
+
+async def rewrite_log_usernames(user_id: int, username: str) -> int:
+    """Переписывание ника игрока в логах клана порциями"""
+    # Сначала память - просмотры сразу покажут новый ник
+    for recent in _treasury_log_recent.values():
+        for entry in recent:
+            if entry["user_id"] == user_id:
+                entry["username"] = username
+    for entry in _treasury_log_pending:
+        if entry["user_id"] == user_id:
+            entry["username"] = username
+    for rows in _top_contributors_rows.values():
+        if user_id in rows:
+            rows[user_id]["username"] = username
+
+    total = 0
+    for table in ("clan_log", "clan_treasury_log"):
+        query = f"""
+        UPDATE {table} SET username = %s
+        WHERE rowid IN (
+            SELECT rowid FROM {table}
+            WHERE user_id = %s AND (username IS NULL OR username != %s)
+            LIMIT %s
+        )
+        """
+        while True:
+            result = await db.execute(query, username, user_id, username, USERNAME_REWRITE_CHUNK)
+            total += result.rowcount
+            if result.rowcount < USERNAME_REWRITE_CHUNK:
+                break
+            # Короткие транзакции - отдаем управление другим обработчикам
+            await asyncio.sleep(0)
+
+    return total
+
+
+def schedule_username_rewrite(user_id: int, username: str) -> asyncio.Task:
+    """Фоновое обновление ника в логах после update_username"""
+    # Остановка бота дождется его вместе с обработчиками
+    return lifecycle.track(rewrite_log_usernames(user_id, username))
+
+
+# ======================
+# ФУНКЦИИ ДЛЯ СПИСКА ИСКЛЮЧЕННЫХ ИЗ КЛАНА
+# ======================
+
+# clan_id -> set исключенных user_id (загружается при первом обращении)
+_clan_bans: dict[int, set] = {}
+
+
+async def _get_clan_ban_set(clan_id: int) -> set:
+    """Множество исключенных игроков клана из памяти (ленивая загрузка)"""
+    bans = _clan_bans.get(clan_id)
+    if bans is None:
+        rows = await db.fetch_all("SELECT user_id FROM clan_bans WHERE clan_id = %s", clan_id)
+        bans = {row["user_id"] for row in rows}
+        _clan_bans[clan_id] = bans
+    return bans
+
+
+@shard.on("clan_bans")
+def _drop_clan_ban_set(clan_id: int) -> None:
+    """Список исключенных изменил другой процесс бота - перечитаем из базы"""
+    _clan_bans.pop(clan_id, None)
+
+
+async def is_banned_from_clan(clan_id: int, user_id: int) -> bool:
+    """Проверка, исключен ли игрок из клана"""
+    return user_id in await _get_clan_ban_set(clan_id)
+
+
+async def ban_from_clan(clan_id: int, user_id: int, banned_by: int) -> bool:
+    """Добавление игрока в список исключенных"""
+    bans = await _get_clan_ban_set(clan_id)
+    if user_id in bans:
+        return False
+
+    query = """
+    INSERT OR IGNORE INTO clan_bans (clan_id, user_id, banned_by, created_at)
+    VALUES (%s, %s, %s, %s)
+    """
+    await db.execute(query, clan_id, user_id, banned_by, now_ts())
+    bans.add(user_id)
+    shard.publish("clan_bans", (clan_id,))
+    return True
+
+
+async def unban_from_clan(clan_id: int, user_id: int) -> bool:
+    """Удаление игрока из списка исключенных"""
+    bans = await _get_clan_ban_set(clan_id)
+    if user_id not in bans:
+        return False
+
+    await db.execute("DELETE FROM clan_bans WHERE clan_id = %s AND user_id = %s", clan_id, user_id)
+    bans.discard(user_id)
+    shard.publish("clan_bans", (clan_id,))
+    return True
+
+
+async def delete_clan_bans(clan_id: int) -> int:
+    """Очистка списка исключенных при удалении клана"""
+    _clan_bans.pop(clan_id, None)
+    shard.publish("clan_bans", (clan_id,))
+    result = await db.execute("DELETE FROM clan_bans WHERE clan_id = %s", clan_id)
+    return result.rowcount
+
+
+# ======================
+# ФУНКЦИИ ДЛЯ НАСТРОЕК КЛАНА (КЭШ + ШАБЛОНЫ ПРИВЕТСТВИЙ)
+# ======================
+
+GREETING_SLOTS = ("player", "clan", "tag")
+_GREETING_SLOT_RE = re.compile(r"\{(" + "|".join(GREETING_SLOTS) + r")\}")
+
+# clan_id -> разобранные настройки клана
+_clan_settings: dict[int, dict] = {}
+# clan_id -> скомпилированный шаблон приветствия (None - приветствия нет)
+_clan_greetings: dict[int, tuple | None] = {}
+
+
+def compile_greeting(greeting: str) -> tuple:
+    """Разбор приветствия на куски текста и слоты {player}, {clan}, {tag}"""
+    # re.split с группой чередует текст (четные) и имена слотов (нечетные)
+    return tuple(_GREETING_SLOT_RE.split(greeting))
+
+
+def render_greeting(template: tuple, **values) -> str:
+    """Подстановка значений в скомпилированный шаблон"""
+    return "".join(
+        part if i % 2 == 0 else values[part]
+        for i, part in enumerate(template)
+    )
+
+
+async def get_clan_settings(clan_id: int) -> dict:
+    """Настройки клана из кэша (только для чтения)"""
+    settings_data = _clan_settings.get(clan_id)
+    if settings_data is None:
+        row = await db.fetch_one("SELECT settings FROM clans WHERE id = %s", clan_id)
+        raw = row["settings"] if row else None
+        if isinstance(raw, str):
+            try:
+                settings_data = json.loads(raw)
+            except:
+                settings_data = {}
+        else:
+            settings_data = raw or {}
+        _clan_settings[clan_id] = settings_data
+    return settings_data
+
+
+@shard.shared("clan_settings")
+def invalidate_clan_settings(clan_id: int) -> None:
+    """Сброс кэша настроек клана"""
+    _clan_settings.pop(clan_id, None)
+    _clan_greetings.pop(clan_id, None)
+
+
+async def update_clan_settings(clan_id: int, settings_data: dict) -> bool:
+    """Полная перезапись настроек клана (заменяет прежнюю версию)"""
+    await db.execute(
+        "UPDATE clans SET settings = %s WHERE id = %s",
+        json.dumps(settings_data, ensure_ascii=False), clan_id
+    )
+    invalidate_clan_settings(clan_id)
+    return True
+
+
+async def update_clan_setting(clan_id: int, key: str, value) -> bool:
+    """Изменение одного ключа настроек без перезаписи всего JSON"""
+    query = """
+    UPDATE clans
+    SET settings = json_set(COALESCE(settings, '{}'), %s, json(%s))
+    WHERE id = %s
+    """
+    await db.execute(query, f"$.{key}", json.dumps(value, ensure_ascii=False), clan_id)
+    invalidate_clan_settings(clan_id)
+    return True
+
+
+async def get_clan_requirements(clan_id: int) -> dict:
+    """Требования для вступления из кэша настроек (заменяет прежнюю версию)"""
+    settings_data = await get_clan_settings(clan_id)
+    return settings_data.get("requirements") or {}
+
+
+async def get_clan_greeting(clan_id: int) -> tuple | None:
+    """Скомпилированное приветствие клана (компилируется один раз)"""
+    if clan_id not in _clan_greetings:
+        greeting = (await get_clan_settings(clan_id)).get("greeting")
+        _clan_greetings[clan_id] = compile_greeting(greeting) if greeting else None
+    return _clan_greetings[clan_id]
+
+
+# ======================
+# ФУНКЦИИ ДЛЯ КАРТОЧКИ ИГРОКА (ПРОФИЛЬ + КЛАН ОДНИМ ЗАПРОСОМ)
+# ======================
+
+# Сколько секунд карточка считается свежей. Обработчики сбрасывают карточку при
+# каждом изменении игрока или его клана, срок - только страховка от пропущенного
+# сброса (изменения вне бота, правка базы вручную)
+PLAYER_CARD_TTL = 300
+
+# user_id -> (время загрузки, карточка)
+_player_cards: dict[int, tuple] = {}
+
+
+async def get_player_card(user_id: int) -> PlayerCard | None:
+    """Игрок вместе с тегом, названием и уровнем клана (один индексированный JOIN)"""
+    cached = _player_cards.get(user_id)
+    if cached and time.monotonic() - cached[0] < PLAYER_CARD_TTL:
+        return cached[1]
+
+    query = """
+    SELECT p.*, c.tag AS clan_tag, c.name AS clan_name, c.level AS clan_level
+    FROM players p
+    LEFT JOIN clans c ON c.id = p.clan_id
+    WHERE p.user_id = %s
+    """
+    row = await db.fetch_one(query, user_id)
+    if not row:
+        return None
+
+    card = PlayerCard.from_row(row)
+    _player_cards[user_id] = (time.monotonic(), card)
+    return card
+
+
+@shard.shared("player_card")
+def invalidate_player_card(user_id: int) -> None:
+    """Сброс карточки игрока после изменения его данных"""
+    _player_cards.pop(user_id, None)
+
+
+@shard.shared("player_card.clan")
+def invalidate_clan_cards(clan_id: int) -> None:
+    """Сброс карточек участников клана (название, тег или уровень клана изменились)"""
+    for user_id, (_, card) in list(_player_cards.items()):
+        if card.clan_id == clan_id:
+            del _player_cards[user_id]
+
+
+# ======================
+# ФУНКЦИИ ДЛЯ КОЛОНОЧНОЙ КОПИИ ТАБЛИЦЫ ИГРОКОВ
+# ======================
+
+PLAYER_COLUMNS_BATCH = 50000
+
+
+async def iter_player_columns(batch_size: int = PLAYER_COLUMNS_BATCH):
+    """Постраничное чтение колонок игроков для аналитики (по возрастанию user_id)"""
+    query = """
+    SELECT user_id, username, balance, power, total_lifts, total_earned,
+           dumbbell_level, admin_level, is_banned
+    FROM players
+    WHERE user_id > %s
+    ORDER BY user_id
+    LIMIT %s
+    """
+
+    last_id = -1
+    while True:
+        rows = await db.fetch_all(query, last_id, batch_size)
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]["user_id"]
+
+
+# ======================
+# ФУНКЦИИ ДЛЯ КУЛДАУНА ПОДНЯТИЙ
+# ======================
+
+# Сколько игроков обновляем одним UPDATE ... CASE
+LIFT_COOLDOWN_BATCH_ROWS = 400
+
+
+async def load_lift_cooldowns() -> list:
+    """Игроки с еще не истекшим кулдауном или индивидуальным кулдауном"""
+    query = """
+    SELECT user_id, lift_ready_at, lift_cooldown
+    FROM players
+    WHERE lift_ready_at > %s OR lift_cooldown IS NOT NULL
+    """
+    return await db.fetch_all(query, now_ts())
+
+
+async def save_lift_ready_times(ready_times: dict) -> int:
+    """Пакетная запись времени следующего подъема: {user_id: epoch}"""
+    items = list(ready_times.items())
+
+    for start in range(0, len(items), LIFT_COOLDOWN_BATCH_ROWS):
+        batch = items[start:start + LIFT_COOLDOWN_BATCH_ROWS]
+        cases = " ".join(["WHEN %s THEN %s"] * len(batch))
+        ids = ", ".join(["%s"] * len(batch))
+        query = f"""
+        UPDATE players
+        SET lift_ready_at = CASE user_id {cases} END
+        WHERE user_id IN ({ids})
+        """
+        params = []
+        for user_id, ready_at in batch:
+            params.extend([user_id, ready_at])
+        params.extend(user_id for user_id, _ in batch)
+        await execute_write(query, *params)
+
+    return len(items)
+
+
+async def set_lift_cooldown(user_id: int, seconds: int | None) -> bool:
+    """Индивидуальный кулдаун поднятия (None - вернуть стандартный)"""
+    query = "UPDATE players SET lift_cooldown = %s WHERE user_id = %s"
+    await db.execute(query, seconds, user_id)
+    return True
+
+
+# ======================
+# ФУНКЦИИ ДЛЯ ПАКЕТНОЙ ЗАПИСИ ПОДНЯТИЙ
+# ======================
+
+# Игроков в одном UPDATE (9 параметров на игрока, укладываемся в лимит SQLite)
+LIFT_PLAYER_BATCH_ROWS = 100
+# Кланов в одном UPDATE (5 параметров на клан)
+LIFT_CLAN_BATCH_ROWS = 180
+
+
+def build_delta_update(table: str, key: str, columns: tuple, batch: list) -> tuple:
+    """UPDATE с прибавлением своих значений каждой строке через CASE"""
+    assignments = ", ".join(
+        f"{column} = {column} + CASE {key} {' '.join(['WHEN %s THEN %s'] * len(batch))} END"
+        for column in columns
+    )
+    ids = ", ".join(["%s"] * len(batch))
+    query = f"UPDATE {table} SET {assignments} WHERE {key} IN ({ids})"
+
+    params = []
+    for i in range(len(columns)):
+        for row_id, deltas in batch:
+            params.extend([row_id, deltas[i]])
+    params.extend(row_id for row_id, _ in batch)
+    return query, params
+
+
+async def apply_lift_deltas(player_deltas: dict, clan_deltas: dict) -> int:
+    """Применение накопленных поднятий; записанные пачки удаляются из словарей"""
+    applied = 0
+
+    player_items = list(player_deltas.items())
+    for start in range(0, len(player_items), LIFT_PLAYER_BATCH_ROWS):
+        batch = player_items[start:start + LIFT_PLAYER_BATCH_ROWS]
+        query, params = build_delta_update(
+            "players", "user_id", ("balance", "power", "total_lifts", "total_earned"), batch
+        )
+        await execute_write(query, *params)
+        for user_id, _ in batch:
+            del player_deltas[user_id]
+        applied += len(batch)
+
+    clan_items = list(clan_deltas.items())
+    for start in range(0, len(clan_items), LIFT_CLAN_BATCH_ROWS):
+        batch = clan_items[start:start + LIFT_CLAN_BATCH_ROWS]
+        query, params = build_delta_update("clans", "id", ("treasury", "total_lifts"), batch)
+        await execute_write(query, *params)
+        for clan_id, _ in batch:
+            del clan_deltas[clan_id]
+
+    return applied
+
+
+# ======================
+# ФУНКЦИИ ДЛЯ ПОЭТАПНОГО СБРОСА СЕЗОНА
+# ======================
+
+# Сколько строк удаляем одной короткой транзакцией
+SEASON_RESET_CHUNK = 2000
+
+# Этапы сброса по порядку: (название, запрос на одну порцию)
+SEASON_RESET_STEPS = (
+    ("clan_treasury_log", """
+    DELETE FROM clan_treasury_log
+    WHERE rowid IN (SELECT rowid FROM clan_treasury_log LIMIT %s)
+    """),
+    ("clan_log", """
+    DELETE FROM clan_log
+    WHERE rowid IN (SELECT rowid FROM clan_log LIMIT %s)
+    """),
+    ("clan_bans", """
+    DELETE FROM clan_bans
+    WHERE clan_id IN (SELECT DISTINCT clan_id FROM clan_bans LIMIT %s)
+    """),
+    # Администраторы остаются, но выходят из кланов
+    ("admin_clan_members", """
+    UPDATE players
+    SET clan_id = NULL, clan_role = NULL, clan_contributions = 0, clan_joined_at = NULL
+    WHERE rowid IN (SELECT rowid FROM players WHERE admin_level > 0 AND clan_id IS NOT NULL LIMIT %s)
+    """),
+    ("players", """
+    DELETE FROM players
+    WHERE rowid IN (SELECT rowid FROM players WHERE admin_level = 0 LIMIT %s)
+    """),
+    ("clans", """
+    DELETE FROM clans
+    WHERE rowid IN (SELECT rowid FROM clans LIMIT %s)
+    """),
+)
+
+
+async def reset_season_chunk(step: str, chunk_size: int = SEASON_RESET_CHUNK) -> int:
+    """Одна порция сброса сезона (сколько строк затронуто; 0 - этап закончен)"""
+    query = dict(SEASON_RESET_STEPS)[step]
+    result = await db.execute(query, chunk_size)
+    return result.rowcount
+
+
+@shard.shared("clan_caches")
+def clear_clan_caches() -> None:
+    """Сброс всех кэшей кланов и игроков в памяти (после сброса сезона)"""
+    global _treasury_log_pending
+
+    _top_contributors_heaps.clear()
+    _top_contributors_rows.clear()
+    _treasury_log_recent.clear()
+    _treasury_log_pending = []
+    _lift_income_rollups.clear()
+    _clan_bans.clear()
+    _clan_settings.clear()
+    _clan_greetings.clear()
+    _player_cards.clear()
+
+
+# ======================
+# ФУНКЦИИ ДЛЯ АРХИВА СЕЗОНОВ И УДАЛЕННЫХ ИГРОКОВ
+# ======================
+
+# Сколько мест сохраняем в итоговой таблице сезона по каждой категории
+SEASON_LEADERBOARD_SIZE = 100
+# Строк в одном INSERT итоговой таблицы (6 параметров на строку)
+SEASON_LEADERBOARD_BATCH_ROWS = 160
+
+# Категория -> (таблица, колонка значения, колонка имени)
+SEASON_LEADERBOARD_CATEGORIES = {
+    "balance": ("players", "balance", "username"),
+    "power": ("players", "power", "username"),
+    "total_lifts": ("players", "total_lifts", "username"),
+    "total_earned": ("players", "total_earned", "username"),
+    "clan_treasury": ("clans", "treasury", "name"),
+    "clan_level": ("clans", "level", "name"),
+}
+
+
+def pack_player_row(row) -> bytes:
+    """Строка игрока -> сжатый JSON (для архивов)"""
+    return zlib.compress(json.dumps(dict(row), ensure_ascii=False).encode())
+
+
+def unpack_player_row(data: bytes) -> dict:
+    return json.loads(zlib.decompress(data))
+
+
+def _vacuum_into(path: str) -> None:
+    source = sqlite3.connect(f"file:{settings.database_path}?mode=ro", uri=True)
+    try:
+        source.execute("VACUUM INTO ?", (path,))
+    finally:
+        source.close()
+
+
+async def snapshot_database(path: str) -> None:
+    """Согласованная копия базы (VACUUM INTO) без остановки записи
+
+    Снимок делается на отдельном соединении в отдельном потоке: общее
+    соединение бота и обработчики его не ждут, а в режиме WAL запись
+    не ждет снимка.
+    """
+    await asyncio.to_thread(_vacuum_into, path)
+
+
+async def create_season(archive_dir: str) -> int:
+    """Запись о новом архиве сезона, возвращает номер сезона"""
+    players = await db.fetch_one("SELECT COUNT(*) AS count FROM players WHERE admin_level = 0")
+    clans = await db.fetch_one("SELECT COUNT(*) AS count FROM clans")
+
+    query = """
+    INSERT INTO seasons (archived_at, archive_dir, players, clans)
+    VALUES (%s, %s, %s, %s)
+    """
+    result = await db.execute(query, now_ts(), archive_dir, players["count"], clans["count"])
+    return result.lastrowid
+
+
+def _read_season_leaderboards(snapshot_path: str) -> list:
+    """Топ по каждой категории из снимка базы (выполняется в отдельном потоке)"""
+    source = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True)
+    try:
+        rows = []
+        for category, (table, column, name_column) in SEASON_LEADERBOARD_CATEGORIES.items():
+            entity_column = "user_id" if table == "players" else "id"
+            query = f"""
+            SELECT {entity_column}, {name_column}, {column}
+            FROM {table}
+            ORDER BY {column} DESC, {entity_column}
+            LIMIT ?
+            """
+            for rank, (entity_id, name, value) in enumerate(source.execute(query, (SEASON_LEADERBOARD_SIZE,)), 1):
+                rows.append((category, rank, entity_id, name, value))
+        return rows
+    finally:
+        source.close()
+
+
+async def save_season_leaderboards(season_id: int, snapshot_path: str) -> int:
+    """Итоговая таблица сезона из снимка базы - совпадает с архивом и индексом игроков"""
+    rows = await asyncio.to_thread(_read_season_leaderboards, snapshot_path)
+
+    for start in range(0, len(rows), SEASON_LEADERBOARD_BATCH_ROWS):
+        batch = rows[start:start + SEASON_LEADERBOARD_BATCH_ROWS]
+        placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(batch))
+        query = f"""
+        INSERT INTO season_leaderboards (season_id, category, rank, entity_id, name, value)
+        VALUES {placeholders}
+        """
+        params = []
+        for row in batch:
+            params.extend((season_id, *row))
+        await db.execute(query, *params)
+
+    return len(rows)
+
+
+async def get_season_leaderboard(season_id: int, category: str, limit: int = 10) -> list:
+    """Топ завершенного сезона (по первичному ключу, без сортировки)"""
+    query = """
+    SELECT rank, entity_id, name, value
+    FROM season_leaderboards
+    WHERE season_id = %s AND category = %s
+    ORDER BY rank
+    LIMIT %s
+    """
+    return await db.fetch_all(query, season_id, category, limit)
+
+
+async def get_season(season_id: int) -> dict | None:
+    return await db.fetch_one("SELECT * FROM seasons WHERE id = %s", season_id)
+
+
+async def get_unfinished_season() -> dict | None:
+    """Архив, после которого сброс сезона был прерван (None - такого нет)"""
+    return await db.fetch_one(
+        "SELECT * FROM seasons WHERE reset_finished_at IS NULL ORDER BY id DESC LIMIT 1"
+    )
+
+
+async def finish_season_reset(season_id: int) -> None:
+    await db.execute("UPDATE seasons SET reset_finished_at = %s WHERE id = %s", now_ts(), season_id)
+
+
+async def archive_player(user_id: int, reason: str) -> bool:
+    """Сохранение строки игрока перед удалением"""
+    player = await db.fetch_one("SELECT * FROM players WHERE user_id = %s", user_id)
+    if not player:
+        return False
+
+    query = """
+    INSERT OR REPLACE INTO deleted_players (user_id, deleted_at, reason, data)
+    VALUES (%s, %s, %s, %s)
+    """
+    await db.execute(query, user_id, now_ts(), reason, pack_player_row(player))
+    return True
+
+
+async def get_archived_player(user_id: int) -> dict | None:
+    """Последняя сохраненная копия удаленного игрока"""
+    query = """
+    SELECT data FROM deleted_players
+    WHERE user_id = %s
+    ORDER BY deleted_at DESC
+    LIMIT 1
+    """
+    row = await db.fetch_one(query, user_id)
+    return unpack_player_row(row["data"]) if row else None
+
+
+async def restore_player_row(player: dict) -> bool:
+    """Возвращение игрока из архива (без клана - кланы прошлого сезона не восстанавливаются)"""
+    player = {
+        **player,
+        "clan_id": None,
+        "clan_role": None,
+        "clan_contributions": 0,
+        "clan_joined_at": None,
+    }
+    columns = ", ".join(player)
+    placeholders = ", ".join(["%s"] * len(player))
+    query = f"INSERT OR REPLACE INTO players ({columns}) VALUES ({placeholders})"
+    await db.execute(query, *player.values())
+    invalidate_player_card(player["user_id"])
+    _set_known_admin(player["user_id"], (player.get("admin_level") or 0) > 0)
+    return True
+
+
+# ======================
+# ФУНКЦИИ ДЛЯ ЗАПИСИ ИЗ НЕСКОЛЬКИХ ПРОЦЕССОВ БОТА
+# ======================
+
+# Паузы между повторами пакетной записи, если базу держит другой процесс
+# дольше SHARD_BUSY_TIMEOUT (секунды)
+WRITE_RETRY_DELAYS = (0.1, 0.5, 2)
+
+
+async def configure_shared_writes(busy_timeout: int = settings.SHARD_BUSY_TIMEOUT) -> None:
+    """WAL и ожидание блокировки записи (вызывать в каждом процессе бота при запуске)
+
+    В режиме WAL чтение не ждет записи, а писатель в каждый момент один:
+    остальные процессы ждут блокировку до busy_timeout миллисекунд.
+    """
+    await db.execute("PRAGMA journal_mode = WAL")
+    await db.execute(f"PRAGMA busy_timeout = {int(busy_timeout)}")
+
+
+async def checkpoint_wal() -> None:
+    """Перенести WAL в основной файл базы (при остановке бота, после пакетных записей)
+
+    Если базу в этот момент пишет другой процесс, перенос будет неполным -
+    его закончит следующая остановка или автоматический checkpoint SQLite.
+    """
+    row = await db.fetch_one("PRAGMA wal_checkpoint(TRUNCATE)")
+    if row and row["busy"]:
+        print("❌ WAL перенесен не полностью: база занята другим процессом")
+
+
+def _is_locked_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+async def execute_write(query: str, *params):
+    """db.execute для пакетной записи: при занятой базе повторяет запрос с паузами
+
+    Каждый пакет - один запрос в своей транзакции, поэтому повтор не
+    применит изменения дважды.
+    """
+    for delay in WRITE_RETRY_DELAYS:
+        try:
+            return await db.execute(query, *params)
+        except Exception as e:
+            if not _is_locked_error(e):
+                raise
+            await asyncio.sleep(delay)
+    return await db.execute(query, *params)